@@ -0,0 +1,51 @@
+"""
+Benchmark: contended checkouts on a concurrent Library
+======================================================
+Threads race to check out and return the same small set of books, then
+the run checks that no book was ever held twice and reports throughput.
+
+Run with: python -m benchmarks.bench_concurrency [threads] [operations]
+"""
+
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from exercises.src.project import Library
+
+
+def main(thread_count: int, operations: int) -> None:
+    with tempfile.TemporaryDirectory() as data_dir:
+        library = Library("Benchmark", data_dir, concurrent=True, journal=True)
+        with library.batch():
+            books = [library.add_book(f"Book {n}", "Smith", "Fiction").book_id for n in range(20)]
+            borrowers = [library.add_borrower(f"User {n}", f"u{n}@test.com").borrower_id
+                         for n in range(thread_count)]
+
+        def worker(borrower_id: str, seed: int) -> None:
+            rng = random.Random(seed)
+            for _ in range(operations):
+                book_id = rng.choice(books)
+                if not library.checkout_book(book_id, borrower_id):
+                    library.return_book(book_id, borrower_id)
+
+        threads = [threading.Thread(target=worker, args=(borrower_id, seed))
+                   for seed, borrower_id in enumerate(borrowers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        held = [book_id for borrower in library.borrowers.values() for book_id in borrower.borrowed_books]
+        assert len(held) == len(set(held)), "a book was checked out twice"
+        total = thread_count * operations
+        print(f"{thread_count} threads, {total} operations in {elapsed:.2f}s ({total / elapsed:,.0f} ops/sec)")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [8, 500]))
@@ -0,0 +1,56 @@
+"""
+Benchmark: cross-branch search, sequential versus LibraryFederation
+===================================================================
+Builds several branch data directories from synthetic catalogs and times
+one cross-branch search_books the old way (open every branch's Library,
+which loads it, and search it in turn) against a LibraryFederation whose
+workers already hold the branches loaded.
+
+Run with: python -m benchmarks.bench_federation [branches] [books_per_branch]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from exercises.src.federation import LibraryFederation
+from exercises.src.project import Library
+
+QUERIES = ({"genre": "History", "available": True}, {"title__contains": "quantum"})
+
+
+def main(branch_count: int, books: int) -> None:
+    with tempfile.TemporaryDirectory() as root:
+        branches = {}
+        for n in range(branch_count):
+            branches[f"branch{n}"] = os.path.join(root, f"branch{n}")
+            os.makedirs(branches[f"branch{n}"])
+            library = Library(f"branch{n}", branches[f"branch{n}"])
+            synthetic.populate(library, books, max(10, books // 10), seed=n)
+            library.close()
+
+        print(f"{branch_count} branches x {books} books, one cross-branch search")
+        for criteria in QUERIES:
+            start = time.perf_counter()
+            sequential = [book for name, data_dir in branches.items()
+                          for book in Library(name, data_dir).search_books(**criteria)]
+            sequential_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            federation = LibraryFederation(branches)
+            startup_ms = (time.perf_counter() - start) * 1000
+            with federation:
+                start = time.perf_counter()
+                federated = federation.search_books(**criteria)
+                federated_ms = (time.perf_counter() - start) * 1000
+            assert len(federated) == len(sequential)
+            print(f"  {criteria}: {len(federated)} results")
+            print(f"    sequential load + search: {sequential_ms:>9.1f} ms")
+            print(f"    federation, warm:         {federated_ms:>9.1f} ms (startup {startup_ms:.0f} ms, once)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20_000)
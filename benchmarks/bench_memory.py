@@ -0,0 +1,49 @@
+"""
+Benchmark: bytes per Book record
+================================
+Compares the compact Book (__slots__, genre code, interned authors)
+against the previous layout, a plain object with a per-instance __dict__.
+
+Run with: python -m benchmarks.bench_memory [count]
+"""
+
+import sys
+import tracemalloc
+
+from exercises.src.project import Book
+
+
+class DictBook:
+    """The previous Book layout: every attribute lives in __dict__."""
+
+    def __init__(self, book_id, title, author, genre, available=True):
+        self.book_id = book_id
+        self.title = title
+        self.author = author
+        self.available = available
+        self.genre = genre
+
+
+def bytes_per_record(cls, count: int) -> float:
+    """Allocate `count` records as loaded from JSON and return bytes each."""
+    # Fresh string objects per record, as json.load produces them
+    rows = [(f"BOOK_{n:04d}", f"Title {n}", "".join(["Author ", str(n % 500)]),
+             "".join(Book.GENRES[n % len(Book.GENRES)])) for n in range(count)]
+    tracemalloc.start()
+    records = [cls(book_id, title, author, genre) for book_id, title, author, genre in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size / count
+
+
+def main(count: int) -> None:
+    legacy = bytes_per_record(DictBook, count)
+    compact = bytes_per_record(Book, count)
+    print(f"{count} records")
+    print(f"  __dict__ layout: {legacy:8.1f} bytes/record")
+    print(f"  compact layout:  {compact:8.1f} bytes/record ({compact / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
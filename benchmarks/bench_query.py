@@ -0,0 +1,71 @@
+"""
+Benchmark: compiled queries against the previous search_items
+=============================================================
+Times the same criteria three ways over a list of book dicts: the
+previous search_items (a generator of fold comparisons per item), a Query
+compiled once and reused, and search_items, which now compiles per call.
+Then times Library.search_books on criteria no index can answer, where
+books used to be converted to dicts before filtering.
+
+Run with: python -m benchmarks.bench_query [books]
+"""
+
+import sys
+import tempfile
+import time
+
+from exercises.src.project import Book, Library, compile_query, fold, search_items
+
+CRITERIA = {
+    "equality": {"title": "Title 77", "genre": "Science"},
+    "selective first": {"available": False, "title__contains": "7"},
+    "range + in": {"book_id__gte": "BOOK_5000", "genre__in": ["Fiction", "History"]},
+}
+
+
+def legacy_search_items(items: list, **criteria) -> list:
+    """search_items before compiled queries."""
+    results = []
+    for item in items:
+        if all(fold(item.get(key)) == fold(value) for key, value in criteria.items()):
+            results.append(item)
+    return results
+
+
+def mean_us(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(count: int) -> None:
+    books = [{"book_id": f"BOOK_{n:04d}", "title": f"Title {n}", "author": f"Author {n % 500}",
+              "available": n % 10 != 0, "genre": Book.GENRES[n % len(Book.GENRES)]} for n in range(count)]
+    repeat = max(1, 200_000 // count)
+    print(f"{count} dicts, mean per search")
+    print(f"  {'criteria':<16} {'previous (us)':>14} {'compiled (us)':>14} {'per call (us)':>14}")
+    for label, criteria in CRITERIA.items():
+        query = compile_query(**criteria)
+        previous = (mean_us(lambda: legacy_search_items(books, **criteria), repeat)
+                    if "__" not in "".join(criteria) else float("nan"))
+        compiled = mean_us(lambda: query.filter(books), repeat)
+        per_call = mean_us(lambda: search_items(books, **criteria), repeat)
+        print(f"  {label:<16} {previous:>14.1f} {compiled:>14.1f} {per_call:>14.1f}")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        library = Library("Benchmark", data_dir, autosave=False)
+        with library.batch():
+            for book in books:
+                library.add_book(book["title"], book["author"], book["genre"])
+        criteria = {"title": "Title 77"}
+        previous = mean_us(lambda: legacy_search_items([book.to_dict() for book in library.books.values()],
+                                                       **criteria), repeat)
+        current = mean_us(lambda: library.search_books(**criteria), repeat)
+    print(f"Library.search_books(title=...), {count} books")
+    print(f"  previous (to_dict + scan): {previous:>10.1f} us")
+    print(f"  compiled predicate:        {current:>10.1f} us")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,59 @@
+"""
+Benchmark: bytes written per Library mutation
+=============================================
+Runs a mixed front-desk workload (new borrowers, checkouts, returns) on a
+pre-built catalog and reports bytes written per operation from
+Library.save_metrics, for the default JSON mode with dirty tracking, for
+journal mode, and for the old behaviour of rewriting every file.
+
+Run with: python -m benchmarks.bench_save_io [books] [operations]
+"""
+
+import random
+import sys
+import tempfile
+
+from exercises.src.project import Book, Library
+
+
+def run_workload(library: Library, operations: int, force: bool = False) -> float:
+    """Return bytes written per operation for a seeded mixed workload."""
+    rng = random.Random(42)
+    book_ids = list(library.books)
+    start = library.save_metrics["bytes_written"]
+    for n in range(operations):
+        roll = rng.random()
+        if roll < 0.2 or not library.borrowers:
+            library.add_borrower(f"User {n}", f"user{n}@test.com")
+        else:
+            borrower_id = rng.choice(list(library.borrowers))
+            book_id = rng.choice(book_ids)
+            if not library.checkout_book(book_id, borrower_id):
+                library.return_book(book_id, borrower_id)
+        if force:
+            library.save(force=True)
+    return (library.save_metrics["bytes_written"] - start) / operations
+
+
+def build(data_dir: str, books: int, **options) -> Library:
+    library = Library("Benchmark", data_dir, **options)
+    with library.batch():
+        for n in range(books):
+            library.add_book(f"Title {n}", f"Author {n % 500}", Book.GENRES[n % len(Book.GENRES)])
+    library.save()
+    return library
+
+
+def main(books: int, operations: int) -> None:
+    print(f"{books} books, {operations} operations")
+    for label, options, force in (("rewrite everything", {"autosave": False}, True),
+                                  ("dirty tracking", {}, False),
+                                  ("journal", {"journal": True, "checkpoint_every": 0}, False)):
+        with tempfile.TemporaryDirectory() as data_dir:
+            per_op = run_workload(build(data_dir, books, **options), operations, force)
+        print(f"  {label:<20} {per_op:>12,.0f} bytes/op")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [10_000, 500]))
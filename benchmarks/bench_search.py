@@ -0,0 +1,46 @@
+"""
+Benchmark: Library.search_books with and without secondary indexes
+==================================================================
+Builds catalogs of growing size and times equality searches on indexed
+fields against the linear scan used when no index is registered.
+
+Run with: python -m benchmarks.bench_search [sizes...]
+"""
+
+import sys
+import tempfile
+import time
+
+from exercises.src.project import Book, Library
+
+AUTHORS = [f"Author {n}" for n in range(500)]
+
+
+def build_library(size: int, data_dir: str, indexed_fields: tuple) -> Library:
+    """Create a Library holding `size` synthetic books."""
+    library = Library("Benchmark", data_dir, indexed_fields=indexed_fields)
+    with library.batch():
+        for n in range(size):
+            library.add_book(f"Title {n}", AUTHORS[n % len(AUTHORS)], Book.GENRES[n % len(Book.GENRES)])
+    return library
+
+
+def time_search(library: Library, repeat: int = 50) -> float:
+    """Return the mean latency of a selective search, in microseconds."""
+    start = time.perf_counter()
+    for n in range(repeat):
+        library.search_books(author=AUTHORS[n % len(AUTHORS)], genre="Science")
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(sizes: list) -> None:
+    print(f"{'books':>10} {'indexed (us)':>14} {'scan (us)':>14}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as indexed_dir, tempfile.TemporaryDirectory() as scan_dir:
+            indexed = time_search(build_library(size, indexed_dir, Library.DEFAULT_INDEXES))
+            scan = time_search(build_library(size, scan_dir, ()), repeat=5)
+        print(f"{size:>10} {indexed:>14.1f} {scan:>14.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,61 @@
+"""
+Benchmark: search_books with and without the search cache
+=========================================================
+Replays a read-heavy mix: repeated search_books(genre=..., available=True)
+and search_books(author=...) calls with a checkout or return every
+mutate_every searches, on a synthetic catalog (see benchmarks.synthetic).
+Reports mean search time and the cache's hit rate.
+
+Run with: python -m benchmarks.bench_search_cache [books] [mutate_every]
+"""
+
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+from exercises.src.project import Book, Library
+
+SEARCHES = 20_000
+
+
+def run(count: int, mutate_every: int, cache_size: int) -> tuple:
+    with tempfile.TemporaryDirectory() as data_dir:
+        library = Library("Bench", data_dir, autosave=False, search_cache_size=cache_size)
+        synthetic.populate(library, count, max(10, count // 10))
+        authors = sorted({book.author for book in library.books.values()})[:20]
+        queries = [{"genre": genre, "available": True} for genre in Book.GENRES]
+        queries += [{"author": author} for author in authors]
+        loans = synthetic.loan_pattern(count, max(10, count // 10))
+        lent = []
+
+        elapsed = 0.0
+        for n in range(SEARCHES):
+            if n % mutate_every == 0:
+                if lent and n % (2 * mutate_every) == 0:
+                    library.return_book(*lent.pop())
+                else:
+                    book_number, borrower_number = next(loans)
+                    loan = (f"BOOK_{book_number:04d}", f"USER_{borrower_number:04d}")
+                    if library.checkout_book(*loan):
+                        lent.append(loan)
+            criteria = queries[n % len(queries)]
+            start = time.perf_counter()
+            library.search_books(**criteria)
+            elapsed += time.perf_counter() - start
+        info = library.search_cache_info()
+    return elapsed / SEARCHES * 1e6, info.get("hit_rate")
+
+
+def main(count: int, mutate_every: int) -> None:
+    print(f"{count} books, {SEARCHES} searches, a loan change every {mutate_every} searches")
+    for cache_size in (0, 64):
+        mean, hit_rate = run(count, mutate_every, cache_size)
+        label = f"cache {cache_size}" if cache_size else "no cache"
+        rate = "" if hit_rate is None else f"  hit rate {hit_rate:.0%}"
+        print(f"  {label:<10} {mean:>10.1f} us per search{rate}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,61 @@
+"""
+Benchmark: Library startup from JSON and binary snapshots
+=========================================================
+Writes the same synthetic catalog as JSON files and as a binary snapshot,
+then times reading the snapshot into Book/Borrower objects and a complete
+Library() startup (indexes and text index included) for each format.
+
+Run with: python -m benchmarks.bench_startup [books ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from exercises.src.binary_snapshot import write_snapshot
+from exercises.src.files import save_json
+from exercises.src.project import Book, Library, _gc_paused
+
+
+def write_catalog(data_dir: str, count: int) -> None:
+    """Write `count` books and count // 10 borrowers in both formats."""
+    books = [{"book_id": f"BOOK_{n:04d}", "title": f"Title {n}", "author": f"Author {n % 5000}",
+              "available": n % 7 != 0, "genre": Book.GENRES[n % len(Book.GENRES)]}
+             for n in range(1, count + 1)]
+    borrowers = [{"borrower_id": f"USER_{n:04d}", "name": f"User {n}", "email": f"user{n}@test.com",
+                  "borrowed_books": [f"BOOK_{n * 7:04d}"] if n * 7 <= count else []}
+                 for n in range(1, count // 10 + 1)]
+    sequences = {"BOOK": count, "USER": count // 10}
+    save_json(os.path.join(data_dir, "library_books.json"), {book["book_id"]: book for book in books})
+    save_json(os.path.join(data_dir, "library_borrowers.json"),
+              {borrower["borrower_id"]: borrower for borrower in borrowers})
+    save_json(os.path.join(data_dir, "library_meta.json"), {"sequences": sequences})
+    write_snapshot(os.path.join(data_dir, "library_snapshot.bin"), books, borrowers, sequences)
+
+
+def timed(function) -> float:
+    with _gc_paused():
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+
+def main(sizes: list) -> None:
+    print(f"{'books':>10} {'format':>7} {'file MB':>8} {'read s':>8} {'startup s':>10}")
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_catalog(data_dir, count)
+            # First start builds and saves the text index shared by both runs
+            Library("Benchmark", data_dir).close()
+            for snapshot_format, files in (("json", ("library_books.json", "library_borrowers.json")),
+                                           ("binary", ("library_snapshot.bin",))):
+                size = sum(os.path.getsize(os.path.join(data_dir, name)) for name in files)
+                library = Library("Benchmark", data_dir, snapshot_format=snapshot_format)
+                read = timed(library._load_json)
+                startup = timed(lambda: Library("Benchmark", data_dir, snapshot_format=snapshot_format))
+                print(f"{count:>10,} {snapshot_format:>7} {size / 1e6:>8.1f} {read:>8.2f} {startup:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,207 @@
+"""
+Benchmark: Library operations across catalog sizes
+==================================================
+Builds a deterministic synthetic catalog (see benchmarks.synthetic) for
+each size and times add_book, add_borrower, checkout_book, return_book,
+search_books, get_statistics, save and load one call at a time. Reports
+ops/sec and p50/p99 latency per operation and the peak RSS of the run.
+
+Each size runs in its own process, so its peak RSS is its own. Results are
+written as JSON; pass an earlier file as --baseline to print the change.
+
+Library options are passed through unchanged, so with the default
+autosave=True the mutation timings include writing the catalog; compare
+with --options '{"autosave": false}' for the in-memory cost alone.
+
+Run with:
+    python -m benchmarks.bench_suite --sizes 1000 10000 --output results.json
+    python -m benchmarks.bench_suite --sizes 1000000 --options '{"journal": true}'
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+from benchmarks import synthetic
+from exercises.src.project import Library
+
+OPERATIONS = ("add_book", "add_borrower", "checkout_book", "return_book",
+              "search_books", "get_statistics", "save", "load")
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(latencies_ns: list) -> dict:
+    latencies = sorted(latencies_ns)
+    total = sum(latencies)
+    return {
+        "count": len(latencies),
+        "ops_per_sec": len(latencies) / (total / 1e9) if total else 0.0,
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+    }
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def timed(call) -> int:
+    start = time.perf_counter_ns()
+    call()
+    return time.perf_counter_ns() - start
+
+
+def run_size(size: int, operations: int, seed: int, options: dict) -> dict:
+    """Benchmark every operation on a catalog of size books."""
+    borrower_count = max(10, size // 10)
+    # With autosave every mutation writes the catalog, so mutations and
+    # whole-catalog operations get fewer repetitions as the catalog grows
+    mutations = max(20, min(operations, 1_000_000 // size))
+    heavy = max(3, min(operations, 100_000 // size))
+    latencies = {operation: [] for operation in OPERATIONS}
+    with tempfile.TemporaryDirectory() as data_dir:
+        library = Library("Benchmark", data_dir, **options)
+        start = time.perf_counter()
+        synthetic.populate(library, size, borrower_count, seed)
+        library.save(force=True)
+        build_seconds = time.perf_counter() - start
+
+        new_books = synthetic.books(mutations, seed + 1)
+        for title, author, genre in new_books:
+            latencies["add_book"].append(timed(lambda: library.add_book(title, author, genre)))
+        for name, email in synthetic.borrowers(mutations, seed + 1):
+            latencies["add_borrower"].append(timed(lambda: library.add_borrower(name, email)))
+
+        loans = []
+        pattern = synthetic.loan_pattern(size, borrower_count, seed)
+        attempts = 0
+        while len(loans) < mutations and attempts < mutations * 20:
+            attempts += 1
+            book_number, borrower_number = next(pattern)
+            book_id, borrower_id = f"BOOK_{book_number:04d}", f"USER_{borrower_number:04d}"
+            if not library.books[book_id].available or not library.borrowers[borrower_id].can_borrow():
+                continue
+            latencies["checkout_book"].append(timed(lambda: library.checkout_book(book_id, borrower_id)))
+            loans.append((book_id, borrower_id))
+        for book_id, borrower_id in loans:
+            latencies["return_book"].append(timed(lambda: library.return_book(book_id, borrower_id)))
+
+        queries = [{"author": author} for _, author, _ in synthetic.books(operations, seed)]
+        queries[::3] = [{"genre": "History", "available": True}] * len(queries[::3])
+        for criteria in queries:
+            latencies["search_books"].append(timed(lambda: library.search_books(**criteria)))
+        for _ in range(operations):
+            latencies["get_statistics"].append(timed(library.get_statistics))
+
+        for _ in range(heavy):
+            latencies["save"].append(timed(lambda: library.save(force=True)))
+        library.close()
+        for _ in range(heavy):
+            latencies["load"].append(timed(lambda: Library("Benchmark", data_dir, **options).close()))
+
+    return {
+        "books": size,
+        "borrowers": borrower_count,
+        "build_seconds": build_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "operations": {operation: summarize(values) for operation, values in latencies.items() if values},
+    }
+
+
+def _run_in_child(args: tuple, results) -> None:
+    results.put(run_size(*args))
+
+
+def run_isolated(size: int, operations: int, seed: int, options: dict) -> dict:
+    """run_size in a fresh process, so peak RSS covers this size only."""
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=_run_in_child, args=((size, operations, seed, options), results))
+    child.start()
+    result = results.get()
+    child.join()
+    return result
+
+
+def run_suite(sizes: list, operations: int = 200, seed: int = 0, options: dict = None,
+              isolate: bool = True) -> dict:
+    """Run every size and return the JSON-ready report."""
+    options = options or {}
+    run = run_isolated if isolate else run_size
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "operations": operations,
+            "options": options,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {str(size): run(size, operations, seed, options) for size in sizes},
+    }
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """Lines giving the p50 change of every operation present in both reports."""
+    lines = []
+    for size, result in report["results"].items():
+        before = baseline.get("results", {}).get(size)
+        if before is None:
+            continue
+        for operation, stats in result["operations"].items():
+            old = before["operations"].get(operation)
+            if old and old["p50_us"]:
+                change = stats["p50_us"] / old["p50_us"] - 1
+                lines.append(f"{size:>10} {operation:<15} p50 {old['p50_us']:>10.1f} -> "
+                             f"{stats['p50_us']:>10.1f} us ({change:+.0%})")
+    return lines
+
+
+def print_report(report: dict) -> None:
+    for size, result in report["results"].items():
+        rss = result["peak_rss_mb"]
+        print(f"{int(size):,} books, built in {result['build_seconds']:.1f} s, "
+              f"peak RSS {'n/a' if rss is None else f'{rss:.0f} MB'}")
+        print(f"  {'operation':<15} {'ops/sec':>12} {'p50 us':>10} {'p99 us':>10}")
+        for operation, stats in result["operations"].items():
+            print(f"  {operation:<15} {stats['ops_per_sec']:>12,.0f} {stats['p50_us']:>10.1f} {stats['p99_us']:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Library operations across catalog sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--operations", type=int, default=200, help="timed calls per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--options", type=json.loads, default={}, help="Library keyword arguments as JSON")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.operations, args.seed, args.options)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            print("\n".join(compare(report, json.load(f))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Deterministic synthetic library data for benchmarks
+===================================================
+Every generator takes a seed and yields the same sequence for it on every
+run and platform (random.Random is seeded per stream), so results of
+different runs measure the code, not the data.
+
+    books(count, seed)                 -> (title, author, genre) tuples
+    borrowers(count, seed)             -> (name, email) tuples
+    loan_pattern(books, borrowers, seed) -> endless (book_number, borrower_number)
+    populate(library, books, borrowers, seed) fills a Library in one batch
+"""
+
+import random
+
+from exercises.src.project import Book
+
+WORDS = ("river", "shadow", "python", "garden", "empire", "quantum", "silent", "history",
+         "machine", "ocean", "winter", "secret", "atlas", "engine", "stars", "letters")
+SURNAMES = ("Smith", "Jones", "Garcia", "Chen", "Okafor", "Novak", "Silva", "Kim",
+            "Haddad", "Larsen", "Patel", "Rossi", "Nakamura", "Dubois", "Ivanova", "Murphy")
+# Skewed like a real catalog: far more fiction than history
+GENRE_WEIGHTS = (40, 25, 15, 8, 12)
+
+
+def books(count: int, seed: int = 0):
+    """Yield count (title, author, genre) tuples; about count / 20 distinct authors."""
+    rng = random.Random(f"books-{seed}")
+    authors = [f"{rng.choice(SURNAMES)} {n}" for n in range(max(1, count // 20))]
+    for n in range(count):
+        title = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4)))
+        yield f"{title} {n}", rng.choice(authors), rng.choices(Book.GENRES, GENRE_WEIGHTS)[0]
+
+
+def borrowers(count: int, seed: int = 0):
+    """Yield count (name, email) tuples."""
+    rng = random.Random(f"borrowers-{seed}")
+    for n in range(count):
+        surname = rng.choice(SURNAMES)
+        yield f"Reader {surname} {n}", f"reader{n}@{surname.lower()}.example"
+
+
+def loan_pattern(book_count: int, borrower_count: int, seed: int = 0):
+    """
+    Yield (book_number, borrower_number) pairs, 1-based, forever.
+
+    Book popularity follows a Zipf-like curve (a few titles are borrowed
+    over and over) and borrowers are picked uniformly.
+    """
+    rng = random.Random(f"loans-{seed}")
+    while True:
+        book = min(book_count, int(rng.paretovariate(1.2)))
+        # Spread the popular numbers over the catalog instead of the first IDs
+        book = (book * 7919) % book_count + 1
+        yield book, rng.randint(1, borrower_count)
+
+
+def populate(library, book_count: int, borrower_count: int, seed: int = 0) -> None:
+    """Add book_count books and borrower_count borrowers in one batch."""
+    with library.batch():
+        for title, author, genre in books(book_count, seed):
+            library.add_book(title, author, genre)
+        for name, email in borrowers(borrower_count, seed):
+            library.add_borrower(name, email)
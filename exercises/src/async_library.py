@@ -0,0 +1,185 @@
+"""
+AsyncLibrary: asyncio front-end for the Library
+===============================================
+Mirrors the Library API with async methods for use inside an event loop.
+
+Mutations change memory immediately and schedule a flush. All mutations
+that arrive within flush_interval seconds share one flush. Both halves of
+the flush, serializing the pending records (to_dict, the whole catalog
+with the JSON backend) and the disk write, run in an executor, so request
+latency never includes a full-catalog JSON dump. Mutations wait (without
+blocking the event loop) while a flush serializes; reads do not. Pass
+durable=True to wait until the change is on disk. A failed write raises
+in the durable callers (others find it logged) and its changes stay
+pending for the next flush.
+
+Example:
+    async with AsyncLibrary("Main", "data") as library:
+        book = await library.add_book("Python 101", "Smith", "Technology")
+        await library.checkout_book(book.book_id, "USER_0001", durable=True)
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from exercises.src.project import Book, Borrower, Library
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLibrary:
+    """
+    Async wrapper around a Library created with autosave=False.
+
+    Attributes:
+        library (Library): The wrapped in-memory library
+        flush_interval (float): Seconds to collect mutations before writing
+        flushes (int): Number of writes performed so far
+
+    Methods:
+        add_book / add_borrower / checkout_book / return_book: Async
+            mutations; pass durable=True to wait for the write
+        search_books / text_search / fuzzy_search / get_available_books /
+            get_borrower_books / who_has / overdue / due_between /
+            get_statistics: Async reads from memory
+        flush(): Write pending changes now
+        close(): Flush and close the library
+    """
+
+    def __init__(self, name: str, data_dir: str = ".", flush_interval: float = 0.05,
+                 executor=None, **library_options):
+        self.library = Library(name, data_dir, autosave=False, **library_options)
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self._executor = executor
+        self._timer = None
+        self._scheduled = None
+        # Timer-started flushes, referenced until done so they cannot be garbage-collected
+        self._tasks = set()
+        self._write_lock = asyncio.Lock()
+        # Held by mutations, and by a flush while it serializes in the executor
+        self._state_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncLibrary":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def add_book(self, title: str, author: str, genre: str, durable: bool = False) -> Book:
+        async with self._state_lock:
+            book = self.library.add_book(title, author, genre)
+        await self._persist(durable)
+        return book
+
+    async def add_borrower(self, name: str, email: str, durable: bool = False) -> Borrower:
+        async with self._state_lock:
+            borrower = self.library.add_borrower(name, email)
+        await self._persist(durable)
+        return borrower
+
+    async def checkout_book(self, book_id: str, borrower_id: str, durable: bool = False,
+                            checked_out: datetime = None) -> bool:
+        async with self._state_lock:
+            changed = self.library.checkout_book(book_id, borrower_id, checked_out)
+        if changed:
+            await self._persist(durable)
+        return changed
+
+    async def return_book(self, book_id: str, borrower_id: str, durable: bool = False) -> bool:
+        async with self._state_lock:
+            changed = self.library.return_book(book_id, borrower_id)
+        if changed:
+            await self._persist(durable)
+        return changed
+
+    async def search_books(self, query=None, **criteria) -> list:
+        return self.library.search_books(query, **criteria)
+
+    async def text_search(self, query: str, **options) -> list:
+        return self.library.text_search(query, **options)
+
+    async def fuzzy_search(self, query: str, **options) -> list:
+        return self.library.fuzzy_search(query, **options)
+
+    async def get_available_books(self) -> list:
+        return self.library.get_available_books()
+
+    async def get_borrower_books(self, borrower_id: str) -> list:
+        return self.library.get_borrower_books(borrower_id)
+
+    async def who_has(self, book_id: str) -> str:
+        return self.library.who_has(book_id)
+
+    async def overdue(self, as_of=None) -> list:
+        return self.library.overdue(as_of)
+
+    async def due_between(self, start, end) -> list:
+        return self.library.due_between(start, end)
+
+    async def get_statistics(self) -> dict:
+        return self.library.get_statistics()
+
+    async def flush(self) -> None:
+        """Write every pending change now instead of waiting for the timer."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._run_flush()
+
+    async def close(self) -> None:
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.library.close)
+
+    async def _persist(self, durable: bool) -> None:
+        future = self._schedule_flush()
+        if durable:
+            # Shielded: a cancelled request must not cancel everyone's write
+            await asyncio.shield(future)
+
+    def _schedule_flush(self) -> asyncio.Future:
+        """Return the future of the next flush, starting its timer if needed."""
+        if self._scheduled is None:
+            loop = asyncio.get_running_loop()
+            self._scheduled = loop.create_future()
+            self._timer = loop.call_later(self.flush_interval, self._start_timed_flush)
+        return self._scheduled
+
+    def _start_timed_flush(self) -> None:
+        task = asyncio.get_running_loop().create_task(self._timed_flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _timed_flush(self) -> None:
+        try:
+            await self._run_flush()
+        except Exception:
+            # Nobody awaits a timer; the changes stay pending for the next flush
+            logger.exception("Flush of %r failed", self.library.name)
+
+    def _take_pending(self) -> tuple:
+        return self.library._unwritten(), self.library._take_pending()
+
+    async def _run_flush(self) -> None:
+        future, self._scheduled = self._scheduled, None
+        self._timer = None
+        try:
+            # Writes happen one at a time and in the order they were taken
+            async with self._write_lock:
+                loop = asyncio.get_running_loop()
+                async with self._state_lock:
+                    unwritten, payload = await loop.run_in_executor(self._executor, self._take_pending)
+                if payload is not None:
+                    await loop.run_in_executor(self._executor, self.library._write_or_restore,
+                                               payload, unwritten)
+                    self.flushes += 1
+        except Exception as error:
+            if future is not None and not future.done():
+                future.set_exception(error)
+                # Mark it retrieved: durable callers still see it, and nobody else must
+                future.exception()
+            raise
+        if future is not None and not future.done():
+            future.set_result(None)
@@ -0,0 +1,162 @@
+"""
+Binary snapshot format for the Library
+======================================
+A single-file alternative to library_books.json, library_borrowers.json
+and library_meta.json that loads without parsing one dict per record.
+
+Layout (little-endian):
+    header:   MAGIC, VERSION (u16), string, book and borrower counts (u32)
+    sections, each prefixed by its length in bytes (u64), in this order:
+        string lengths      u32 per string, in characters
+        string heap         UTF-8, every distinct string once
+        book_id, title, author, genre
+                            u32 string refs, one column each
+        available           u8 per book
+        borrower_id, name, email
+                            u32 string refs, one column each
+        borrowed counts     u16 per borrower
+        borrowed_books      u32 string refs, all borrowers back to back
+        checked_out, due    u32 string refs, one per borrowed_books entry
+                            ("" for a loan without dates; version 2 on)
+        sequences           JSON
+
+Strings are interned: an author shared by 500 books, or a book_id that also
+appears in a borrower's list, is stored and decoded once.
+
+Use it through the Library:
+    library = Library("Main", "data", snapshot_format="binary")
+"""
+
+import json
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+MAGIC = b"LIBSNAP\0"
+VERSION = 2
+# Version 1 had no loan dates; it is still read
+READABLE_VERSIONS = (1, 2)
+HEADER = struct.Struct("<8sHIII")
+SECTION = struct.Struct("<Q")
+
+BOOK_COLUMNS = ("book_id", "title", "author", "genre")
+BORROWER_COLUMNS = ("borrower_id", "name", "email")
+
+
+def write_snapshot(path: str, books: list, borrowers: list, sequences: dict) -> int:
+    """
+    Write books and borrowers (as to_dict() produces them) to path.
+
+    The file is written next to path and renamed into place, so readers
+    never see a half-written snapshot.
+
+    Returns:
+        Number of bytes written
+    """
+    strings = {}
+
+    def refs(values) -> array:
+        return little_endian(array("I", [strings.setdefault(value, len(strings)) for value in values]))
+
+    columns = [refs(book[column] for book in books) for column in BOOK_COLUMNS]
+    columns.append(bytes(book["available"] for book in books))
+    columns += [refs(borrower[column] for borrower in borrowers) for column in BORROWER_COLUMNS]
+    columns.append(little_endian(array("H", [len(borrower["borrowed_books"]) for borrower in borrowers])))
+    columns.append(refs(book_id for borrower in borrowers for book_id in borrower["borrowed_books"]))
+    for position in (0, 1):  # checked_out, due
+        columns.append(refs(borrower.get("loan_dates", {}).get(book_id, ("", ""))[position]
+                            for borrower in borrowers for book_id in borrower["borrowed_books"]))
+    columns.append(json.dumps(sequences).encode("utf-8"))
+    heap = "".join(strings)
+    sections = [little_endian(array("I", map(len, strings))), heap.encode("utf-8")] + columns
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(strings), len(books), len(borrowers)))
+        for section in sections:
+            f.write(SECTION.pack(len(memoryview(section).cast("B"))))
+            f.write(section)
+        size = f.tell()
+    os.replace(temp_path, path)
+    return size
+
+
+def read_snapshot(path: str) -> dict:
+    """
+    Read a snapshot written by write_snapshot.
+
+    Returns:
+        {"books": {column: list}, "borrowers": {column: list},
+         "sequences": dict} with one list entry per record; the borrowers'
+        "borrowed_books" column holds a list of book_ids per borrower and
+        "loan_dates" a {book_id: (checked_out, due)} dict per borrower.
+        Raises FileNotFoundError if path does not exist and ValueError if
+        it is not a snapshot of a supported version.
+    """
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a library snapshot")
+    magic, version, string_count, book_count, borrower_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a library snapshot")
+    if version not in READABLE_VERSIONS:
+        raise ValueError(f"Unsupported snapshot version {version} in {path}")
+    sections = _sections(data, HEADER.size, path)
+
+    lengths = _column(next(sections), "I", string_count, path)
+    heap = str(next(sections), "utf-8")
+    offsets = [0, *accumulate(lengths)]
+    strings = [heap[start:end] for start, end in zip(offsets, offsets[1:])]
+    lookup = strings.__getitem__
+
+    books = {column: list(map(lookup, _column(next(sections), "I", book_count, path)))
+             for column in BOOK_COLUMNS}
+    books["available"] = list(map(bool, _column(next(sections), "B", book_count, path)))
+    borrowers = {column: list(map(lookup, _column(next(sections), "I", borrower_count, path)))
+                 for column in BORROWER_COLUMNS}
+    counts = _column(next(sections), "H", borrower_count, path)
+    borrowed = list(map(lookup, _column(next(sections), "I", sum(counts), path)))
+    ends = list(accumulate(counts))
+    borrowers["borrowed_books"] = [borrowed[end - count:end] for end, count in zip(ends, counts)]
+    if version >= 2:
+        checked_out = list(map(lookup, _column(next(sections), "I", len(borrowed), path)))
+        due = list(map(lookup, _column(next(sections), "I", len(borrowed), path)))
+        borrowers["loan_dates"] = [
+            {book_id: (checked_out[n], due[n]) for n, book_id in enumerate(borrowed[end - count:end], end - count)
+             if due[n]}
+            for end, count in zip(ends, counts)]
+    else:
+        borrowers["loan_dates"] = [{} for _ in counts]
+    sequences = json.loads(str(next(sections), "utf-8"))
+    return {"books": books, "borrowers": borrowers, "sequences": sequences}
+
+
+def _sections(data: memoryview, offset: int, path: str):
+    """Yield the length-prefixed sections of a snapshot in order."""
+    while True:
+        if offset + SECTION.size > len(data):
+            raise ValueError(f"Truncated library snapshot {path}")
+        (length,) = SECTION.unpack_from(data, offset)
+        offset += SECTION.size
+        if offset + length > len(data):
+            raise ValueError(f"Truncated library snapshot {path}")
+        yield data[offset:offset + length]
+        offset += length
+
+
+def _column(section: memoryview, typecode: str, count: int, path: str) -> array:
+    values = array(typecode)
+    values.frombytes(section)
+    if len(values) != count:
+        raise ValueError(f"Corrupt library snapshot {path}: expected {count} values, found {len(values)}")
+    return little_endian(values)
+
+
+def little_endian(values: array) -> array:
+    """Byte-swap in place on big-endian machines (the format is little-endian)."""
+    if sys.byteorder == "big" and values.itemsize > 1:
+        values.byteswap()
+    return values
@@ -0,0 +1,183 @@
+"""
+LibraryFederation: search many branch libraries in parallel
+===========================================================
+Each branch is a Library with its own data_dir. A federation starts
+worker processes that open their branches once and keep them loaded, then
+fans every query out to all workers at the same time and merges the
+answers, tagging each result with the branch it came from.
+
+Before answering, a worker calls reload_if_changed() on its branches, so
+changes the branch's own Library wrote since the last query are picked up
+at the cost of a few stat calls. Open the branches with concurrent=True
+(in the writers and in library_options here) if a query may run while a
+writer is saving, so a worker never reads a half-written file.
+
+Example:
+    with LibraryFederation({"north": "data/north", "south": "data/south"}) as federation:
+        federation.search_books(author="Smith")
+        # [{"branch": "north", "book_id": "BOOK_0003", ...}, ...]
+        federation.get_statistics()["total"]["available_books"]
+"""
+
+import multiprocessing
+
+from exercises.src.project import Library
+
+
+def _serve(branches: dict, library_options: dict, connection) -> None:
+    """Worker process: open branches, then answer requests until told to stop."""
+    try:
+        libraries = {name: Library(name, data_dir, **library_options) for name, data_dir in branches.items()}
+    except Exception as error:
+        connection.send(("error", error))
+        return
+    connection.send(("ready", None))
+    while True:
+        request = connection.recv()
+        if request is None:
+            return
+        method, args, kwargs = request
+        try:
+            answers = {}
+            for name, library in libraries.items():
+                library.reload_if_changed()
+                answers[name] = getattr(LibraryFederation, f"_{method}")(library, *args, **kwargs)
+            connection.send(("ok", answers))
+        except Exception as error:
+            connection.send(("error", error))
+
+
+class LibraryFederation:
+    """
+    Fan-out queries over many branch libraries held by warm worker processes.
+
+    Attributes:
+        branches (dict): branch name -> data_dir, in result order
+        processes (int): Number of worker processes; branches are spread
+            over them round-robin (default: one per branch, at most the CPU count)
+
+    Methods:
+        search_books(**criteria) -> list: Matching book dicts of every
+            branch, each with a "branch" key
+        get_available_books() -> list: Available book dicts, with "branch"
+        get_statistics() -> dict: {"branches": {name: stats}, "total": stats}
+        close(): Stop the workers
+
+    A query runs in every worker at once and costs the slowest worker's
+    time, not the sum. Errors raised in a worker are raised again here.
+    """
+
+    def __init__(self, branches: dict, library_options: dict = None, processes: int = None,
+                 mp_context: str = None):
+        if not branches:
+            raise ValueError("A federation needs at least one branch")
+        self.branches = dict(branches)
+        self.processes = min(processes or multiprocessing.cpu_count(), len(self.branches))
+        context = multiprocessing.get_context(mp_context)
+        assignments = [{} for _ in range(self.processes)]
+        for n, (name, data_dir) in enumerate(self.branches.items()):
+            assignments[n % self.processes][name] = data_dir
+        self._workers = []
+        for assigned in assignments:
+            parent, child = context.Pipe()
+            process = context.Process(target=_serve, args=(assigned, library_options or {}, child),
+                                      name=f"federation {', '.join(assigned)}", daemon=True)
+            process.start()
+            child.close()
+            self._workers.append((process, parent))
+        # Surface a branch that cannot be opened now rather than on the first query
+        try:
+            self._collect()
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> "LibraryFederation":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def search_books(self, **criteria) -> list:
+        """Search every branch (same criteria as Library.search_books)."""
+        return self._attributed(self._call("search_books", **criteria))
+
+    def get_available_books(self) -> list:
+        """Available books of every branch."""
+        return self._attributed(self._call("get_available_books"))
+
+    def get_statistics(self) -> dict:
+        """
+        Statistics of every branch and their sum.
+
+        Returns:
+            {"branches": {name: Library.get_statistics()}, "total": the
+            same fields added up over all branches}
+        """
+        branches = self._call("get_statistics")
+        total = {"total_books": 0, "available_books": 0, "checked_out": 0,
+                 "total_borrowers": 0, "books_by_genre": {}}
+        for stats in branches.values():
+            for field, value in stats.items():
+                if field == "books_by_genre":
+                    for genre, count in value.items():
+                        total[field][genre] = total[field].get(genre, 0) + count
+                else:
+                    total[field] += value
+        return {"branches": branches, "total": total}
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for process, connection in self._workers:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process, _ in self._workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
+
+    # Run inside the workers, one branch at a time
+
+    @staticmethod
+    def _search_books(library: Library, **criteria) -> list:
+        return library.search_books(**criteria)
+
+    @staticmethod
+    def _get_available_books(library: Library) -> list:
+        return [book.to_dict() for book in library.get_available_books()]
+
+    @staticmethod
+    def _get_statistics(library: Library) -> dict:
+        return library.get_statistics()
+
+    def _call(self, method: str, *args, **kwargs) -> dict:
+        """Send a request to every worker, then gather branch name -> answer."""
+        if not self._workers:
+            raise RuntimeError("The federation is closed")
+        for _, connection in self._workers:
+            connection.send((method, args, kwargs))
+        return self._collect()
+
+    def _collect(self) -> dict:
+        """Wait for every worker's reply and merge them in branch order."""
+        answers = {}
+        errors = []
+        for process, connection in self._workers:
+            try:
+                status, value = connection.recv()
+            except EOFError:
+                status, value = "error", RuntimeError(f"Worker {process.name!r} exited")
+            if status == "error":
+                errors.append(value)
+            elif value is not None:
+                answers.update(value)
+        if errors:
+            raise errors[0]
+        return {name: answers[name] for name in self.branches if name in answers}
+
+    def _attributed(self, answers: dict) -> list:
+        return [{"branch": name, **book} for name, books in answers.items() for book in books]
@@ -0,0 +1,196 @@
+"""
+Per-operation metrics for the Library
+=====================================
+Opt-in instrumentation that records, for every public Library method and
+for the two halves of persistence, the number of calls, their cumulative
+and percentile latency, and the bytes serialized and written to disk
+while they ran (see Library.save_metrics).
+
+    library = Library("Main", "data", metrics=True)
+    library.metrics()["add_book"]["p99_ms"]
+    library.write_metrics("/var/lib/node_exporter/library.prom")
+
+Operations:
+    every name in LibraryMetrics.OPERATIONS     public methods, timed end to end
+    "serialize"   converting Books and Borrowers to dicts (to_dict)
+    "write"       JSON encoding and disk I/O of those dicts (save_json,
+                  the binary snapshot, the journal or the database)
+
+Timings are inclusive: an add_book that autosaves also counts towards
+"serialize" and "write", and checkpoint towards save. A call nested in
+another call of the same operation (_snapshot_payload inside
+_take_pending, both "serialize") is not counted twice.
+
+Disabled instrumentation costs nothing: the Library is not touched at all.
+Enabled, each instrumented method is replaced on the instance by a
+wrapper, so the class and other Library instances are unaffected.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+# Latencies kept per operation for percentiles (the most recent calls)
+SAMPLE_SIZE = 1024
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class OperationStats:
+    """Counters and recent latencies of one operation."""
+
+    __slots__ = ("calls", "errors", "total_seconds", "max_seconds", "bytes_serialized", "bytes_written",
+                 "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_serialized = 0
+        self.bytes_written = 0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def quantiles(self) -> dict:
+        """Nearest-rank QUANTILES of the recent latencies, in seconds."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return dict.fromkeys(QUANTILES, 0.0)
+        return {fraction: ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] for fraction in QUANTILES}
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": self.total_seconds * 1000,
+            "mean_ms": self.total_seconds * 1000 / self.calls if self.calls else 0.0,
+            "max_ms": self.max_seconds * 1000,
+            **{f"p{round(fraction * 100)}_ms": seconds * 1000 for fraction, seconds in self.quantiles().items()},
+            "bytes_serialized": self.bytes_serialized,
+            "bytes_written": self.bytes_written,
+        }
+
+
+class LibraryMetrics:
+    """
+    Collects OperationStats for one Library.
+
+    Attributes:
+        name (str): Library name, used as the Prometheus "library" label
+        operations (dict): operation name -> OperationStats
+
+    Methods:
+        instrument(library): Wrap the library's methods
+        snapshot() -> dict: operation -> stats dict (see OperationStats.to_dict)
+        prometheus() -> str: The same in Prometheus text exposition format
+        write_prometheus(path): Write prometheus() to a file atomically
+        reset(): Forget everything recorded so far
+    """
+
+    OPERATIONS = ("add_book", "add_borrower", "checkout_book", "return_book",
+                  "search_books", "search_books_page", "text_search", "fuzzy_search",
+                  "get_available_books", "get_borrower_books", "who_has", "check_loans",
+                  "overdue", "due_between",
+                  "get_statistics", "import_books", "import_borrowers",
+                  "load", "save", "flush", "checkpoint", "publish_catalog")
+    # Private methods timed as persistence phases
+    PHASES = {"_snapshot_payload": "serialize", "_take_pending": "serialize", "_write_payload": "write"}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.operations = {}
+        self._lock = threading.Lock()
+        self._active = threading.local()
+
+    def instrument(self, library) -> None:
+        """Replace the instrumented methods of library (an instance) with timed wrappers."""
+        counters = lambda: (library.save_metrics["bytes_serialized"], library.save_metrics["bytes_written"])
+        for method in self.OPERATIONS:
+            setattr(library, method, self._timed(method, getattr(library, method), counters))
+        for method, phase in self.PHASES.items():
+            setattr(library, method, self._timed(phase, getattr(library, method), counters))
+
+    def _timed(self, operation: str, method, counters):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            active = self._active.__dict__.setdefault("names", set())
+            if operation in active:
+                return method(*args, **kwargs)
+            active.add(operation)
+            serialized, written = counters()
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                active.discard(operation)
+                seconds = time.perf_counter() - start
+                serialized_after, written_after = counters()
+                self.record(operation, seconds, written_after - written, failed, serialized_after - serialized)
+        return wrapper
+
+    def record(self, operation: str, seconds: float, bytes_written: int = 0, failed: bool = False,
+               bytes_serialized: int = 0) -> None:
+        """Add one call of operation."""
+        with self._lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = OperationStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes_serialized += bytes_serialized
+            stats.bytes_written += bytes_written
+            stats.samples.append(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations = {}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {operation: stats.to_dict() for operation, stats in sorted(self.operations.items())}
+
+    def prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        library = _label(self.name)
+        with self._lock:
+            operations = sorted(self.operations.items())
+            lines = ["# HELP library_operation_seconds Latency of Library operations over recent calls.",
+                     "# TYPE library_operation_seconds summary"]
+            for operation, stats in operations:
+                labels = f'library="{library}",operation="{_label(operation)}"'
+                for fraction, seconds in stats.quantiles().items():
+                    lines.append(f'library_operation_seconds{{{labels},quantile="{fraction}"}} {seconds:.9f}')
+                lines.append(f"library_operation_seconds_sum{{{labels}}} {stats.total_seconds:.9f}")
+                lines.append(f"library_operation_seconds_count{{{labels}}} {stats.calls}")
+            for metric, help_text, field in (
+                    ("library_operation_errors_total", "Library operations that raised.", "errors"),
+                    ("library_operation_bytes_serialized_total",
+                     "Bytes serialized for persistence during Library operations.", "bytes_serialized"),
+                    ("library_operation_bytes_written_total", "Bytes written to disk during Library operations.",
+                     "bytes_written")):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for operation, stats in operations:
+                    lines.append(f'{metric}{{library="{library}",operation="{_label(operation)}"}} '
+                                 f"{getattr(stats, field)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write prometheus() to path, replacing it atomically so a collector
+        (such as the node_exporter textfile collector) never reads half a file.
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(temp_path, path)
+
+
+def _label(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,349 @@
+"""
+Memory-mapped read-only catalog
+===============================
+Read-only worker processes can answer search_books, get_available_books
+and get_borrower_books from one catalog file instead of each holding its
+own copy of Library.books. The file is memory-mapped, so all readers share
+the same pages of the OS page cache, and fields are decoded only when a
+result is actually looked at.
+
+The writer publishes a version with Library.publish_catalog(); readers
+notice the replaced file on their next call and re-map it.
+
+Example:
+    Library("Main", "data").publish_catalog()
+    reader = ReadOnlyLibrary("Main", "data")
+    reader.search_books(author="Smith")
+
+File layout (little-endian):
+    header:    MAGIC, VERSION (u16), book, borrower and author counts (u32),
+               offsets of the sections below (u64)
+    books:     fixed-width records in book_id order: heap references
+               (offset, length) of book_id, title and author, genre code,
+               available flag
+    borrowers: fixed-width records in borrower_id order: heap references of
+               borrower_id, name and email, then a slice of loans
+    loans:     u32 book record numbers
+    authors:   case-folded author heap reference and a slice of postings,
+               sorted by folded author
+    postings:  u32 book record numbers
+    heap:      UTF-8 strings, every distinct string once
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from exercises.src.binary_snapshot import little_endian
+from exercises.src.project import Book, compile_query, fold, id_number
+
+MAGIC = b"LIBCATL\0"
+VERSION = 1
+HEADER = struct.Struct("<8sH2xIIIQQQQQQ")
+BOOK_RECORD = struct.Struct("<IIIIIIBB2x")
+BORROWER_RECORD = struct.Struct("<IIIIIIII")
+AUTHOR_RECORD = struct.Struct("<IIII")
+
+
+def _id_order(item_id: str) -> tuple:
+    """Sort key giving the order Library uses for results (BOOK_2 < BOOK_10)."""
+    if not item_id.rpartition("_")[2].isdigit():
+        return -1, item_id
+    return id_number(item_id), item_id
+
+
+def publish_catalog(path: str, books: list, borrowers: list) -> int:
+    """
+    Write books and borrowers (as to_dict() produces them) as a catalog.
+
+    The file is written next to path and renamed into place, so readers
+    that still map the previous version keep a consistent view of it.
+
+    Returns:
+        Number of bytes written
+    """
+    books = sorted(books, key=lambda book: _id_order(book["book_id"]))
+    borrowers = sorted(borrowers, key=lambda borrower: _id_order(borrower["borrower_id"]))
+    heap = bytearray()
+    strings = {}
+
+    def ref(value: str) -> tuple:
+        if value not in strings:
+            data = value.encode("utf-8")
+            strings[value] = (len(heap), len(data))
+            heap.extend(data)
+        return strings[value]
+
+    position = {book["book_id"]: n for n, book in enumerate(books)}
+    book_records = b"".join(
+        BOOK_RECORD.pack(*ref(book["book_id"]), *ref(book["title"]), *ref(book["author"]),
+                         Book.GENRE_CODES[book["genre"]], book["available"])
+        for book in books)
+
+    loans = array("I")
+    borrower_records = []
+    for borrower in borrowers:
+        start = len(loans)
+        loans.extend(position[book_id] for book_id in borrower["borrowed_books"] if book_id in position)
+        borrower_records.append(BORROWER_RECORD.pack(
+            *ref(borrower["borrower_id"]), *ref(borrower["name"]), *ref(borrower["email"]),
+            start, len(loans) - start))
+
+    by_author = {}
+    for n, book in enumerate(books):
+        by_author.setdefault(fold(book["author"]), []).append(n)
+    postings = array("I")
+    author_records = []
+    for author in sorted(by_author):
+        author_records.append(AUTHOR_RECORD.pack(*ref(author), len(postings), len(by_author[author])))
+        postings.extend(by_author[author])
+
+    sections = [book_records, b"".join(borrower_records), little_endian(loans),
+                b"".join(author_records), little_endian(postings), heap]
+    offsets = []
+    offset = HEADER.size
+    for section in sections:
+        offsets.append(offset)
+        offset += len(memoryview(section).cast("B"))
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(books), len(borrowers), len(author_records), *offsets))
+        for section in sections:
+            f.write(section)
+        size = f.tell()
+    os.replace(temp_path, path)
+    return size
+
+
+class Catalog:
+    """
+    One mapped version of a catalog file.
+
+    Records are read with struct.unpack_from straight from the mapping;
+    nothing is decoded up front.
+
+    Attributes:
+        path (str): Catalog file
+        identity (tuple): (inode, mtime, size) of the mapped version
+        book_count / borrower_count (int): Number of records
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not a library catalog")
+        (magic, version, self.book_count, self.borrower_count, self._author_count,
+         self._books, self._borrowers, self._loans, self._authors, self._postings,
+         self._heap) = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a library catalog")
+        if version != VERSION:
+            raise ValueError(f"Unsupported catalog version {version} in {path}")
+
+    def string(self, offset: int, length: int) -> str:
+        start = self._heap + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def book_record(self, n: int) -> tuple:
+        return BOOK_RECORD.unpack_from(self._map, self._books + n * BOOK_RECORD.size)
+
+    def borrower_record(self, n: int) -> tuple:
+        return BORROWER_RECORD.unpack_from(self._map, self._borrowers + n * BORROWER_RECORD.size)
+
+    def book_id(self, n: int) -> str:
+        return self.string(*self.book_record(n)[:2])
+
+    def borrower_id(self, n: int) -> str:
+        return self.string(*self.borrower_record(n)[:2])
+
+    def find_book(self, book_id: str) -> int:
+        """Return the record number of book_id, or None."""
+        return self._find(book_id, self.book_count, self.book_id)
+
+    def find_borrower(self, borrower_id: str) -> int:
+        """Return the record number of borrower_id, or None."""
+        return self._find(borrower_id, self.borrower_count, self.borrower_id)
+
+    def _find(self, item_id: str, count: int, decode) -> int:
+        key = _id_order(item_id)
+        n = bisect_left(range(count), key, key=lambda m: _id_order(decode(m)))
+        return n if n < count and decode(n) == item_id else None
+
+    def loans(self, borrower_number: int) -> array:
+        """Book record numbers currently lent to a borrower."""
+        start, count = self.borrower_record(borrower_number)[6:]
+        return self._u32(self._loans + start * 4, count)
+
+    def author_books(self, folded_author: str) -> array:
+        """Book record numbers by an author (already case-folded)."""
+        key = lambda n: self.string(*AUTHOR_RECORD.unpack_from(self._map, self._authors + n * AUTHOR_RECORD.size)[:2])
+        n = bisect_left(range(self._author_count), folded_author, key=key)
+        if n == self._author_count or key(n) != folded_author:
+            return array("I")
+        start, count = AUTHOR_RECORD.unpack_from(self._map, self._authors + n * AUTHOR_RECORD.size)[2:]
+        return self._u32(self._postings + start * 4, count)
+
+    def column(self, field: str) -> bytes:
+        """The genre code or available flag of every book, one byte each."""
+        offset = {"genre": 24, "available": 25}[field]
+        start = self._books + offset
+        return self._map[start:self._books + self.book_count * BOOK_RECORD.size:BOOK_RECORD.size]
+
+    def _u32(self, start: int, count: int) -> array:
+        values = array("I")
+        values.frombytes(self._map[start:start + count * 4])
+        return little_endian(values)
+
+
+class CatalogBook:
+    """
+    A read-only Book backed by one catalog record. String fields are
+    decoded from the mapping each time they are read.
+    """
+
+    __slots__ = ("_catalog", "_record")
+
+    def __init__(self, catalog: Catalog, number: int):
+        self._catalog = catalog
+        self._record = catalog.book_record(number)
+
+    @property
+    def book_id(self) -> str:
+        return self._catalog.string(*self._record[0:2])
+
+    @property
+    def title(self) -> str:
+        return self._catalog.string(*self._record[2:4])
+
+    @property
+    def author(self) -> str:
+        return self._catalog.string(*self._record[4:6])
+
+    @property
+    def genre(self) -> str:
+        return Book.GENRES[self._record[6]]
+
+    @property
+    def available(self) -> bool:
+        return bool(self._record[7])
+
+    to_dict = Book.to_dict
+    __str__ = Book.__str__
+
+
+class CatalogBooks(Mapping):
+    """Read-only book_id -> CatalogBook mapping over a Catalog."""
+
+    def __init__(self, catalog: Catalog):
+        self._catalog = catalog
+
+    def __getitem__(self, book_id: str) -> CatalogBook:
+        number = self._catalog.find_book(book_id) if isinstance(book_id, str) else None
+        if number is None:
+            raise KeyError(book_id)
+        return CatalogBook(self._catalog, number)
+
+    def __len__(self) -> int:
+        return self._catalog.book_count
+
+    def __iter__(self):
+        return map(self._catalog.book_id, range(self._catalog.book_count))
+
+
+class ReadOnlyLibrary:
+    """
+    Read-only Library served from a memory-mapped catalog_file.
+
+    Attributes:
+        name (str): Library name
+        catalog_file (str): Catalog published by Library.publish_catalog()
+        books (Mapping): book_id -> CatalogBook
+
+    Methods:
+        search_books(**criteria) -> list: Same results as Library.search_books
+        get_available_books() -> list: Available books (CatalogBook)
+        get_borrower_books(borrower_id) -> list: Books lent to a borrower
+        reload_if_changed() -> bool: Re-map if a new version was published
+
+    Every read first checks (one stat call) whether the writer published
+    a new version. Books returned earlier keep the version they came from.
+    """
+
+    def __init__(self, name: str, data_dir: str = "."):
+        self.name = name
+        self.catalog_file = os.path.join(data_dir, "library_catalog.bin")
+        self._catalog = Catalog(self.catalog_file)
+
+    @property
+    def books(self) -> CatalogBooks:
+        self.reload_if_changed()
+        return CatalogBooks(self._catalog)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Re-map catalog_file if it was replaced since it was mapped.
+
+        Returns:
+            True if a new version was mapped
+        """
+        stat = os.stat(self.catalog_file)
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._catalog.identity:
+            return False
+        self._catalog = Catalog(self.catalog_file)
+        return True
+
+    def search_books(self, **criteria) -> list:
+        """
+        Search books by any criteria (title, author, genre, available).
+
+        Plain equality on book_id, author, genre and available narrows the
+        records to decode; operator criteria (see compile_query) are tested
+        on the decoded candidates.
+        """
+        self.reload_if_changed()
+        catalog = self._catalog
+        matches = None
+        if isinstance(criteria.get("book_id"), str):
+            number = catalog.find_book(criteria["book_id"])
+            matches = [number] if number is not None else None
+        if matches is None and isinstance(criteria.get("author"), str):
+            matches = catalog.author_books(fold(criteria["author"]))
+        for field in ("genre", "available"):
+            if field not in criteria:
+                continue
+            values = Book.GENRES if field == "genre" else (False, True)
+            wanted = {code for code, value in enumerate(values) if fold(value) == fold(criteria[field])}
+            column = catalog.column(field)
+            if matches is None:
+                matches = [n for n, code in enumerate(column) if code in wanted]
+            else:
+                matches = [n for n in matches if column[n] in wanted]
+        if matches is None:
+            matches = range(catalog.book_count)
+
+        query = compile_query(**criteria)
+        books = (CatalogBook(catalog, number) for number in matches)
+        return [book.to_dict() for book in books if query.matches(book)]
+
+    def get_available_books(self) -> list:
+        """Get list of all available books."""
+        self.reload_if_changed()
+        catalog = self._catalog
+        return [CatalogBook(catalog, number) for number, flag in enumerate(catalog.column("available")) if flag]
+
+    def get_borrower_books(self, borrower_id: str) -> list:
+        """Get list of books currently borrowed by a borrower."""
+        self.reload_if_changed()
+        catalog = self._catalog
+        number = catalog.find_borrower(borrower_id)
+        if number is None:
+            return []
+        return [CatalogBook(catalog, book) for book in catalog.loans(number)]
@@ -14,12 +14,40 @@ Instructions:
 Run with: python exercise_4_project.py
 """
 
+import atexit
+import csv
+import gc
+import heapq
 import json
+import logging
+import math
+import operator
 import os
-from datetime import datetime
+import re
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, namedtuple
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+from functools import partial, wraps
+from itertools import islice
 from zoneinfo import available_timezones
 
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent mode falls back to in-process locking only
+    fcntl = None
+
+from exercises.src.binary_snapshot import read_snapshot, write_snapshot
 from exercises.src.files import save_json
+from exercises.src.metrics import LibraryMetrics
+from exercises.src.shards import ShardedDict, ShardLayout
+from exercises.src.sqlite_backend import SqliteBackend
+
+logger = logging.getLogger(__name__)
 
 
 # =============================================================================
@@ -39,6 +67,17 @@ def format_date(dt: datetime = None) -> str:
     return dt.strftime("%Y-%m-%d") if dt else datetime.now().strftime("%Y-%m-%d")
 
 
+def _day(value) -> str:
+    """
+    Normalize a date, datetime or "YYYY-MM-DD" string to "YYYY-MM-DD"
+    (today for None), the form loan dates are stored and compared in.
+    """
+    if isinstance(value, str):
+        # Re-formatted, so "2024-1-5" is stored and compared as "2024-01-05"
+        value = datetime.strptime(value, "%Y-%m-%d")
+    return format_date(value)
+
+
 def generate_id(prefix: str, existing_ids: list) -> str:
     """
     Generate a new unique ID with the given prefix.
@@ -56,11 +95,101 @@ def generate_id(prefix: str, existing_ids: list) -> str:
     """
     # TODO: Implement this function
     # Hint: Find the highest existing number and add 1
-    if not existing_ids:
-        return f"{prefix}_0001"
-    highest_id = max(existing_ids, key=lambda x: int(x.split("_")[1]))
-    next_num = int(highest_id.split("_")[1]) + 1
-    return f"{prefix}_{next_num:04d}"
+    highest = max((id_number(existing_id) for existing_id in existing_ids), default=0)
+    return f"{prefix}_{highest + 1:04d}"
+
+
+def id_number(item_id: str) -> int:
+    """
+    Return the numeric part of an ID created by generate_id.
+
+    The number is read after the last "_", so prefixes may contain
+    underscores and numbers past 9999 (which outgrow the 4-digit padding)
+    still compare numerically rather than as strings.
+
+    Example:
+        id_number("BOOK_0042") -> 42
+        id_number("BOOK_12345") -> 12345
+    """
+    return int(item_id.rpartition("_")[2])
+
+
+def fold(value):
+    """Return value case-folded if it is a string, unchanged otherwise."""
+    return value.casefold() if isinstance(value, str) else value
+
+
+def tokenize(text: str) -> list:
+    """
+    Split text into case-folded word tokens.
+
+    Example:
+        tokenize("Python 101: The Basics") -> ["python", "101", "the", "basics"]
+    """
+    return re.findall(r"\w+", text.casefold())
+
+
+def trigrams(token: str) -> set:
+    """
+    Return the set of 3-character substrings of a padded token.
+
+    Padding with two leading spaces and one trailing space lets short
+    tokens and word starts contribute trigrams too.
+
+    Example:
+        trigrams("cat") -> {"  c", " ca", "cat", "at "}
+    """
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _check_text_fields(row: dict, fields: tuple) -> str:
+    """Return why row lacks a non-empty string in one of fields, or None."""
+    missing = [field for field in fields if not row.get(field)]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    not_text = [field for field in fields if not isinstance(row[field], str)]
+    if not_text:
+        return f"Fields must be text: {', '.join(not_text)}"
+    return None
+
+
+def read_records(path: str):
+    """
+    Stream dict records from a CSV (with header row) or JSONL file.
+
+    Returns an iterator of (line_number, record) pairs, so files of any size
+    can be processed in constant memory. Blank JSONL lines are skipped and
+    a malformed one is yielded as {"_error": message}.
+
+    Example:
+        for line, row in read_records("books.csv"):
+            print(line, row["title"])
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".jsonl"):
+        raise ValueError(f"Unsupported file type: {extension}. Must be .csv or .jsonl")
+    return _read_csv(path) if extension == ".csv" else _read_jsonl(path)
+
+
+def _read_csv(path: str):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def _read_jsonl(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as error:
+                record = {"_error": f"Invalid JSON: {error}"}
+            yield line_number, record if isinstance(record, dict) else {"_error": "Not a JSON object"}
+
 
 def search_items(items: list, **criteria) -> list:
     """
@@ -69,7 +198,8 @@ def search_items(items: list, **criteria) -> list:
 
     Parameters:
         items: List of dictionaries to search
-        **criteria: Field-value pairs to match (case-insensitive for strings)
+        **criteria: Field-value pairs to match (case-insensitive for strings),
+            optionally with an operator suffix (see compile_query)
 
     Returns:
         List of matching items
@@ -85,11 +215,133 @@ def search_items(items: list, **criteria) -> list:
     """
     # TODO: Implement this function
     # Hint: For each item, check if ALL criteria match
-    results = []
-    for item in items:
-        if all(item.get(key) == value for key, value in criteria.items()):
-            results.append(item)
-    return results
+    return compile_query(**criteria).filter(items)
+
+
+# Operators accepted as a "field__op" suffix by compile_query and search_items
+QUERY_OPERATORS = ("eq", "ne", "in", "startswith", "contains", "gt", "gte", "lt", "lte")
+
+# Evaluation order of conditions: likely most selective first, ties keep
+# the caller's order
+_OPERATOR_RANK = {"eq": 0, "in": 1, "startswith": 2, "gt": 3, "gte": 3, "lt": 3, "lte": 3,
+                  "contains": 4, "ne": 5}
+
+_COMPARISONS = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+Condition = namedtuple("Condition", ["field", "op", "value"])
+
+
+def compile_query(**criteria) -> "Query":
+    """
+    Compile search criteria once into a reusable Query.
+
+    Each criterion is field=value (equality) or field__op=value with op one
+    of QUERY_OPERATORS. String comparisons are case-insensitive, and an item
+    missing a field (or holding an incomparable value) fails range tests.
+
+    Example:
+        query = compile_query(title__contains="python", genre__in=["Science", "Technology"],
+                              year__gte=2000, available=True)
+        query.filter(books)            -> matching dicts
+        library.search_books(query)    -> the same over the library
+    """
+    conditions = []
+    for key, value in criteria.items():
+        field, _, op = key.rpartition("__")
+        if not field or op not in QUERY_OPERATORS:
+            field, op = key, "eq"
+        if op == "in":
+            value = (value,) if isinstance(value, str) else tuple(value)
+        conditions.append(Condition(field, op, value))
+    return Query(conditions)
+
+
+class Query:
+    """
+    A conjunction of Conditions compiled into one predicate.
+
+    Conditions are ordered by _OPERATOR_RANK and each is turned into a
+    closure specialized for its operator, with the comparison value folded
+    once; the closures are chained with `and`, so an item stops being
+    examined at its first failing condition.
+
+    Attributes:
+        conditions (list): Conditions in evaluation order
+
+    Methods:
+        __call__(item) -> bool: Match a dict (item.get(field))
+        matches(obj) -> bool: Match an object (getattr(obj, field, None))
+        filter(items) -> list: The matching dicts
+    """
+
+    def __init__(self, conditions: list):
+        self.conditions = sorted(conditions, key=lambda condition: _OPERATOR_RANK[condition.op])
+        self._match_item = _all_of([_compile_condition(condition, operator.methodcaller("get", condition.field))
+                                    for condition in self.conditions])
+        self._match_object = _all_of([_compile_condition(condition, _attribute_reader(condition.field))
+                                      for condition in self.conditions])
+
+    def __call__(self, item: dict) -> bool:
+        return self._match_item(item)
+
+    def matches(self, obj) -> bool:
+        return self._match_object(obj)
+
+    def filter(self, items: list) -> list:
+        return list(filter(self._match_item, items))
+
+    def __repr__(self) -> str:
+        terms = ", ".join(f"{field}__{op}={value!r}" for field, op, value in self.conditions)
+        return f"Query({terms})"
+
+
+def _attribute_reader(field: str):
+    return lambda obj: getattr(obj, field, None)
+
+
+def _compile_condition(condition: Condition, read):
+    """Return a one-argument test for condition, reading the field with read."""
+    op = condition.op
+    if op == "in":
+        wanted = {fold(value) for value in condition.value}
+        return lambda item: fold(read(item)) in wanted
+    target = fold(condition.value)
+    if op == "eq":
+        return lambda item: fold(read(item)) == target
+    if op == "ne":
+        return lambda item: fold(read(item)) != target
+    if op in ("contains", "startswith"):
+        if not isinstance(target, str):
+            return lambda item: False
+        if op == "contains":
+            def test(item):
+                actual = read(item)
+                return isinstance(actual, str) and target in actual.casefold()
+        else:
+            def test(item):
+                actual = read(item)
+                return isinstance(actual, str) and actual.casefold().startswith(target)
+        return test
+    compare = _COMPARISONS[op]
+
+    def test(item):
+        actual = fold(read(item))
+        try:
+            return actual is not None and compare(actual, target)
+        except TypeError:
+            return False
+    return test
+
+
+def _all_of(tests: list):
+    """Chain tests with `and` into one predicate."""
+    if not tests:
+        return lambda item: True
+    first, *rest = tests
+    if not rest:
+        return first
+    others = _all_of(rest)
+    return lambda item: first(item) and others(item)
 
 
 # =============================================================================
@@ -114,26 +366,47 @@ class Book:
         to_dict(): Convert to dictionary for JSON serialization
         from_dict(data): Class method to create Book from dictionary
         __str__(): Return readable string representation
+
+    Storage:
+        Books use __slots__ instead of a per-instance __dict__, keep genre as
+        a small integer code into GENRES, and intern author names, which
+        repeat across a catalog. See benchmarks/bench_memory.py.
     """
 
     GENRES = ["Fiction", "Non-Fiction", "Science", "History", "Technology"]
+    GENRE_CODES = {genre: code for code, genre in enumerate(GENRES)}
+
+    __slots__ = ("book_id", "title", "author", "available", "_genre_code")
 
     def __init__(self, book_id: str, title: str, author: str, genre: str, available: bool = True):
         # TODO: Initialize attributes
         # TODO: Validate that genre is in GENRES, raise ValueError if not
         self.book_id = book_id
         self.title = title
-        self.author = author
+        self.author = sys.intern(author)
         self.available = available
-        if genre not in Book.GENRES:
-            raise ValueError(f"Invalid genre: {genre}. Must be one of {Book.GENRES}")
-        else:
-            self.genre = genre
+        self.genre = genre
 
+    @property
+    def genre(self) -> str:
+        return Book.GENRES[self._genre_code]
+
+    @genre.setter
+    def genre(self, genre: str) -> None:
+        code = Book.GENRE_CODES.get(genre)
+        if code is None:
+            raise ValueError(f"Invalid genre: {genre}. Must be one of {Book.GENRES}")
+        self._genre_code = code
 
     def to_dict(self) -> dict:
         # TODO: Return dictionary with all attributes
-        return self.__dict__
+        return {
+            "book_id": self.book_id,
+            "title": self.title,
+            "author": self.author,
+            "available": self.available,
+            "genre": self.genre,
+        }
 
     @classmethod
     def from_dict(cls, data: dict) -> "Book":
@@ -150,6 +423,24 @@ class Book:
 # PART 3: BORROWER CLASS
 # =============================================================================
 
+class BorrowedBooks(list):
+    """
+    The list Borrower.borrowed_books returns: a copy of the loans, so
+    changing it in place would silently do nothing. Every in-place change
+    raises TypeError instead; use borrow_book / return_book, or assign a
+    new list to borrowed_books.
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("borrowed_books is read-only: use borrow_book/return_book "
+                        "or assign a new list")
+
+    append = extend = insert = remove = pop = clear = sort = reverse = _read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+
 class Borrower:
     """
     Represents a library member who can borrow books.
@@ -159,47 +450,88 @@ class Borrower:
         name (str): Borrower's name
         email (str): Borrower's email
         borrowed_books (list): List of book_ids currently borrowed
+        loan_dates (dict): book_id -> (checked_out, due) as "YYYY-MM-DD"
+            strings, for the loans that carry dates
 
     Methods:
-        borrow_book(book_id): Add book to borrowed list
+        borrow_book(book_id, checked_out, due): Add book to borrowed list
         return_book(book_id): Remove book from borrowed list
+        has_book(book_id) -> bool: Whether the book is currently borrowed
         to_dict(): Convert to dictionary
         from_dict(data): Class method to create Borrower from dictionary
+
+    Storage:
+        The loans are kept in an insertion-ordered dict of book_id ->
+        (checked_out, due), or None for a loan recorded without dates, so
+        has_book and return_book are O(1). borrowed_books returns the
+        book_ids in borrowing order as a new, read-only BorrowedBooks list;
+        assign to it to replace them (without dates).
     """
 
     MAX_BOOKS = 3  # Maximum books a borrower can have at once
 
-    def __init__(self, borrower_id: str, name: str, email: str, borrowed_books: list = None):
+    __slots__ = ("borrower_id", "name", "email", "_loans")
+
+    def __init__(self, borrower_id: str, name: str, email: str, borrowed_books: list = None,
+                 loan_dates: dict = None):
         # TODO: Initialize attributes (use empty list if borrowed_books is None)
         self.borrower_id = borrower_id
         self.name = name
         self.email = email
         self.borrowed_books = borrowed_books if borrowed_books is not None else []
+        for book_id, (checked_out, due) in (loan_dates or {}).items():
+            if book_id in self._loans:
+                self._loans[book_id] = (checked_out, due)
+
+    @property
+    def borrowed_books(self) -> list:
+        return BorrowedBooks(self._loans)
+
+    @borrowed_books.setter
+    def borrowed_books(self, book_ids: list) -> None:
+        self._loans = dict.fromkeys(book_ids)
+
+    @property
+    def loan_dates(self) -> dict:
+        return {book_id: dates for book_id, dates in self._loans.items() if dates is not None}
 
     def can_borrow(self) -> bool:
         """Check if borrower can borrow more books."""
         # TODO: Return True if len(borrowed_books) < MAX_BOOKS
-        return len(self.borrowed_books) < Borrower.MAX_BOOKS
+        return len(self._loans) < Borrower.MAX_BOOKS
 
-    def borrow_book(self, book_id: str) -> bool:
-        """Add book to borrowed list. Return False if at max limit."""
+    def borrow_book(self, book_id: str, checked_out: str = None, due: str = None) -> bool:
+        """
+        Add book to borrowed list, with its checkout and due dates if given.
+        Return False if at max limit.
+        """
         # TODO: Implement this method
-        if len(self.borrowed_books) >= Borrower.MAX_BOOKS:
+        if len(self._loans) >= Borrower.MAX_BOOKS:
             return False
-        self.borrowed_books.append(book_id)
+        self._loans[book_id] = (checked_out, due) if due is not None else None
         return True
 
     def return_book(self, book_id: str) -> bool:
         """Remove book from borrowed list. Return False if not found."""
         # TODO: Implement this method
-        if book_id in self.borrowed_books:
-            self.borrowed_books.remove(book_id)
+        if book_id in self._loans:
+            del self._loans[book_id]
             return True
         return False
 
+    def has_book(self, book_id: str) -> bool:
+        """Check in O(1) whether book_id is currently borrowed."""
+        return book_id in self._loans
+
     def to_dict(self) -> dict:
         # TODO: Return dictionary with all attributes
-        return self.__dict__
+        return {
+            "borrower_id": self.borrower_id,
+            "name": self.name,
+            "email": self.email,
+            "borrowed_books": list(self._loans),
+            "loan_dates": {book_id: list(dates) for book_id, dates in self._loans.items() if dates is not None},
+        }
 
     @classmethod
     def from_dict(cls, data: dict) -> "Borrower":
@@ -211,6 +543,60 @@ class Borrower:
 # PART 4: LIBRARY CLASS (Main System)
 # =============================================================================
 
+def mutation(method):
+    """Run a Library method that changes data inside Library._mutation_guard()."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._mutation_guard():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def synchronized(method):
+    """Run a Library method that reads data under the in-process lock when shared."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not (self.concurrent or self.write_behind):
+            return method(self, *args, **kwargs)
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _replace_json(path: str, data: dict) -> None:
+    """
+    save_json to a temporary file renamed over path, so a crash mid-write
+    leaves the previous snapshot (and the journal on top of it) intact.
+    """
+    temp_path = f"{path}.tmp"
+    save_json(temp_path, data)
+    os.replace(temp_path, path)
+
+
+def _close_at_exit(library_ref) -> None:
+    """atexit hook: flush a write-behind Library that is still alive."""
+    library = library_ref()
+    if library is not None:
+        library.close()
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Suspend the cyclic garbage collector while bulk-loading records.
+
+    Loading creates objects by the hundred thousand and none of them are
+    garbage, so every collection the allocations trigger is wasted work.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
 class Library:
     """
     Main library system that manages books and borrowers.
@@ -226,29 +612,293 @@ class Library:
     Methods:
         add_book(title, author, genre) -> Book: Add a new book
         add_borrower(name, email) -> Borrower: Add a new borrower
-        checkout_book(book_id, borrower_id) -> bool: Borrower checks out a book
+        checkout_book(book_id, borrower_id, checked_out) -> bool: Borrower checks out a book
         return_book(book_id, borrower_id) -> bool: Borrower returns a book
         search_books(**criteria) -> list: Search books by criteria
+        search_books_page(criteria, limit, cursor) -> dict: One page of results
+        iter_books(**criteria): Generator over matching books
         get_available_books() -> list: Get all available books
         get_borrower_books(borrower_id) -> list: Get books borrowed by a borrower
+        who_has(book_id) -> str: borrower_id holding a book, or None
+        check_loans() -> list: Consistency problems between the loan views
+        overdue(as_of) -> list: Loans due before as_of, earliest first
+        due_between(start, end) -> list: Loans due from start to end inclusive
+        metrics() -> dict: Per-operation call counts and latencies (metrics=True)
+        search_cache_info() -> dict: Search cache hit/miss statistics
         save(): Save all data to JSON files
         load(): Load data from JSON files
+        checkpoint() -> int: Compact the journal into the JSON files
+        batch(): Context manager that defers persistence to a single write
+
+    Secondary indexes:
+        Fields listed in indexed_fields (author, genre and available by
+        default, more via register_index) keep a value -> set of book_ids
+        hash index. search_books answers equality criteria on those fields
+        by intersecting posting sets, smallest first, instead of scanning.
+
+    Full-text search:
+        text_search() answers case-folded keyword, multi-term AND and
+        prefix queries over title and author from a TextIndex. The index is
+        saved to text_index_file next to the JSON files and caught up with
+        the catalog at load, so only books added since it was last saved
+        (by save() or close()) are tokenized.
+        fuzzy_search() tolerates typos by matching query words to indexed
+        words through a TrigramIndex over the same vocabulary.
+
+    Search cache:
+        With search_cache_size=N, search_books keeps the results of the N
+        most recently used criteria in a SearchCache. add_book and imports
+        invalidate every entry, checkout_book and return_book only entries
+        whose criteria read "available", and load or a batch rollback
+        clear the cache. Changing a Book's attributes directly, bypassing
+        the Library, is not seen by the cache.
+
+    Loan index:
+        The Library keeps a book_id -> borrower_id index of current loans,
+        maintained by checkout_book and return_book and rebuilt at load.
+        who_has(book_id) answers from it in O(1), and check_loans() reports
+        any disagreement between it, the borrowers' borrowed_books and the
+        books' available flags.
+
+    Due dates:
+        checkout_book records the checkout date and a due date loan_days
+        later on the Borrower (see Borrower.loan_dates), so they are saved
+        and loaded with it in every backend and format. A list of
+        (due, book_id) kept sorted with bisect answers overdue(as_of) and
+        due_between(start, end) in O(log n + k) for k results, without
+        walking the borrowers. Dates are whole days ("YYYY-MM-DD", see
+        format_date). Loans made before due dates existed have none and
+        are never reported.
+
+    Statistics:
+        get_statistics() reads running counters kept by add_book,
+        checkout_book and return_book and rebuilt at load. With
+        debug_stats=True every call also recounts and raises RuntimeError
+        if the counters have drifted.
+
+    Storage backends:
+        backend="json" (default) uses the JSON files above. backend="sqlite"
+        keeps books and borrowers in db_file through a SqliteBackend: each
+        mutation upserts only the rows it touched. Queries are answered from
+        memory, like the JSON backend, so changes not yet flushed (batch,
+        autosave=False) are always seen. Journal mode is JSON only.
+
+    Snapshot formats:
+        With the json backend, snapshot_format="binary" replaces the three
+        JSON snapshot files with one columnar snapshot_file (see
+        binary_snapshot) that loads without parsing a dict per record.
+        A data directory without a binary snapshot yet is loaded from its
+        JSON files, and the next save writes the binary file. The journal
+        works the same with either format. See benchmarks/bench_startup.py.
+
+    Sharding:
+        With shard_by="hash", "range" or "genre" (see shards) books and
+        borrowers are split across shard files listed in manifest_file, and
+        a mutation rewrites only the shards of the records it touched plus
+        the small manifest. Shards are read on first access; indexes, the
+        text index and statistics are built on the first search or
+        get_statistics() call, which reads every shard. Sharding is JSON
+        only and cannot be combined with journal mode or binary snapshots.
+
+    Read-only catalog:
+        publish_catalog() writes catalog_file, a memory-mapped format that
+        any number of ReadOnlyLibrary reader processes (see mmap_catalog)
+        share through the OS page cache. Readers see the catalog as of the
+        last publish_catalog() call.
+
+    Concurrency:
+        With concurrent=True the Library may be shared by threads and by
+        other processes using the same data_dir. Every mutation runs under
+        an in-process lock plus an advisory lock on lock_file, reloads the
+        data first if another writer changed it on disk (reload_if_changed),
+        then validates, applies and persists. save(), flush() and close()
+        write under the same locks. Read methods take the in-process lock
+        so they never see a half-applied change. Concurrent mode needs
+        autosave=True and no write-behind, since a reload would discard
+        changes not flushed yet.
+
+    Deferred persistence:
+        With autosave=False mutations only mark records pending, and flush()
+        writes them all at once (AsyncLibrary builds on this). save() always
+        writes everything, including the text index; per-mutation writes
+        skip the text index, which load() catches up instead.
+
+    Write-behind:
+        With write_behind=True a background thread flushes pending changes
+        every flush_interval_ms, or as soon as max_pending changes have
+        accumulated, and once more on close() or interpreter exit. Mutations
+        then cost only in-memory work. A crash can lose at most the changes
+        of the last flush_interval_ms or max_pending mutations, whichever
+        comes first; call flush() to make everything so far durable. A
+        failed write is logged and its changes stay pending for the next
+        flush; a flush() or save() that fails raises and keeps them too.
+
+    Dirty tracking:
+        The Library remembers which snapshot files (books, borrowers, meta,
+        text index) no longer match memory, and rewrites only those; the
+        journal and sqlite deltas already write just the touched records.
+        save_metrics counts writes, files written and skipped, and bytes
+        serialized and written.
+
+    Metrics:
+        With metrics=True every public method, plus the to_dict
+        ("serialize") and disk ("write") halves of persistence, records its
+        calls, latency percentiles and bytes serialized and written (see
+        metrics). metrics() returns them and write_metrics(path) dumps them
+        in the Prometheus text format. Without it nothing is wrapped or timed.
+
+    IDs are allocated from per-prefix sequences ("BOOK", "USER") holding the
+    highest number handed out so far. They are saved to meta_file and
+    rebuilt once at load(), so allocating an ID is O(1).
+
+    Journal mode:
+        With journal=True each mutation appends one compact JSON line to
+        journal_file instead of rewriting both JSON files. load() replays
+        the journal on top of the last snapshot, and checkpoint() (run
+        automatically every checkpoint_every records) folds it back in.
     """
 
-    def __init__(self, name: str, data_dir: str = "."):
+    DEFAULT_INDEXES = ("author", "genre", "available")
+    ITER_CHUNK = 256
+    BACKENDS = ("json", "sqlite")
+    SNAPSHOT_FORMATS = ("json", "binary")
+
+    def __init__(self, name: str, data_dir: str = ".", journal: bool = False,
+                 checkpoint_every: int = 1000, indexed_fields: tuple = DEFAULT_INDEXES,
+                 debug_stats: bool = False, backend: str = "json", concurrent: bool = False,
+                 autosave: bool = True, write_behind: bool = False, flush_interval_ms: int = 200,
+                 max_pending: int = 1000, snapshot_format: str = "json", shard_by: str = None,
+                 shards: int = 8, shard_size: int = 10000, metrics: bool = False,
+                 search_cache_size: int = 0, loan_days: int = 14):
+        if backend not in Library.BACKENDS:
+            raise ValueError(f"Invalid backend: {backend}. Must be one of {Library.BACKENDS}")
+        if journal and backend != "json":
+            raise ValueError("Journal mode is only available with the json backend")
+        if snapshot_format not in Library.SNAPSHOT_FORMATS:
+            raise ValueError(f"Invalid snapshot format: {snapshot_format}. "
+                             f"Must be one of {Library.SNAPSHOT_FORMATS}")
+        if snapshot_format != "json" and backend != "json":
+            raise ValueError("Binary snapshots are only available with the json backend")
+        if concurrent and (write_behind or not autosave):
+            raise ValueError("Concurrent mode needs autosave=True without write-behind: reloading "
+                             "another process's changes would discard unflushed ones")
+        if search_cache_size < 0:
+            raise ValueError("search_cache_size must not be negative")
+        if loan_days < 1:
+            raise ValueError("loan_days must be positive")
+        if shard_by is not None and (backend != "json" or journal or snapshot_format != "json"):
+            raise ValueError("Sharding needs the json backend and snapshot format, without journal mode")
         self.name = name
         self.books = {}
         self.borrowers = {}
         self.books_file = os.path.join(data_dir, "library_books.json")
         self.borrowers_file = os.path.join(data_dir, "library_borrowers.json")
+        self.journal_file = os.path.join(data_dir, "library_journal.jsonl")
+        self.meta_file = os.path.join(data_dir, "library_meta.json")
+        self.text_index_file = os.path.join(data_dir, "library_text_index.json")
+        self.snapshot_file = os.path.join(data_dir, "library_snapshot.bin")
+        self.catalog_file = os.path.join(data_dir, "library_catalog.bin")
+        self._shards = ShardLayout(data_dir, shard_by, shards, shard_size) if shard_by else None
+        self.manifest_file = os.path.join(data_dir, "library_manifest.json")
+        self.db_file = os.path.join(data_dir, "library.db")
+        self.lock_file = os.path.join(data_dir, "library.lock")
+        self.backend = backend
+        self.snapshot_format = snapshot_format
+        self._store = SqliteBackend(self.db_file) if backend == "sqlite" else None
+        self.journal = journal
+        self.checkpoint_every = checkpoint_every
+        self._journal_records = 0
+        self.autosave = autosave
+        self._pending = {"op": None, "books": {}, "borrowers": {}}
+        self._pending_changes = 0
+        self._dirty = set()
+        self._saved_sequences = {}
+        self.save_metrics = {"writes": 0, "files_written": 0, "files_skipped": 0, "bytes_serialized": 0,
+                             "bytes_written": 0}
+        self._batch = None
+        self.write_behind = write_behind
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        self._write_lock = threading.Lock()
+        self._flush_wakeup = threading.Condition()
+        self._stopping = False
+        self._flusher = None
+        self._exit_hook = None
+        self._sequences = {}
+        self._indexes = {field: {} for field in indexed_fields}
+        self._text_index = TextIndex()
+        self._available_count = 0
+        self._genre_counts = {}
+        self._loans = {}
+        self.loan_days = loan_days
+        self._due_index = []
+        self._derived_ready = False
+        self._search_cache = SearchCache(search_cache_size) if search_cache_size else None
+        self.debug_stats = debug_stats
+        self.concurrent = concurrent
+        self._lock = threading.RLock()
+        self._exclusive_depth = 0
+        self._seen_version = None
+        self._metrics = None
+        if metrics:
+            self._metrics = LibraryMetrics(name)
+            self._metrics.instrument(self)
         # TODO: Call self.load() to load existing data
         self.load()
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name=f"{name} write-behind", daemon=True)
+            self._flusher.start()
+            # A partial per Library, so close() unregisters only its own hook
+            self._exit_hook = partial(_close_at_exit, weakref.ref(self))
+            atexit.register(self._exit_hook)
 
     def load(self) -> None:
-        """Load books and borrowers from JSON files."""
+        """Load books and borrowers from JSON files (or the SQLite database)."""
+        if self.concurrent:
+            # Never read a file another process is halfway through writing
+            with self._locked_files():
+                self._load()
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        if self._search_cache is not None:
+            # Every Book object is replaced
+            self._search_cache.clear()
+        with _gc_paused():
+            if self._store is not None:
+                self.books = {row["book_id"]: Book.from_dict(row) for row in self._store.load_books()}
+                self.borrowers = {row["borrower_id"]: Borrower.from_dict(row)
+                                  for row in self._store.load_borrowers()}
+                self._load_sequences(self._store.load_sequences())
+            else:
+                self._load_json()
+            self._text_index = TextIndex.load(self.text_index_file)
+            if self._shards is None:
+                self._rebuild_derived()
+            else:
+                # Built on first use, so startup reads no shard files
+                self._derived_ready = False
+        self._saved_sequences = dict(self._sequences)
+        # Replayed journal records are not in the snapshot files yet, and
+        # unsharded JSON data read in binary or sharded mode still has to
+        # be converted
+        converting = (((self.snapshot_format == "binary" and not os.path.exists(self.snapshot_file))
+                       or (self._shards is not None and not os.path.exists(self.manifest_file)))
+                      and (dict.__len__(self.books) or dict.__len__(self.borrowers)))
+        self._dirty = {"books", "borrowers"} if self._journal_records or converting else set()
+        self._mark_synced()
+
+    def _load_json(self) -> None:
         # TODO: Load books from self.books_file
         # TODO: Load borrowers from self.borrowers_file
         # Hint: Use try/except to handle files not existing
+        if self.snapshot_format == "binary" and os.path.exists(self.snapshot_file):
+            self._load_binary()
+            return
+        if self._shards is not None and os.path.exists(self.manifest_file):
+            self._load_sharded()
+            return
         try:
             with open(self.books_file, "r", encoding="utf-8") as f:
                 books_data = json.load(f)
@@ -261,39 +911,764 @@ class Library:
                 self.borrowers = {borrower_id: Borrower.from_dict(borrower_dict) for borrower_id, borrower_dict in borrowers_data.items()}
         except FileNotFoundError:
             self.borrowers = {}
+        self._journal_records = self._replay_journal()
+        try:
+            with open(self.meta_file, "r", encoding="utf-8") as f:
+                self._load_sequences(json.load(f).get("sequences", {}))
+        except FileNotFoundError:
+            self._load_sequences({})
+        self.books = self._collection("books", self.books)
+        self.borrowers = self._collection("borrowers", self.borrowers)
+
+    def _load_sharded(self) -> None:
+        """Read the manifest; shard files are read by ShardedDict on demand."""
+        with open(self.manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._shards.check(manifest)
+        self.books = ShardedDict(self._shards, "books", self._read_shard, manifest["books"])
+        self.borrowers = ShardedDict(self._shards, "borrowers", self._read_shard, manifest["borrowers"])
+        self._journal_records = 0
+        # Saved with every write, so no scan of the (unloaded) IDs is needed
+        self._sequences = dict(manifest["sequences"])
+
+    def _read_shard(self, kind: str, key: str) -> dict:
+        cls = Book if kind == "books" else Borrower
+        try:
+            with open(self._shards.path(kind, key), "r", encoding="utf-8") as f:
+                return {item_id: cls.from_dict(data) for item_id, data in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def _collection(self, kind: str, items: dict) -> dict:
+        """Wrap fully loaded books or borrowers in a ShardedDict when sharding."""
+        if self._shards is None:
+            return items
+        return ShardedDict(self._shards, kind, self._read_shard, items=items)
+
+    def _load_binary(self) -> None:
+        """Build books and borrowers straight from the snapshot columns."""
+        snapshot = read_snapshot(self.snapshot_file)
+        books, borrowers = snapshot["books"], snapshot["borrowers"]
+        self.books = {book_id: Book(book_id, title, author, genre, available)
+                      for book_id, title, author, genre, available
+                      in zip(books["book_id"], books["title"], books["author"],
+                             books["genre"], books["available"])}
+        self.borrowers = {borrower_id: Borrower(borrower_id, name, email, borrowed_books, loan_dates)
+                          for borrower_id, name, email, borrowed_books, loan_dates
+                          in zip(borrowers["borrower_id"], borrowers["name"], borrowers["email"],
+                                 borrowers["borrowed_books"], borrowers["loan_dates"])}
+        self._journal_records = self._replay_journal()
+        self._load_sequences(snapshot["sequences"])
+
+    def save(self, force: bool = False) -> None:
+        """
+        Save books and borrowers to JSON files (or the SQLite database).
 
-    def save(self) -> None:
-        """Save books and borrowers to JSON files."""
+        Only files whose contents changed since they were last written are
+        rewritten, and only changed rows upserted into the database;
+        force=True rewrites everything. Bytes and files written are counted
+        in save_metrics.
+        """
         # TODO: Save self.books to self.books_file
         # TODO: Save self.borrowers to self.borrowers_file
         # Hint: Convert Book/Borrower objects to dicts using to_dict()
-        books_data = {book_id: book.to_dict() for book_id, book in self.books.items()}
-        borrowers_data = {borrower_id: borrower.to_dict() for borrower_id, borrower in self.borrowers.items()}
-        save_json(self.books_file, books_data)
-        save_json(self.borrowers_file, borrowers_data)
+        # In concurrent mode, first catch up with other writers, then write under the file lock
+        with self._exclusive() if self.concurrent else self._lock, self._write_lock:
+            unwritten = self._unwritten()
+            if self._store is not None and not force:
+                # The database is current but for the pending rows: upsert just those
+                payload = self._take_pending()
+            else:
+                self._pending = {"op": None, "books": {}, "borrowers": {}}
+                self._pending_changes = 0
+                payload = self._snapshot_payload(force)
+            if payload is not None:
+                self._write_or_restore(payload, unwritten)
+            if force or self._text_index.changed:
+                self._text_index.save(self.text_index_file)
+                self._count_write(self.text_index_file)
+
+    def flush(self) -> None:
+        """Write any changes that have not been persisted yet (see autosave)."""
+        if self.concurrent:
+            # Other processes must never see a half-written file
+            with self._locked_files():
+                self._flush()
+        else:
+            self._flush()
+
+    def _flush(self) -> None:
+        # Lock order is always _lock then _write_lock. The write itself runs
+        # without _lock so mutations continue while the disk is busy.
+        with self._lock:
+            self._write_lock.acquire()
+            unwritten = self._unwritten()
+            payload = self._take_pending()
+        try:
+            if payload is not None:
+                self._write_or_restore(payload, unwritten)
+        finally:
+            self._write_lock.release()
+
+    def _unwritten(self) -> tuple:
+        """Capture what _take_pending/_snapshot_payload are about to mark as written."""
+        return (self._pending, self._pending_changes, set(self._dirty), self._saved_sequences,
+                self._journal_records)
+
+    def _write_or_restore(self, payload: dict, unwritten: tuple) -> None:
+        """_write_payload, putting the changes back to be retried if the write fails."""
+        try:
+            self._write_payload(payload)
+        except BaseException:
+            self._restore_unwritten(unwritten)
+            raise
+
+    def _restore_unwritten(self, unwritten: tuple) -> None:
+        """
+        Undo the bookkeeping of a payload that never reached the disk.
+
+        Callers hold _write_lock (AsyncLibrary its own write lock), so only
+        mutations ran since the payload was taken: they added to _pending
+        and _dirty, which are merged rather than replaced.
+        """
+        pending, pending_changes, dirty, saved_sequences, journal_records = unwritten
+        with self._lock:
+            current = self._pending
+            for kind in ("books", "borrowers"):
+                current[kind] = {**pending[kind], **current[kind]}
+            if pending["op"] is not None:
+                current["op"] = pending["op"] if current["op"] in (None, pending["op"]) else "batch"
+            self._pending_changes += pending_changes
+            self._dirty |= dirty
+            self._saved_sequences = saved_sequences
+            self._journal_records = journal_records
+
+    def _mutation_guard(self):
+        """Return the lock a mutation must hold in the current mode."""
+        if self.concurrent:
+            return self._exclusive()
+        if self.write_behind:
+            return self._lock
+        return nullcontext()
+
+    def _flush_loop(self) -> None:
+        """Write-behind thread: flush every flush_interval_ms, sooner if woken."""
+        while True:
+            with self._flush_wakeup:
+                if not self._stopping:
+                    self._flush_wakeup.wait(self.flush_interval_ms / 1000)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception:
+                # The changes stay pending; keep the thread alive to retry them
+                logger.exception("Write-behind flush of %r failed", self.name)
+            if stopping:
+                return
+
+    def _snapshot_payload(self, force: bool = False) -> dict:
+        """
+        Serialize the collections whose snapshot files are out of date
+        (all of them with force=True), or return None if none are.
+        """
+        if self._shards is not None:
+            return self._shard_payload(force)
+        dirty = set(self._dirty)
+        if self._sequences != self._saved_sequences:
+            dirty.add("meta")
+        # The database and the binary snapshot are written as a whole
+        whole = self._store is not None or self.snapshot_format == "binary"
+        if force or (whole and dirty):
+            dirty = {"books", "borrowers", "meta"}
+        if not dirty:
+            return None
+        self._dirty = set()
+        self._saved_sequences = dict(self._sequences)
+        self._journal_records = 0
+        return {
+            "kind": "snapshot",
+            "books": {book_id: book.to_dict() for book_id, book in self.books.items()}
+            if "books" in dirty else None,
+            "borrowers": {borrower_id: borrower.to_dict() for borrower_id, borrower in self.borrowers.items()}
+            if "borrowers" in dirty else None,
+            "sequences": dict(self._sequences) if "meta" in dirty else None,
+        }
+
+    def _shard_payload(self, force: bool = False) -> dict:
+        """Serialize the out-of-date shards and the manifest, or return None."""
+        if not (force or self._dirty or self._sequences != self._saved_sequences):
+            return None
+        shards = {}
+        total = 0
+        for kind, collection in (("books", self.books), ("borrowers", self.borrowers)):
+            if force or kind in self._dirty:
+                collection.load_all()
+                keys = collection.members
+            else:
+                keys = {key for dirty_kind, key in self._dirty if dirty_kind == kind}
+            for key in keys:
+                shards[self._shards.path(kind, key)] = {
+                    item_id: item.to_dict() for item_id, item in collection.shard(key).items()}
+            total += len(collection.counts())
+        self._dirty = set()
+        self._saved_sequences = dict(self._sequences)
+        counts = {"books": self.books.counts(), "borrowers": self.borrowers.counts()}
+        return {
+            "kind": "snapshot",
+            "shards": shards,
+            "skipped": total - len(shards),
+            "manifest": self._shards.manifest(counts, dict(self._sequences)),
+        }
+
+    def _take_pending(self) -> dict:
+        """
+        Serialize the pending changes and clear them, or return None.
+
+        The returned payload is plain data, so _write_payload can run on
+        another thread while the Library keeps changing.
+        """
+        pending = self._pending
+        if not pending["books"] and not pending["borrowers"]:
+            return None
+        self._pending = {"op": None, "books": {}, "borrowers": {}}
+        self._pending_changes = 0
+        if self._store is None and not self.journal:
+            return self._snapshot_payload()
+        if self._store is None:
+            self._journal_records += 1
+            if self.checkpoint_every and self._journal_records >= self.checkpoint_every:
+                return self._snapshot_payload()
+        else:
+            # Upserted rows are the snapshot for the sqlite backend
+            self._dirty = set()
+            self._saved_sequences = dict(self._sequences)
+        return {
+            "kind": "delta",
+            "op": pending["op"],
+            "books": [book.to_dict() for book in pending["books"].values()],
+            "borrowers": [borrower.to_dict() for borrower in pending["borrowers"].values()],
+            "sequences": dict(self._sequences),
+        }
+
+    def _write_payload(self, payload: dict) -> None:
+        """
+        Perform the disk I/O for a payload from _take_pending/_snapshot_payload.
+
+        A snapshot rewrites the JSON files (or the binary snapshot, or every
+        database row) and drops the journal it supersedes; a delta is appended to the journal (or
+        upserted into the database).
+        """
+        if payload["kind"] == "snapshot":
+            if self._store is not None:
+                self._store.write_all(list(payload["books"].values()),
+                                      list(payload["borrowers"].values()), payload["sequences"])
+                self._count_write(self.db_file, len(json.dumps(payload)))
+            elif "shards" in payload:
+                os.makedirs(self._shards.directory, exist_ok=True)
+                for path, data in payload["shards"].items():
+                    _replace_json(path, data)
+                    self._count_write(path)
+                self.save_metrics["files_skipped"] += payload["skipped"]
+                _replace_json(self.manifest_file, payload["manifest"])
+                self._count_write(self.manifest_file)
+            elif self.snapshot_format == "binary":
+                size = write_snapshot(self.snapshot_file, list(payload["books"].values()),
+                                      list(payload["borrowers"].values()), payload["sequences"])
+                self._count_write(self.snapshot_file, size)
+            else:
+                for path, data in ((self.books_file, payload["books"]),
+                                   (self.borrowers_file, payload["borrowers"]),
+                                   (self.meta_file, payload["sequences"] and {"sequences": payload["sequences"]})):
+                    if data is None:
+                        self.save_metrics["files_skipped"] += 1
+                        continue
+                    _replace_json(path, data)
+                    self._count_write(path)
+            if self._store is None:
+                # The snapshot now contains everything the journal did
+                if os.path.exists(self.journal_file):
+                    os.remove(self.journal_file)
+        elif self._store is not None:
+            self._store.upsert(payload["books"], payload["borrowers"], payload["sequences"])
+            self._count_write(self.db_file, len(json.dumps(payload)))
+        else:
+            record = {"op": payload["op"], "books": payload["books"], "borrowers": payload["borrowers"]}
+            line = json.dumps(record, separators=(",", ":")) + "\n"
+            with open(self.journal_file, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._count_write(self.journal_file, len(line.encode("utf-8")))
+        self.save_metrics["writes"] += 1
+        self._mark_synced()
+
+    def _count_write(self, path: str, size: int = None) -> None:
+        """
+        Add one written file to save_metrics (size defaults to the file size).
+        Records are encoded straight into the file, so the bytes serialized
+        are the bytes written; for the database, the rows' JSON size stands
+        in for both.
+        """
+        size = os.path.getsize(path) if size is None else size
+        self.save_metrics["files_written"] += 1
+        self.save_metrics["bytes_serialized"] += size
+        self.save_metrics["bytes_written"] += size
+
+    def _disk_version(self) -> tuple:
+        """Identify the current on-disk state by file modification times and sizes."""
+        if self._store is not None:
+            paths = (self.db_file, self.db_file + "-wal")
+        else:
+            paths = (self.books_file, self.borrowers_file, self.journal_file, self.meta_file,
+                     self.snapshot_file, self.manifest_file)
+        version = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def _mark_synced(self) -> None:
+        """Remember that memory matches what is on disk right now."""
+        self._seen_version = self._disk_version()
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload books and borrowers if another writer changed them on disk.
+
+        Returns:
+            True if the data was reloaded
+        """
+        with self._lock:
+            if self._disk_version() == self._seen_version:
+                return False
+            self.load()
+            return True
+
+    @contextmanager
+    def _locked_files(self):
+        """
+        Hold the in-process lock and the advisory lock on lock_file.
+        Re-entrant: only the outermost level takes the file lock.
+        """
+        with self._lock:
+            if self._exclusive_depth:
+                self._exclusive_depth += 1
+                try:
+                    yield
+                finally:
+                    self._exclusive_depth -= 1
+                return
+            with open(self.lock_file, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                self._exclusive_depth = 1
+                try:
+                    yield
+                finally:
+                    self._exclusive_depth = 0
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock for a mutation, first reloading if another process wrote since we looked."""
+        with self._locked_files():
+            if self._exclusive_depth == 1:
+                self.reload_if_changed()
+            yield
+
+    def close(self) -> None:
+        """Stop the write-behind thread, write pending changes and the text index, release the backend."""
+        if self._flusher is not None:
+            with self._flush_wakeup:
+                self._stopping = True
+                self._flush_wakeup.notify()
+            if self._flusher is not threading.current_thread():
+                self._flusher.join()
+            self._flusher = None
+        if self._exit_hook is not None:
+            atexit.unregister(self._exit_hook)
+            self._exit_hook = None
+        self.flush()
+        if self._text_index.changed:
+            with self._locked_files() if self.concurrent else nullcontext():
+                self._text_index.save(self.text_index_file)
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    @synchronized
+    def publish_catalog(self) -> int:
+        """
+        Publish the current books and borrowers to catalog_file for
+        ReadOnlyLibrary readers, replacing the previous version.
+
+        Returns:
+            Number of bytes written
+        """
+        from exercises.src.mmap_catalog import publish_catalog
+
+        return publish_catalog(self.catalog_file, [book.to_dict() for book in self.books.values()],
+                               [borrower.to_dict() for borrower in self.borrowers.values()])
+
+    def metrics(self) -> dict:
+        """
+        Per-operation metrics recorded since the Library was created.
+
+        Returns:
+            operation -> {"calls", "errors", "total_ms", "mean_ms", "max_ms",
+            "p50_ms", "p90_ms", "p99_ms", "bytes_serialized", "bytes_written"}, or {} without
+            metrics=True
+        """
+        return self._metrics.snapshot() if self._metrics is not None else {}
+
+    def write_metrics(self, path: str) -> None:
+        """Write metrics() to path in the Prometheus text exposition format."""
+        if self._metrics is None:
+            raise RuntimeError("Metrics are only recorded with metrics=True")
+        self._metrics.write_prometheus(path)
+
+    def checkpoint(self) -> int:
+        """
+        Compact the journal into the JSON snapshot files.
+
+        Returns:
+            Number of journal records that were folded into the snapshot
+        """
+        compacted = self._journal_records
+        self.save()
+        return compacted
+
+    def _load_sequences(self, sequences: dict) -> None:
+        """Rebuild the ID sequences from the saved ones and the loaded IDs (one pass)."""
+        for prefix, ids in (("BOOK", self.books), ("USER", self.borrowers)):
+            highest = max((id_number(item_id) for item_id in ids), default=0)
+            sequences[prefix] = max(sequences.get(prefix, 0), highest)
+        self._sequences = sequences
+
+    def register_index(self, field: str) -> None:
+        """Maintain a secondary hash index on a Book attribute."""
+        if field not in self._indexes:
+            self._indexes[field] = {}
+            self._rebuild_indexes(field)
+
+    def _rebuild_derived(self) -> None:
+        """Recompute every structure derived from self.books / self.borrowers."""
+        self._derived_ready = True
+        for field in self._indexes:
+            self._rebuild_indexes(field)
+        self._text_index.sync(self.books)
+        self._loans = {book_id: borrower_id for borrower_id, borrower in self.borrowers.items()
+                       for book_id in borrower.borrowed_books}
+        self._due_index = self._sorted_due_dates()
+        stats = self._count_statistics()
+        self._available_count = stats["available_books"]
+        self._genre_counts = stats["books_by_genre"]
+
+    def _sorted_due_dates(self) -> list:
+        """The (due, book_id) pairs of every dated loan, sorted."""
+        return sorted((due, book_id) for borrower in self.borrowers.values()
+                      for book_id, (_, due) in borrower.loan_dates.items())
+
+    def _ensure_derived(self) -> None:
+        """Build indexes and counters deferred by a sharded load."""
+        if not self._derived_ready:
+            self._rebuild_derived()
+
+    def _rebuild_indexes(self, field: str) -> None:
+        index = self._indexes[field] = {}
+        for book_id, book in self.books.items():
+            index.setdefault(fold(getattr(book, field)), set()).add(book_id)
+
+    def _index_book(self, book: "Book") -> None:
+        for field, index in self._indexes.items():
+            index.setdefault(fold(getattr(book, field)), set()).add(book.book_id)
+
+    def _reindex_book(self, book: "Book", field: str, old_value) -> None:
+        """Move book from the old_value posting of field to its current value."""
+        index = self._indexes.get(field)
+        if index is None:
+            return
+        posting = index.get(fold(old_value))
+        if posting is not None:
+            posting.discard(book.book_id)
+            if not posting:
+                del index[fold(old_value)]
+        index.setdefault(fold(getattr(book, field)), set()).add(book.book_id)
+
+    def _next_id(self, prefix: str) -> str:
+        """Allocate the next ID for prefix in O(1)."""
+        number = self._sequences.get(prefix, 0) + 1
+        self._sequences[prefix] = number
+        return f"{prefix}_{number:04d}"
+
+    @contextmanager
+    def batch(self):
+        """
+        Group several mutations into one unit with a single deferred write.
+
+        Inside the block add_book, add_borrower, checkout_book and return_book
+        only change memory. On normal exit everything is persisted once (one
+        snapshot rewrite, or one journal record in journal mode). If an
+        exception escapes, books and borrowers are rolled back to their state
+        at entry and nothing is written. Nested batches join the outer one.
+
+        Example:
+            with library.batch():
+                for title, author, genre in catalog:
+                    library.add_book(title, author, genre)
+        """
+        if self._batch is not None:
+            yield self
+            return
+        with self._mutation_guard():
+            yield from self._run_batch()
+
+    def _run_batch(self):
+        """Body of batch(): snapshot, collect changes, then write once or roll back."""
+        books_before = {book_id: book.to_dict() for book_id, book in self.books.items()}
+        borrowers_before = {borrower_id: borrower.to_dict()
+                            for borrower_id, borrower in self.borrowers.items()}
+        sequences_before = dict(self._sequences)
+        self._batch = {"op": None, "books": {}, "borrowers": {}}
+        try:
+            yield self
+        except BaseException:
+            self._batch = None
+            # IDs handed out inside the batch are free again
+            self._sequences = sequences_before
+            self.books = self._collection("books", {book_id: Book.from_dict(data)
+                                                    for book_id, data in books_before.items()})
+            self.borrowers = self._collection("borrowers", {borrower_id: Borrower.from_dict(data)
+                                                            for borrower_id, data in borrowers_before.items()})
+            # Changes pending from before the batch must be written from
+            # the restored objects, not the replaced ones carrying the
+            # rolled-back changes
+            for kind, collection in (("books", self.books), ("borrowers", self.borrowers)):
+                pending = self._pending[kind]
+                for item_id in list(pending):
+                    if item_id in collection:
+                        pending[item_id] = collection[item_id]
+                    else:
+                        del pending[item_id]
+            if self._search_cache is not None:
+                self._search_cache.clear()
+            self._rebuild_derived()
+            raise
+        pending, self._batch = self._batch, None
+        if pending["books"] or pending["borrowers"]:
+            self._record_change("batch", books=pending["books"].values(),
+                                borrowers=pending["borrowers"].values())
+
+    def _replay_journal(self) -> int:
+        """
+        Apply journal records on top of the loaded snapshot, return how many.
+
+        A torn final line (a crash mid-append) is cut off the file, so the
+        next record is appended after the last complete one instead of
+        onto the partial line.
+        """
+        replayed = 0
+        try:
+            with open(self.journal_file, "rb+") as f:
+                good_end = 0
+                for line in f:
+                    if line.strip():
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError("record without its newline")
+                            record = json.loads(line)
+                        except ValueError:
+                            # Nothing after a torn record is valid
+                            f.truncate(good_end)
+                            break
+                        self._apply_record(record)
+                        replayed += 1
+                    good_end += len(line)
+        except FileNotFoundError:
+            pass
+        return replayed
 
+    def _apply_record(self, record: dict) -> None:
+        """Upsert the book and borrower states carried by a journal record."""
+        for book_dict in record.get("books", []):
+            self.books[book_dict["book_id"]] = Book.from_dict(book_dict)
+        for borrower_dict in record.get("borrowers", []):
+            self.borrowers[borrower_dict["borrower_id"]] = Borrower.from_dict(borrower_dict)
+
+    def _record_change(self, op: str, books: list = (), borrowers: list = ()) -> None:
+        """
+        Persist a single mutation.
+
+        In journal mode the new state of every touched book and borrower is
+        appended as one line to the journal, and the sqlite backend upserts
+        just those rows; otherwise both JSON files are rewritten. Inside
+        batch() the touched records are only collected, and with
+        autosave=False or write_behind=True they wait for a flush.
+        """
+        if books and self._search_cache is not None:
+            # Loans only flip "available"; anything else may add matches anywhere
+            self._search_cache.touch("available" if op in ("checkout", "return") else None)
+        pending = self._batch if self._batch is not None else self._pending
+        pending["op"] = op if pending["op"] in (None, op) else "batch"
+        for book in books:
+            pending["books"][book.book_id] = book
+        for borrower in borrowers:
+            pending["borrowers"][borrower.borrower_id] = borrower
+        if self._batch is not None:
+            return
+        if self._shards is not None:
+            self._dirty.update(("books", self._shards.key("books", book)) for book in books)
+            self._dirty.update(("borrowers", self._shards.key("borrowers", borrower)) for borrower in borrowers)
+        else:
+            if books:
+                self._dirty.add("books")
+            if borrowers:
+                self._dirty.add("borrowers")
+        self._pending_changes += 1
+        if self.write_behind:
+            if self._pending_changes >= self.max_pending:
+                with self._flush_wakeup:
+                    self._flush_wakeup.notify()
+        elif self.autosave:
+            self.flush()
+
+    @mutation
     def add_book(self, title: str, author: str, genre: str) -> Book:
         """Add a new book to the library."""
         # TODO: Generate new book_id using generate_id
         # TODO: Create Book, add to self.books, save, and return
-        book_id = generate_id("BOOK", list(self.books.keys()))
+        book_id = self._next_id("BOOK")
         book = Book(book_id=book_id, title=title, author=author, genre=genre)
-        self.books[book.book_id] = book
-        self.save()
+        self._insert_book(book)
+        self._record_change("add_book", books=[book])
         return book
 
+    def _insert_book(self, book: Book) -> None:
+        """Add a new book to self.books and every derived structure."""
+        self.books[book.book_id] = book
+        self._index_book(book)
+        self._text_index.add(book)
+        self._available_count += book.available
+        self._genre_counts[book.genre] = self._genre_counts.get(book.genre, 0) + 1
+
+    @mutation
     def add_borrower(self, name: str, email: str) -> Borrower:
         """Register a new borrower."""
         # TODO: Generate new borrower_id, create Borrower, add to self.borrowers, save, return
-        borrower_id = generate_id("USER", list(self.borrowers.keys()))
+        borrower_id = self._next_id("USER")
         borrower = Borrower(borrower_id, name, email)
         self.borrowers[borrower.borrower_id] = borrower
-        self.save()
+        self._record_change("add_borrower", borrowers=[borrower])
         return borrower
 
-    def checkout_book(self, book_id: str, borrower_id: str) -> bool:
+    @mutation
+    def import_books(self, path: str, chunk_size: int = 10000) -> dict:
+        """
+        Stream books from a CSV or JSONL file into the library.
+
+        Each row needs title, author and genre (any book_id is ignored and a
+        new one allocated). Rows are processed chunk_size at a time: genres
+        are validated for the whole chunk, IDs are allocated for all valid
+        rows in one step, and everything is persisted once at the end.
+        Invalid rows are written to "<path>.rejects.jsonl" with the reason
+        instead of aborting the import.
+
+        Returns:
+            {"imported": int, "rejected": int, "seconds": float,
+             "records_per_sec": float, "rejects_file": str or None}
+        """
+        return self._import(path, chunk_size, self._validate_book_row, self._import_book_chunk)
+
+    @mutation
+    def import_borrowers(self, path: str, chunk_size: int = 10000) -> dict:
+        """
+        Stream borrowers (name, email) from a CSV or JSONL file.
+
+        Works like import_books and returns the same report.
         """
-        Borrower checks out a book.
+        return self._import(path, chunk_size, self._validate_borrower_row, self._import_borrower_chunk)
+
+    def _import(self, path: str, chunk_size: int, validate, import_chunk) -> dict:
+        start = time.perf_counter()
+        rejects_file = f"{path}.rejects.jsonl"
+        imported = rejected = 0
+        rows = read_records(path)
+        # Opened at the first rejected row, so a clean or failed import leaves no file
+        rejects = None
+        try:
+            with self.batch():
+                while True:
+                    chunk = list(islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    valid = []
+                    for line, row in chunk:
+                        error = validate(row)
+                        if error:
+                            if rejects is None:
+                                rejects = open(rejects_file, "w", encoding="utf-8")
+                            rejects.write(json.dumps({"line": line, "row": row, "error": error}) + "\n")
+                            rejected += 1
+                        else:
+                            valid.append(row)
+                    import_chunk(valid)
+                    imported += len(valid)
+        finally:
+            if rejects is not None:
+                rejects.close()
+        seconds = time.perf_counter() - start
+        return {
+            "imported": imported,
+            "rejected": rejected,
+            "seconds": seconds,
+            "records_per_sec": imported / seconds if seconds else 0.0,
+            "rejects_file": rejects_file if rejected else None,
+        }
+
+    @staticmethod
+    def _validate_book_row(row: dict) -> str:
+        """Return why an imported book row is invalid, or None."""
+        if "_error" in row:
+            return row["_error"]
+        error = _check_text_fields(row, ("title", "author", "genre"))
+        if error:
+            return error
+        if row["genre"] not in Book.GENRE_CODES:
+            return f"Invalid genre: {row['genre']}. Must be one of {Book.GENRES}"
+        return None
+
+    @staticmethod
+    def _validate_borrower_row(row: dict) -> str:
+        """Return why an imported borrower row is invalid, or None."""
+        if "_error" in row:
+            return row["_error"]
+        return _check_text_fields(row, ("name", "email"))
+
+    def _import_book_chunk(self, rows: list) -> None:
+        first = self._sequences.get("BOOK", 0) + 1
+        self._sequences["BOOK"] = first + len(rows) - 1
+        books = [Book(f"BOOK_{number:04d}", row["title"], row["author"], row["genre"])
+                 for number, row in enumerate(rows, first)]
+        for book in books:
+            self._insert_book(book)
+        self._record_change("import", books=books)
+
+    def _import_borrower_chunk(self, rows: list) -> None:
+        first = self._sequences.get("USER", 0) + 1
+        self._sequences["USER"] = first + len(rows) - 1
+        borrowers = [Borrower(f"USER_{number:04d}", row["name"], row["email"])
+                     for number, row in enumerate(rows, first)]
+        for borrower in borrowers:
+            self.borrowers[borrower.borrower_id] = borrower
+        self._record_change("import", borrowers=borrowers)
+
+    @mutation
+    def checkout_book(self, book_id: str, borrower_id: str, checked_out: datetime = None) -> bool:
+        """
+        Borrower checks out a book on checked_out (a date, datetime or
+        "YYYY-MM-DD" string; default: today); it is due loan_days later.
         Returns False if book unavailable, borrower not found, or at max limit.
         """
         # TODO: Validate book exists and is available
@@ -307,13 +1682,21 @@ class Library:
             return False
 
         if book.available and borrower.can_borrow():
+            # Before any change, so a malformed date leaves everything as it was
+            checked_out = _day(checked_out)
+            due = format_date(datetime.strptime(checked_out, "%Y-%m-%d") + timedelta(days=self.loan_days))
             book.available = False
-            borrower.borrow_book(book_id)
-            self.save()
+            self._reindex_book(book, "available", True)
+            self._available_count -= 1
+            borrower.borrow_book(book_id, checked_out, due)
+            self._loans[book_id] = borrower_id
+            insort(self._due_index, (due, book_id))
+            self._record_change("checkout", books=[book], borrowers=[borrower])
             return True
 
         return False
 
+    @mutation
     def return_book(self, book_id: str, borrower_id: str) -> bool:
         """
         Borrower returns a book.
@@ -328,25 +1711,222 @@ class Library:
 
         if not book or not borrower:
             return False
-        if book_id not in borrower.borrowed_books:
+        if not borrower.has_book(book_id):
             return False
         book.available = True
+        self._reindex_book(book, "available", False)
+        self._available_count += 1
+        dates = borrower.loan_dates.get(book_id)
         borrower.return_book(book_id)
-        self.save()
+        self._loans.pop(book_id, None)
+        if dates is not None:
+            entry = (dates[1], book_id)
+            position = bisect_left(self._due_index, entry)
+            if position < len(self._due_index) and self._due_index[position] == entry:
+                del self._due_index[position]
+        self._record_change("return", books=[book], borrowers=[borrower])
         return True
 
-    def search_books(self, **criteria) -> list:
-        """Search books by any criteria (title, author, genre, available)."""
+    @synchronized
+    def search_books(self, query: Query = None, **criteria) -> list:
+        """
+        Search books by any criteria (title, author, genre, available).
+
+        Criteria may carry compile_query operators (title__contains="python",
+        genre__in=[...]), and a Query compiled once can be passed instead
+        and reused across calls. Equality and "in" conditions on indexed
+        fields are answered from the indexes; the rest is tested on the
+        Book objects, and only matches are converted to dicts.
+
+        With search_cache_size set, the matching books are remembered per
+        normalized criteria (see SearchCache) and reused until a mutation
+        changes a field the criteria read.
+        """
         # TODO: Use search_items helper function
         # Hint: Convert self.books.values() to list of dicts first
-        books_as_dicts = [book.to_dict() for book in self.books.values()]
-        return search_items(books_as_dicts, **criteria)
+        self._ensure_derived()
+        conditions = (query.conditions if query is not None else []) + compile_query(**criteria).conditions
+        cache = self._search_cache
+        key = cache.key(conditions) if cache is not None else None
+        if key is None:
+            return [book.to_dict() for book in self._find_books(conditions)]
+        books = cache.get(key)
+        if books is None:
+            books = self._find_books(conditions)
+            cache.put(key, {condition.field for condition in conditions}, books)
+        return [book.to_dict() for book in books]
+
+    def search_cache_info(self) -> dict:
+        """
+        Search cache statistics, for tuning search_cache_size.
+
+        Returns:
+            {"hits", "misses", "evictions", "invalidations", "size",
+            "capacity", "hit_rate"}, or {} without a search cache
+        """
+        return self._search_cache.info() if self._search_cache is not None else {}
+
+    def _find_books(self, conditions: list) -> list:
+        """The Book objects matching conditions, in search_books result order."""
+        postings, residual = self._plan_search(conditions)
+        if not postings:
+            return [book for book in self.books.values() if residual.matches(book)]
+
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            if not matches:
+                break
+            matches &= posting
+        books = (self.books[book_id] for book_id in sorted(matches, key=id_number))
+        return [book for book in books if residual.matches(book)]
+
+    def _plan_search(self, conditions: list) -> tuple:
+        """
+        Split conditions into index postings (smallest first) and a
+        residual Query for everything the indexes cannot answer.
+        """
+        postings = []
+        remaining = []
+        for condition in conditions:
+            index = self._indexes.get(condition.field)
+            if index is None or condition.op not in ("eq", "in"):
+                remaining.append(condition)
+            elif condition.op == "eq":
+                postings.append(index.get(fold(condition.value), set()))
+            else:
+                postings.append(set().union(*(index.get(fold(value), ()) for value in condition.value)))
+        postings.sort(key=len)
+        return postings, Query(remaining)
+
+    def _next_matches(self, conditions: list, after: int, count: int) -> list:
+        """
+        Return up to count matching books whose ID number is above after,
+        in ID order, holding no more than count books at any time.
+
+        Either the smallest index posting is scanned whole for its count
+        lowest IDs, or the ID space is walked upwards from after until count
+        books matched. A posting holding a fraction p of the IDs needs about
+        count / p probes to fill the page, so the posting is scanned only
+        when it is smaller than that walk; a dense posting is walked, and a
+        page costs O(count / p) rather than O(matches).
+        """
+        self._ensure_derived()
+        postings, residual = self._plan_search(conditions)
+        last = self._sequences.get("BOOK", 0)
+        remaining = last - after
+        if postings and len(postings[0]) < min(remaining, count * remaining / max(len(postings[0]), 1)):
+            others = postings[1:]
+            candidates = (book_id for book_id in postings[0]
+                          if id_number(book_id) > after and all(book_id in posting for posting in others)
+                          and residual.matches(self.books[book_id]))
+            return [self.books[book_id] for book_id in heapq.nsmallest(count, candidates, key=id_number)]
+        matches = []
+        for number in range(after + 1, last + 1):
+            # The form _next_id gives every book ID
+            book = self.books.get(f"BOOK_{number:04d}")
+            if (book is not None and all(book.book_id in posting for posting in postings)
+                    and residual.matches(book)):
+                matches.append(book)
+                if len(matches) == count:
+                    break
+        return matches
+
+    def iter_books(self, query: Query = None, after: str = None, **criteria):
+        """
+        Yield the books matching criteria (as for search_books) one by one,
+        in book_id order, starting after the book_id `after`.
+
+        Matches are found a chunk of ITER_CHUNK books at a time, under the
+        lock, so memory stays bounded however many books match and a
+        caller may stop early without paying for the rest.
+
+        Example:
+            for book in library.iter_books(title__contains="python"):
+                ...
+        """
+        conditions = (query.conditions if query is not None else []) + compile_query(**criteria).conditions
+        position = 0 if after is None else id_number(after)
+        while True:
+            with self._lock:
+                chunk = self._next_matches(conditions, position, self.ITER_CHUNK)
+            yield from chunk
+            if len(chunk) < self.ITER_CHUNK:
+                return
+            position = id_number(chunk[-1].book_id)
+
+    @synchronized
+    def search_books_page(self, criteria=None, limit: int = 25, cursor: str = None) -> dict:
+        """
+        Return one page of search_books results, in book_id order.
+
+        Parameters:
+            criteria: dict of search criteria (operators allowed) or a Query
+            limit: Maximum number of books on the page
+            cursor: next_cursor of the previous page, None for the first page
+
+        Returns:
+            {"books": [book dicts], "next_cursor": str or None}
+
+        The cursor is the last book_id of the page, so it stays valid while
+        books are added: later pages simply include them.
+        """
+        if limit < 1:
+            raise ValueError(f"limit must be positive, got {limit}")
+        if isinstance(criteria, Query):
+            conditions = criteria.conditions
+        else:
+            conditions = compile_query(**(criteria or {})).conditions
+        books = self._next_matches(conditions, 0 if cursor is None else id_number(cursor), limit + 1)
+        page = books[:limit]
+        return {
+            "books": [book.to_dict() for book in page],
+            "next_cursor": page[-1].book_id if len(books) > limit else None,
+        }
+
+    @synchronized
+    def text_search(self, query: str, limit: int = None, prefix: bool = True) -> list:
+        """
+        Find books whose title or author contains every word of query.
+
+        Matching is case-insensitive and, with prefix=True, the last word
+        may be incomplete ("pyth" finds "Python"). Results are Book objects
+        ranked best match first.
+
+        Example:
+            library.text_search("python smith") -> [Book("Python 101", "Smith"), ...]
+        """
+        self._ensure_derived()
+        book_ids = self._text_index.search(query, limit=limit, prefix=prefix)
+        return [self.books[book_id] for book_id in book_ids]
+
+    @synchronized
+    def fuzzy_search(self, query: str, limit: int = 10, threshold: float = 0.3,
+                     budget_ms: float = None) -> list:
+        """
+        Find books whose title or author words resemble the words of query.
+
+        Parameters:
+            query: Search text, possibly misspelled ("Smtih")
+            limit: Maximum number of books to return
+            threshold: Minimum trigram similarity (0-1) for a word to match
+            budget_ms: Optional time budget; scoring stops when it runs out
+                and the best books found so far are returned
 
+        Returns:
+            Up to limit Book objects, most similar first
+        """
+        self._ensure_derived()
+        book_ids = self._text_index.fuzzy_search(query, limit=limit, threshold=threshold,
+                                                 budget_ms=budget_ms)
+        return [self.books[book_id] for book_id in book_ids]
+
+    @synchronized
     def get_available_books(self) -> list:
         """Get list of all available books."""
         # TODO: Return books where available=True
         return [book for book in self.books.values() if book.available]
 
+    @synchronized
     def get_borrower_books(self, borrower_id: str) -> list:
         """Get list of books currently borrowed by a borrower."""
         # TODO: Get borrower, return list of Book objects for their borrowed_books
@@ -355,17 +1935,105 @@ class Library:
             return []
         return [self.books[book_id] for book_id in borrower.borrowed_books if book_id in self.books]
 
+    @synchronized
+    def who_has(self, book_id: str) -> str:
+        """Return the borrower_id currently holding book_id, or None."""
+        self._ensure_derived()
+        return self._loans.get(book_id)
+
+    @synchronized
+    def check_loans(self) -> list:
+        """
+        Cross-check the loan index against borrowed_books and availability.
+
+        Returns:
+            A list of problems found, empty if all three agree
+        """
+        self._ensure_derived()
+        problems = []
+        held = {}
+        for borrower_id, borrower in self.borrowers.items():
+            for book_id in borrower.borrowed_books:
+                if book_id in held:
+                    problems.append(f"{book_id} is borrowed by both {held[book_id]} and {borrower_id}")
+                held[book_id] = borrower_id
+                if self._loans.get(book_id) != borrower_id:
+                    problems.append(f"{book_id} is borrowed by {borrower_id} but indexed "
+                                    f"as held by {self._loans.get(book_id)}")
+        for book_id, borrower_id in self._loans.items():
+            if book_id not in held:
+                problems.append(f"{book_id} is indexed as held by {borrower_id}, who does not have it")
+        if self._due_index != self._sorted_due_dates():
+            problems.append("The due date index does not match the borrowers' loan dates")
+        for book_id, book in self.books.items():
+            if book.available and book_id in held:
+                problems.append(f"{book_id} is borrowed by {held[book_id]} but marked available")
+            elif not book.available and book_id not in held:
+                problems.append(f"{book_id} is checked out but nobody has it")
+        return problems
+
+    @synchronized
+    def overdue(self, as_of=None) -> list:
+        """
+        Loans due before as_of (a date, datetime or "YYYY-MM-DD"; default
+        today), earliest due date first.
+
+        Returns:
+            [{"book_id", "borrower_id", "checked_out", "due"}, ...]
+        """
+        self._ensure_derived()
+        end = bisect_left(self._due_index, _day(as_of), key=lambda entry: entry[0])
+        return self._loan_records(0, end)
+
+    @synchronized
+    def due_between(self, start, end) -> list:
+        """
+        Loans due from start to end, both inclusive (dates, datetimes or
+        "YYYY-MM-DD"), earliest due date first. Same records as overdue().
+        """
+        self._ensure_derived()
+        due = lambda entry: entry[0]
+        first = bisect_left(self._due_index, _day(start), key=due)
+        last = bisect_right(self._due_index, _day(end), key=due)
+        return self._loan_records(first, last)
+
+    def _loan_records(self, first: int, last: int) -> list:
+        records = []
+        for due, book_id in self._due_index[first:last]:
+            borrower_id = self._loans[book_id]
+            checked_out = self.borrowers[borrower_id].loan_dates[book_id][0]
+            records.append({"book_id": book_id, "borrower_id": borrower_id,
+                            "checked_out": checked_out, "due": due})
+        return records
+
+    @synchronized
     def get_statistics(self) -> dict:
         """
         Return library statistics.
         Uses the concepts of dict comprehension and aggregation.
         """
+        self._ensure_derived()
         # TODO: Return dict with:
         # - total_books: total number of books
         # - available_books: number of available books
         # - checked_out: number of checked out books
         # - total_borrowers: number of borrowers
         # - books_by_genre: dict of genre -> count
+        stats = {
+            "total_books": len(self.books),
+            "available_books": self._available_count,
+            "checked_out": len(self.books) - self._available_count,
+            "total_borrowers": len(self.borrowers),
+            "books_by_genre": dict(self._genre_counts)
+        }
+        if self.debug_stats:
+            recount = self._count_statistics()
+            if stats != recount:
+                raise RuntimeError(f"Statistics counters drifted: {stats} != recount {recount}")
+        return stats
+
+    def _count_statistics(self) -> dict:
+        """Compute get_statistics() from scratch by walking every book."""
         stats = {
             "total_books": len(self.books),
             "available_books": 0,
@@ -386,3 +2054,293 @@ class Library:
         return stats
 
 
+
+
+# =============================================================================
+# PART 5: SEARCH INDEXES
+# =============================================================================
+
+class TextIndex:
+    """
+    Inverted index from title/author tokens to the books containing them.
+
+    Attributes:
+        postings (dict): token -> {book_id: weight}, where title tokens
+            weigh TITLE_WEIGHT and author tokens AUTHOR_WEIGHT
+        docs (dict): book_id -> list of tokens, used to remove a book
+        vocabulary (list): Sorted tokens, for prefix expansion with bisect
+        trigrams (TrigramIndex): Trigram lookup over the vocabulary
+        changed (bool): Whether the index changed since it was loaded or saved
+
+    Methods:
+        add(book): Index a book's title and author
+        remove(book_id): Drop a book from the index
+        sync(books): Add missing and drop unknown books so the index matches
+        search(query, limit, prefix) -> list: Ranked book_ids matching query
+        fuzzy_search(query, limit, threshold, budget_ms) -> list: Typo-tolerant search
+        save(filepath) / load(filepath): Persist as JSON
+    """
+
+    VERSION = 1
+    TITLE_WEIGHT = 2
+    AUTHOR_WEIGHT = 1
+    PREFIX_FACTOR = 0.5  # prefix expansions rank below exact word matches
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+        self.vocabulary = []
+        self.trigrams = TrigramIndex()
+        self.changed = False
+
+    def add(self, book: "Book") -> None:
+        if book.book_id in self.docs:
+            return
+        self.changed = True
+        title_tokens = tokenize(book.title)
+        author_tokens = tokenize(book.author)
+        self.docs[book.book_id] = title_tokens + author_tokens
+        for tokens, weight in ((title_tokens, self.TITLE_WEIGHT), (author_tokens, self.AUTHOR_WEIGHT)):
+            for token in tokens:
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = {}
+                    insort(self.vocabulary, token)
+                    self.trigrams.add(token)
+                posting[book.book_id] = posting.get(book.book_id, 0) + weight
+
+    def remove(self, book_id: str) -> None:
+        if book_id in self.docs:
+            self.changed = True
+        for token in set(self.docs.pop(book_id, ())):
+            posting = self.postings[token]
+            posting.pop(book_id, None)
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+                self.trigrams.remove(token)
+
+    def sync(self, books: dict) -> None:
+        for book_id in [book_id for book_id in self.docs if book_id not in books]:
+            self.remove(book_id)
+        for book_id, book in books.items():
+            if book_id not in self.docs:
+                self.add(book)
+
+    def _expand(self, term: str) -> list:
+        """Return the vocabulary tokens that start with term."""
+        start = bisect_left(self.vocabulary, term)
+        end = bisect_left(self.vocabulary, term + "\U0010ffff")
+        return self.vocabulary[start:end]
+
+    def search(self, query: str, limit: int = None, prefix: bool = True) -> list:
+        terms = tokenize(query)
+        if not terms:
+            return []
+        total = len(self.docs)
+        scores = None
+        for position, term in enumerate(terms):
+            expansions = [term]
+            if prefix and position == len(terms) - 1:
+                expansions = self._expand(term)
+            term_scores = {}
+            for token in expansions:
+                posting = self.postings.get(token, {})
+                factor = 1 if token == term else self.PREFIX_FACTOR
+                idf = math.log(1 + total / len(posting)) if posting else 0
+                for book_id, weight in posting.items():
+                    score = weight * idf * factor
+                    if score > term_scores.get(book_id, 0):
+                        term_scores[book_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {book_id: score + term_scores[book_id]
+                          for book_id, score in scores.items() if book_id in term_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda book_id: (-scores[book_id], id_number(book_id)))
+        return ranked[:limit] if limit is not None else ranked
+
+    def fuzzy_search(self, query: str, limit: int = 10, threshold: float = 0.3,
+                     budget_ms: float = None) -> list:
+        """
+        Rank books by how closely their words match the words of query.
+
+        Each query word is matched to indexed words sharing trigrams with it;
+        a book scores the mean, over query words, of its best word similarity.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms is not None else None
+        scores = {}
+        for term in terms:
+            best = {}
+            for token, similarity in self.trigrams.similar(term, threshold):
+                for book_id in self.postings[token]:
+                    if similarity > best.get(book_id, 0):
+                        best[book_id] = similarity
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+            for book_id, similarity in best.items():
+                scores[book_id] = scores.get(book_id, 0) + similarity / len(terms)
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        return heapq.nsmallest(limit, scores, key=lambda book_id: (-scores[book_id], id_number(book_id)))
+
+    def save(self, filepath: str) -> None:
+        save_json(filepath, {"version": self.VERSION, "docs": self.docs, "postings": self.postings})
+        self.changed = False
+
+    @classmethod
+    def load(cls, filepath: str) -> "TextIndex":
+        """Load a saved index, or return an empty one if missing or outdated."""
+        index = cls()
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return index
+        if data.get("version") != cls.VERSION:
+            return index
+        index.docs = data["docs"]
+        index.postings = data["postings"]
+        index.vocabulary = sorted(index.postings)
+        for token in index.vocabulary:
+            index.trigrams.add(token)
+        return index
+
+
+class TrigramIndex:
+    """
+    Maps trigrams to the words containing them, for typo-tolerant lookup.
+
+    Similarity between two words is the Dice coefficient of their trigram
+    sets, 2 * shared / (len(a) + len(b)), which is always between 0 and 1.
+
+    Methods:
+        add(word) / remove(word): Maintain the index
+        similar(word, threshold) -> list: (word, similarity) pairs, best first
+    """
+
+    def __init__(self):
+        self.words = {}  # word -> number of trigrams
+        self.postings = {}  # trigram -> set of words
+
+    def add(self, word: str) -> None:
+        grams = trigrams(word)
+        self.words[word] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(word)
+
+    def remove(self, word: str) -> None:
+        if self.words.pop(word, None) is None:
+            return
+        for gram in trigrams(word):
+            posting = self.postings[gram]
+            posting.discard(word)
+            if not posting:
+                del self.postings[gram]
+
+    def similar(self, word: str, threshold: float = 0.3) -> list:
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        matches = []
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + self.words[candidate])
+            if similarity >= threshold:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+
+class SearchCache:
+    """
+    LRU cache of search_books results, keyed by normalized criteria.
+
+    An entry holds the matching Book objects, not their dicts, so it only
+    depends on the fields its criteria read: a checkout (which changes
+    "available") leaves a genre or author search cached, while a new book
+    invalidates everything. Invalidation is lazy: mutations bump a
+    generation counter (per field, or global) in O(1), and an entry whose
+    recorded generations no longer match is dropped when it is next
+    looked up.
+
+    Attributes:
+        capacity (int): Maximum number of entries
+        stats (dict): hits, misses, evictions (to stay within capacity)
+            and invalidations (entries dropped as out of date)
+
+    Methods:
+        key(conditions) -> frozenset: Cache key, or None if uncacheable
+        get(key) -> list: Cached books, or None
+        put(key, fields, books): Store books found for key
+        touch(field): Invalidate entries reading field (None: all entries)
+        clear(): Drop every entry
+        info() -> dict: stats plus size, capacity and hit_rate
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._entries = OrderedDict()  # key -> (books, fields, generations)
+        self._generation = 0
+        self._field_generations = {}
+
+    @staticmethod
+    def key(conditions: list) -> frozenset:
+        """
+        Normalize conditions so equivalent searches share an entry: order
+        does not matter and values are case-folded as matching folds them.
+        """
+        normalized = set()
+        try:
+            for field, op, value in conditions:
+                if op == "in":
+                    value = frozenset(map(fold, value))
+                normalized.add((field, op, fold(value)))
+        except TypeError:  # an unhashable criteria value
+            return None
+        return frozenset(normalized)
+
+    def _generations(self, fields: tuple) -> tuple:
+        return self._generation, tuple(self._field_generations.get(field, 0) for field in fields)
+
+    def get(self, key: frozenset) -> list:
+        entry = self._entries.get(key)
+        if entry is not None:
+            books, fields, generations = entry
+            if generations == self._generations(fields):
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return books
+            del self._entries[key]
+            self.stats["invalidations"] += 1
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: frozenset, fields: set, books: list) -> None:
+        fields = tuple(sorted(fields))
+        self._entries[key] = (books, fields, self._generations(fields))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def touch(self, field: str = None) -> None:
+        if field is None:
+            self._generation += 1
+        else:
+            self._field_generations[field] = self._field_generations.get(field, 0) + 1
+
+    def clear(self) -> None:
+        self.stats["invalidations"] += len(self._entries)
+        self._entries.clear()
+
+    def info(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "size": len(self._entries), "capacity": self.capacity,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0}
@@ -0,0 +1,184 @@
+"""
+Sharded JSON persistence for the Library
+========================================
+Splits books and borrowers across shard files so that a mutation rewrites
+only the shard holding the touched records, not the whole catalog.
+
+    library = Library("Main", "data", shard_by="hash", shards=16)
+
+Strategies (shard_by):
+    "hash"   crc32 of the ID modulo shards
+    "range"  consecutive blocks of shard_size ID numbers (BOOK_0001 to
+             BOOK_9999 with shard_size=10000 land in shard 0)
+    "genre"  one shard per Book.genre; borrowers are hashed
+
+Files, in data_dir:
+    library_manifest.json        strategy, record count per shard, ID sequences
+    library_shards/books_<key>.json, library_shards/borrowers_<key>.json
+
+Shard files are read on first access: looking up an ID reads only the
+shard it hashes or ranges to, while iterating, len() and any lookup by ID
+under the genre strategy read them all.
+"""
+
+import os
+import zlib
+
+SHARD_STRATEGIES = ("hash", "range", "genre")
+MANIFEST_VERSION = 1
+
+
+class ShardLayout:
+    """
+    Maps records to shard keys and shard keys to files.
+
+    Attributes:
+        shard_by (str): One of SHARD_STRATEGIES
+        shards (int): Number of hash shards
+        shard_size (int): IDs per range shard
+        manifest_file (str): Path of the manifest
+        directory (str): Directory holding the shard files
+    """
+
+    def __init__(self, data_dir: str, shard_by: str = "hash", shards: int = 8, shard_size: int = 10000):
+        if shard_by not in SHARD_STRATEGIES:
+            raise ValueError(f"Invalid shard strategy: {shard_by}. Must be one of {SHARD_STRATEGIES}")
+        if shards < 1 or shard_size < 1:
+            raise ValueError("shards and shard_size must be positive")
+        self.shard_by = shard_by
+        self.shards = shards
+        self.shard_size = shard_size
+        self.manifest_file = os.path.join(data_dir, "library_manifest.json")
+        self.directory = os.path.join(data_dir, "library_shards")
+
+    def key(self, kind: str, item) -> str:
+        """Shard key of a Book ("books") or Borrower ("borrowers")."""
+        if kind == "books" and self.shard_by == "genre":
+            return item.genre.lower()
+        return self.key_for_id(kind, item.book_id if kind == "books" else item.borrower_id)
+
+    def key_for_id(self, kind: str, item_id: str) -> str:
+        """Shard key derived from an ID alone, or None if the ID does not determine it."""
+        if kind == "books" and self.shard_by == "genre":
+            return None
+        if self.shard_by == "range":
+            # The number after the last "_", as project.id_number reads it
+            return str(int(item_id.rpartition("_")[2]) // self.shard_size)
+        return str(zlib.crc32(item_id.encode("utf-8")) % self.shards)
+
+    def path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, f"{kind}_{key}.json")
+
+    def manifest(self, counts: dict, sequences: dict) -> dict:
+        """Build the manifest for the given {kind: {key: count}}."""
+        return {"version": MANIFEST_VERSION, "shard_by": self.shard_by, "shards": self.shards,
+                "shard_size": self.shard_size, **counts, "sequences": sequences}
+
+    def check(self, manifest: dict) -> None:
+        """Raise ValueError if manifest was written with a different layout."""
+        saved = (manifest.get("shard_by"), manifest.get("shards"), manifest.get("shard_size"))
+        if saved != (self.shard_by, self.shards, self.shard_size):
+            raise ValueError(f"{self.manifest_file} uses shard_by={saved[0]!r}, shards={saved[1]}, "
+                             f"shard_size={saved[2]}; open the library with the same settings")
+
+
+class ShardedDict(dict):
+    """
+    The books or borrowers dict of a sharded Library.
+
+    Starts with the shards listed in the manifest unloaded and reads each
+    one through load(kind, key) when a lookup first needs it. Records
+    already in memory win over what a shard file holds. Tracks which IDs
+    belong to which shard so a single shard can be serialized.
+    """
+
+    def __init__(self, layout: ShardLayout, kind: str, load, unloaded: dict = None, items: dict = None):
+        super().__init__()
+        self._layout = layout
+        self._kind = kind
+        self._load = load
+        self._unloaded = dict(unloaded or {})
+        self.members = {}
+        for item_id, item in (items or {}).items():
+            self._store(item_id, item, layout.key(kind, item))
+
+    def load_shard(self, key: str) -> None:
+        if self._unloaded.pop(key, None) is None:
+            return
+        for item_id, item in self._load(self._kind, key).items():
+            if not dict.__contains__(self, item_id):
+                self._store(item_id, item, key)
+
+    def load_all(self) -> None:
+        for key in list(self._unloaded):
+            self.load_shard(key)
+
+    def shard(self, key: str) -> dict:
+        """The loaded records of one shard."""
+        return {item_id: dict.__getitem__(self, item_id) for item_id in self.members.get(key, ())}
+
+    def counts(self) -> dict:
+        """Record count per shard key, including shards not loaded yet."""
+        counts = dict(self._unloaded)
+        counts.update((key, len(ids)) for key, ids in self.members.items())
+        return dict(sorted(counts.items()))
+
+    def _store(self, item_id: str, item, key: str) -> None:
+        dict.__setitem__(self, item_id, item)
+        self.members.setdefault(key, set()).add(item_id)
+
+    def _load_for(self, item_id) -> None:
+        if not self._unloaded or not isinstance(item_id, str):
+            return
+        key = self._layout.key_for_id(self._kind, item_id)
+        if key is None:
+            self.load_all()
+        else:
+            self.load_shard(key)
+
+    def __missing__(self, item_id):
+        self._load_for(item_id)
+        if dict.__contains__(self, item_id):
+            return dict.__getitem__(self, item_id)
+        raise KeyError(item_id)
+
+    def get(self, item_id, default=None):
+        try:
+            return self[item_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, item_id) -> bool:
+        if not dict.__contains__(self, item_id):
+            self._load_for(item_id)
+        return dict.__contains__(self, item_id)
+
+    def __setitem__(self, item_id, item) -> None:
+        key = self._layout.key(self._kind, item)
+        self.load_shard(key)
+        self._store(item_id, item, key)
+
+    def __delitem__(self, item_id) -> None:
+        self._load_for(item_id)
+        dict.__delitem__(self, item_id)
+        for ids in self.members.values():
+            ids.discard(item_id)
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + sum(self._unloaded.values())
+
+    def __iter__(self):
+        self.load_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self.load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+
+    def items(self):
+        self.load_all()
+        return dict.items(self)
@@ -0,0 +1,173 @@
+"""
+SQLite storage backend for the Library
+======================================
+Keeps books and borrowers in a local SQLite database (WAL mode) instead of
+two JSON files, so each Library mutation writes only the rows it touched.
+The database is storage only: the Library answers queries from memory.
+
+Use it through the Library:
+    library = Library("Main", "data", backend="sqlite")
+
+Migrate an existing JSON data directory:
+    python -m exercises.src.sqlite_backend data
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id   TEXT PRIMARY KEY,
+    title     TEXT NOT NULL COLLATE NOCASE,
+    author    TEXT NOT NULL COLLATE NOCASE,
+    genre     TEXT NOT NULL COLLATE NOCASE,
+    available INTEGER NOT NULL
+);
+-- Search indexes of earlier versions, now only a cost on every write
+DROP INDEX IF EXISTS books_author;
+DROP INDEX IF EXISTS books_genre;
+DROP INDEX IF EXISTS books_available;
+
+CREATE TABLE IF NOT EXISTS borrowers (
+    borrower_id    TEXT PRIMARY KEY,
+    name           TEXT NOT NULL,
+    email          TEXT NOT NULL,
+    borrowed_books TEXT NOT NULL,
+    loan_dates     TEXT NOT NULL DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT_BOOK = """
+INSERT INTO books (book_id, title, author, genre, available)
+VALUES (:book_id, :title, :author, :genre, :available)
+ON CONFLICT (book_id) DO UPDATE SET
+    title = excluded.title, author = excluded.author,
+    genre = excluded.genre, available = excluded.available
+"""
+
+UPSERT_BORROWER = """
+INSERT INTO borrowers (borrower_id, name, email, borrowed_books, loan_dates)
+VALUES (:borrower_id, :name, :email, :borrowed_books, :loan_dates)
+ON CONFLICT (borrower_id) DO UPDATE SET
+    name = excluded.name, email = excluded.email,
+    borrowed_books = excluded.borrowed_books, loan_dates = excluded.loan_dates
+"""
+
+UPSERT_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+
+
+class SqliteBackend:
+    """
+    Row-level persistence for Library books and borrowers.
+
+    Rows are exchanged as the same dicts Book.to_dict() and
+    Borrower.to_dict() produce, so this module does not depend on the
+    Library classes.
+
+    Attributes:
+        path (str): Database file
+
+    Methods:
+        load_books() / load_borrowers() -> list: All rows in insertion order
+        load_sequences() -> dict: Saved ID sequences
+        upsert(books, borrowers, sequences): Write changed rows in one transaction
+        write_all(books, borrowers, sequences): Replace the whole contents in one transaction
+        close(): Close the connection
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(borrowers)")}
+        if "loan_dates" not in columns:
+            # Databases created before loans had dates
+            self.connection.execute("ALTER TABLE borrowers ADD COLUMN loan_dates TEXT NOT NULL DEFAULT '{}'")
+
+    def load_books(self) -> list:
+        rows = self.connection.execute(
+            "SELECT book_id, title, author, genre, available FROM books ORDER BY rowid")
+        return [{**row, "available": bool(row["available"])} for row in map(dict, rows)]
+
+    def load_borrowers(self) -> list:
+        rows = self.connection.execute(
+            "SELECT borrower_id, name, email, borrowed_books, loan_dates FROM borrowers ORDER BY rowid")
+        return [{**row, "borrowed_books": json.loads(row["borrowed_books"]), "loan_dates": json.loads(row["loan_dates"])}
+                for row in map(dict, rows)]
+
+    def load_sequences(self) -> dict:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'sequences'").fetchone()
+        return json.loads(row["value"]) if row else {}
+
+    def upsert(self, books: list = (), borrowers: list = (), sequences: dict = None) -> None:
+        with self.connection:
+            self._upsert_rows(books, borrowers, sequences)
+
+    def write_all(self, books: list, borrowers: list, sequences: dict) -> None:
+        # One transaction, so a failure leaves the old contents and readers never see empty tables
+        with self.connection:
+            self.connection.execute("DELETE FROM books")
+            self.connection.execute("DELETE FROM borrowers")
+            self._upsert_rows(books, borrowers, sequences)
+
+    def _upsert_rows(self, books, borrowers, sequences: dict) -> None:
+        self.connection.executemany(UPSERT_BOOK, (_book_row(book) for book in books))
+        self.connection.executemany(UPSERT_BORROWER, (_borrower_row(borrower) for borrower in borrowers))
+        if sequences is not None:
+            self.connection.execute(UPSERT_META, ("sequences", json.dumps(sequences)))
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _book_row(book: dict) -> dict:
+    return {**book, "available": int(book["available"])}
+
+
+def _borrower_row(borrower: dict) -> dict:
+    return {**borrower, "borrowed_books": json.dumps(borrower["borrowed_books"]),
+            "loan_dates": json.dumps(borrower.get("loan_dates", {}))}
+
+
+def migrate_json_to_sqlite(data_dir: str, db_path: str = None) -> dict:
+    """
+    Copy a JSON Library (snapshot plus any journal) into a SQLite database.
+
+    Parameters:
+        data_dir: Directory holding library_books.json / library_borrowers.json
+        db_path: Target database, by default library.db in data_dir
+
+    Returns:
+        {"books": count, "borrowers": count, "db_path": path}
+    """
+    from exercises.src.project import Library
+
+    source = Library("migration", data_dir, backend="json")
+    db_path = db_path or os.path.join(data_dir, "library.db")
+    target = SqliteBackend(db_path)
+    try:
+        target.write_all([book.to_dict() for book in source.books.values()],
+                         [borrower.to_dict() for borrower in source.borrowers.values()],
+                         source._sequences)
+    finally:
+        target.close()
+    return {"books": len(source.books), "borrowers": len(source.borrowers), "db_path": db_path}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a JSON Library data directory to SQLite.")
+    parser.add_argument("data_dir", help="directory with library_books.json and library_borrowers.json")
+    parser.add_argument("--db", help="target database path (default: DATA_DIR/library.db)")
+    args = parser.parse_args()
+    result = migrate_json_to_sqlite(args.data_dir, args.db)
+    print(f"Migrated {result['books']} books and {result['borrowers']} borrowers to {result['db_path']}")
@@ -0,0 +1,101 @@
+import pytest
+import asyncio
+import os
+import threading
+from exercises.src.project import Library
+from exercises.src.async_library import *
+
+
+class TestAsyncLibrary:
+    """Test suite for AsyncLibrary"""
+
+    def test_mutations_coalesce_into_one_write(self, tmp_path):
+        """Mutations inside one flush window produce a single write"""
+        async def scenario():
+            async with AsyncLibrary("Test Library", str(tmp_path), flush_interval=0.05) as lib:
+                b1 = await lib.add_book("Python 101", "Smith", "Technology")
+                await lib.add_book("History of Rome", "Jones", "History")
+                alice = await lib.add_borrower("Alice", "alice@test.com")
+                await lib.checkout_book(b1.book_id, alice.borrower_id)
+                assert not os.path.exists(lib.library.books_file)
+                await asyncio.sleep(0.2)
+                return lib.flushes
+
+        assert asyncio.run(scenario()) == 1
+        lib2 = Library("Test Library", str(tmp_path))
+        assert len(lib2.books) == 2
+        assert lib2.books["BOOK_0001"].available == False
+
+    def test_durable_waits_for_write(self, tmp_path):
+        """durable=True returns only once the change is on disk"""
+        async def scenario():
+            lib = AsyncLibrary("Test Library", str(tmp_path), flush_interval=10)
+            await lib.add_book("Python 101", "Smith", "Technology")
+            task = asyncio.ensure_future(lib.add_borrower("Alice", "alice@test.com", durable=True))
+            await asyncio.sleep(0.05)
+            assert not task.done()
+            await lib.flush()
+            await task
+            assert len(Library("Test Library", str(tmp_path)).borrowers) == 1
+            await lib.close()
+
+        asyncio.run(scenario())
+
+    def test_reads_see_unflushed_changes(self, tmp_path):
+        """Reads are answered from memory before anything is written"""
+        async def scenario():
+            async with AsyncLibrary("Test Library", str(tmp_path), flush_interval=10) as lib:
+                await lib.add_book("Python 101", "Smith", "Technology")
+                assert len(await lib.search_books(author="Smith")) == 1
+                assert (await lib.get_statistics())["total_books"] == 1
+                assert [b.title for b in await lib.text_search("pyth")] == ["Python 101"]
+
+        asyncio.run(scenario())
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
+
+    def test_journal_mode(self, tmp_path):
+        """Library options such as journal mode are passed through"""
+        async def scenario():
+            async with AsyncLibrary("Test Library", str(tmp_path), journal=True) as lib:
+                await lib.add_book("Python 101", "Smith", "Technology", durable=True)
+                await lib.add_book("Java Guide", "Smith", "Technology", durable=True)
+                return lib.library.journal_file
+
+        journal_file = asyncio.run(scenario())
+        with open(journal_file) as f:
+            assert len(f.readlines()) == 2
+
+    def test_serialization_off_event_loop(self, tmp_path):
+        """Pending records are serialized in the executor, not on the event loop thread"""
+        threads = []
+
+        async def scenario():
+            async with AsyncLibrary("Test Library", str(tmp_path)) as lib:
+                take_pending = lib.library._take_pending
+                lib.library._take_pending = lambda: threads.append(threading.current_thread()) or take_pending()
+                await lib.add_book("Python 101", "Smith", "Technology", durable=True)
+                await lib.add_book("Java Guide", "Smith", "Technology", durable=True)
+
+        asyncio.run(scenario())
+        assert threads and threading.main_thread() not in threads
+        assert len(Library("Test Library", str(tmp_path)).books) == 2
+
+    def test_failed_timed_flush_keeps_changes(self, tmp_path, caplog):
+        """A failed background write is logged and its changes written by the next flush"""
+        async def scenario():
+            lib = AsyncLibrary("Test Library", str(tmp_path), flush_interval=0.01)
+            write_payload = lib.library._write_payload
+
+            def fail(payload):
+                lib.library._write_payload = write_payload
+                raise OSError("disk full")
+
+            lib.library._write_payload = fail
+            await lib.add_book("Python 101", "Smith", "Technology")
+            await asyncio.sleep(0.1)
+            assert not lib._tasks and not os.path.exists(lib.library.books_file)
+            await lib.close()
+
+        asyncio.run(scenario())
+        assert "disk full" in caplog.text
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
@@ -0,0 +1,42 @@
+import pytest
+from benchmarks import synthetic
+from benchmarks.bench_suite import OPERATIONS, compare, run_suite
+from exercises.src.project import Library
+
+
+class TestSyntheticData:
+    def test_same_seed_same_data(self):
+        """Generators are deterministic per seed"""
+        assert list(synthetic.books(50, seed=3)) == list(synthetic.books(50, seed=3))
+        assert list(synthetic.books(50, seed=3)) != list(synthetic.books(50, seed=4))
+        pattern = synthetic.loan_pattern(100, 10, seed=3)
+        again = synthetic.loan_pattern(100, 10, seed=3)
+        assert [next(pattern) for _ in range(20)] == [next(again) for _ in range(20)]
+
+    def test_loan_pattern_in_range(self):
+        """Loan pairs are valid 1-based book and borrower numbers"""
+        pattern = synthetic.loan_pattern(30, 5)
+        for _ in range(500):
+            book, borrower = next(pattern)
+            assert 1 <= book <= 30 and 1 <= borrower <= 5
+
+    def test_populate(self, tmp_path):
+        """populate adds the requested books and borrowers"""
+        library = Library("Test", str(tmp_path))
+        synthetic.populate(library, 40, 8)
+        assert len(library.books) == 40
+        assert len(library.borrowers) == 8
+
+
+@pytest.mark.benchmark
+class TestBenchmarkSuite:
+    def test_tiny_run(self):
+        """The suite reports every operation and compares against itself"""
+        report = run_suite([50], operations=5, isolate=False)
+        result = report["results"]["50"]
+        assert set(result["operations"]) == set(OPERATIONS)
+        for stats in result["operations"].values():
+            assert stats["count"] > 0
+            assert stats["p50_us"] <= stats["p99_us"]
+        assert report["meta"]["seed"] == 0
+        assert len(compare(report, report)) == len(OPERATIONS)
@@ -0,0 +1,113 @@
+import pytest
+import os
+from exercises.src.project import Library
+from exercises.src.binary_snapshot import *
+
+
+BOOKS = [
+    {"book_id": "BOOK_0001", "title": "Python 101", "author": "Smith", "available": True, "genre": "Technology"},
+    {"book_id": "BOOK_0002", "title": "Ünïcode Tales", "author": "Smith", "available": False, "genre": "Fiction"},
+]
+BORROWERS = [
+    {"borrower_id": "USER_0001", "name": "Alice", "email": "alice@test.com", "borrowed_books": ["BOOK_0002"]},
+    {"borrower_id": "USER_0002", "name": "Bob", "email": "bob@test.com", "borrowed_books": []},
+]
+
+
+class TestBinarySnapshot:
+    """Test suite for the binary snapshot reader and writer"""
+
+    def test_round_trip(self, tmp_path):
+        """Columns read back match the records written"""
+        path = str(tmp_path / "library_snapshot.bin")
+        size = write_snapshot(path, BOOKS, BORROWERS, {"BOOK": 2, "USER": 2})
+        assert size == os.path.getsize(path)
+
+        snapshot = read_snapshot(path)
+        assert snapshot["books"]["title"] == ["Python 101", "Ünïcode Tales"]
+        assert snapshot["books"]["available"] == [True, False]
+        assert snapshot["borrowers"]["borrowed_books"] == [["BOOK_0002"], []]
+        assert snapshot["sequences"] == {"BOOK": 2, "USER": 2}
+
+    def test_loan_dates(self, tmp_path):
+        """Loan dates round-trip; loans without dates read back without them"""
+        path = str(tmp_path / "library_snapshot.bin")
+        borrowers = [{**BORROWERS[0], "loan_dates": {"BOOK_0002": ["2024-01-01", "2024-01-15"]}}, BORROWERS[1]]
+        write_snapshot(path, BOOKS, borrowers, {})
+        assert read_snapshot(path)["borrowers"]["loan_dates"] == [{"BOOK_0002": ("2024-01-01", "2024-01-15")}, {}]
+        write_snapshot(path, BOOKS, BORROWERS, {})
+        assert read_snapshot(path)["borrowers"]["loan_dates"] == [{}, {}]
+
+    def test_strings_are_interned(self, tmp_path):
+        """A repeated string is stored once and decoded to one object"""
+        path = str(tmp_path / "library_snapshot.bin")
+        write_snapshot(path, BOOKS, BORROWERS, {})
+        snapshot = read_snapshot(path)
+        authors = snapshot["books"]["author"]
+        assert authors[0] is authors[1]
+        assert snapshot["borrowers"]["borrowed_books"][0][0] is snapshot["books"]["book_id"][1]
+
+    def test_rejects_other_files(self, tmp_path):
+        """Wrong magic, unknown versions and truncated files raise ValueError"""
+        path = str(tmp_path / "library_snapshot.bin")
+        with open(path, "wb") as f:
+            f.write(b"{}")
+        with pytest.raises(ValueError):
+            read_snapshot(path)
+
+        write_snapshot(path, BOOKS, BORROWERS, {})
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION + 1, 0, 0, 0))
+        with pytest.raises(ValueError, match="version"):
+            read_snapshot(path)
+        with open(path, "wb") as f:
+            f.write(data[:-5])
+        with pytest.raises(ValueError):
+            read_snapshot(path)
+
+
+class TestBinaryLibrary:
+    """Test suite for Library with snapshot_format="binary" """
+
+    def test_persistence(self, tmp_path):
+        """Data survives a reload through the binary snapshot only"""
+        lib = Library("Test Library", str(tmp_path), snapshot_format="binary")
+        book = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(book.book_id, alice.borrower_id)
+        assert not os.path.exists(lib.books_file)
+
+        lib2 = Library("Test Library", str(tmp_path), snapshot_format="binary")
+        assert lib2.books[book.book_id].to_dict() == book.to_dict()
+        assert lib2.borrowers[alice.borrower_id].borrowed_books == [book.book_id]
+        assert lib2.add_book("Python 102", "Smith", "Technology").book_id == "BOOK_0002"
+
+    def test_journal_on_binary_snapshot(self, tmp_path):
+        """Journal records replay on top of a binary snapshot"""
+        lib = Library("Test Library", str(tmp_path), snapshot_format="binary", journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.checkpoint()
+        lib.add_book("Python 102", "Smith", "Technology")
+        assert os.path.exists(lib.journal_file)
+
+        lib2 = Library("Test Library", str(tmp_path), snapshot_format="binary", journal=True)
+        assert len(lib2.books) == 2
+
+    def test_converts_json_data(self, tmp_path):
+        """An existing JSON data directory is read and rewritten as binary"""
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+
+        lib2 = Library("Test Library", str(tmp_path), snapshot_format="binary")
+        assert len(lib2.books) == 1
+        lib2.save()
+        assert len(read_snapshot(lib2.snapshot_file)["books"]["book_id"]) == 1
+
+    def test_invalid_snapshot_format(self, tmp_path):
+        """Unknown formats and binary with sqlite are rejected"""
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), snapshot_format="xml")
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), backend="sqlite", snapshot_format="binary")
@@ -0,0 +1,61 @@
+import pytest
+import os
+from exercises.src.project import Library
+from exercises.src.federation import *
+
+
+@pytest.fixture
+def branches(tmp_path):
+    """Two branch data directories with a few books each"""
+    paths = {}
+    for name, books in (("north", [("Python 101", "Smith", "Technology"), ("Dune", "Herbert", "Fiction")]),
+                        ("south", [("Python 201", "Smith", "Technology")])):
+        paths[name] = str(tmp_path / name)
+        os.makedirs(paths[name])
+        library = Library(name, paths[name])
+        for title, author, genre in books:
+            library.add_book(title, author, genre)
+        library.close()
+    return paths
+
+
+class TestLibraryFederation:
+    def test_search_attributes_branches(self, branches):
+        """Results of every branch come back tagged with their branch"""
+        with LibraryFederation(branches) as federation:
+            results = federation.search_books(author="Smith")
+        assert [(book["branch"], book["title"]) for book in results] == \
+            [("north", "Python 101"), ("south", "Python 201")]
+
+    def test_statistics_summed(self, branches):
+        """get_statistics reports every branch and the total"""
+        with LibraryFederation(branches, processes=1) as federation:
+            stats = federation.get_statistics()
+        assert stats["branches"]["north"]["total_books"] == 2
+        assert stats["total"]["total_books"] == 3
+        assert stats["total"]["books_by_genre"] == {"Technology": 2, "Fiction": 1}
+
+    def test_workers_see_new_writes(self, branches):
+        """A warm worker picks up changes written by the branch's Library"""
+        with LibraryFederation(branches) as federation:
+            assert len(federation.get_available_books()) == 3
+            north = Library("north", branches["north"])
+            alice = north.add_borrower("Alice", "alice@test.com")
+            north.checkout_book("BOOK_0001", alice.borrower_id)
+            available = federation.get_available_books()
+        assert [(book["branch"], book["book_id"]) for book in available] == \
+            [("north", "BOOK_0002"), ("south", "BOOK_0001")]
+
+    def test_worker_errors_raised(self, branches):
+        """An exception in a worker is raised by the call, and the federation stays usable"""
+        with LibraryFederation(branches) as federation:
+            with pytest.raises(TypeError):
+                federation.search_books(genre__in=5)
+            assert len(federation.search_books(genre="Technology")) == 2
+
+    def test_closed(self, branches):
+        """Queries after close raise RuntimeError"""
+        federation = LibraryFederation(branches)
+        federation.close()
+        with pytest.raises(RuntimeError):
+            federation.search_books()
@@ -0,0 +1,73 @@
+import pytest
+import os
+from exercises.src.project import Library
+from exercises.src.metrics import *
+
+
+class TestLibraryMetrics:
+    def test_disabled_by_default(self, tmp_path):
+        """Without metrics=True nothing is wrapped or recorded"""
+        library = Library("Test", str(tmp_path))
+        library.add_book("Python 101", "Smith", "Technology")
+        assert library.metrics() == {}
+        assert "add_book" not in vars(library)
+        with pytest.raises(RuntimeError):
+            library.write_metrics(str(tmp_path / "library.prom"))
+
+    def test_counts_calls_and_bytes(self, tmp_path):
+        """Calls, latencies and bytes serialized and written are recorded per operation"""
+        library = Library("Test", str(tmp_path), metrics=True)
+        library.add_book("Python 101", "Smith", "Technology")
+        library.add_book("Data Science", "Jones", "Technology")
+        library.search_books(author="Smith")
+        metrics = library.metrics()
+        assert metrics["load"]["calls"] == 1
+        assert metrics["add_book"]["calls"] == 2
+        assert metrics["add_book"]["bytes_written"] > 0
+        assert metrics["search_books"]["bytes_written"] == 0
+        assert metrics["add_book"]["p50_ms"] <= metrics["add_book"]["p99_ms"] <= metrics["add_book"]["max_ms"]
+        # Each autosave serializes and writes once
+        assert metrics["serialize"]["calls"] == 2
+        assert metrics["write"]["calls"] == 2
+        assert metrics["write"]["bytes_written"] == library.save_metrics["bytes_written"]
+        assert metrics["add_book"]["bytes_serialized"] == library.save_metrics["bytes_serialized"] > 0
+        assert metrics["search_books"]["bytes_serialized"] == 0
+
+    def test_errors_counted(self, tmp_path):
+        """A call that raises is counted as an error"""
+        library = Library("Test", str(tmp_path), metrics=True)
+        with pytest.raises(ValueError):
+            library.add_book("Python 101", "Smith", "Cooking")
+        assert library.metrics()["add_book"]["errors"] == 1
+
+    def test_nested_calls_counted_once(self, tmp_path):
+        """checkpoint counts towards save, but serialize is timed once per save"""
+        library = Library("Test", str(tmp_path), metrics=True)
+        library.add_book("Python 101", "Smith", "Technology")
+        library.checkpoint()
+        metrics = library.metrics()
+        assert metrics["checkpoint"]["calls"] == 1
+        assert metrics["save"]["calls"] == 1
+        assert metrics["serialize"]["calls"] == 2
+
+    def test_prometheus_dump(self, tmp_path):
+        """write_metrics writes the Prometheus text format"""
+        library = Library("Main \"West\"", str(tmp_path), metrics=True)
+        library.add_book("Python 101", "Smith", "Technology")
+        path = str(tmp_path / "library.prom")
+        library.write_metrics(path)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        assert "# TYPE library_operation_seconds summary" in text
+        assert 'library_operation_seconds_count{library="Main \\"West\\"",operation="add_book"} 1' in text
+        assert 'operation="add_book",quantile="0.99"' in text
+        assert not os.path.exists(path + ".tmp")
+
+    def test_other_instances_unaffected(self, tmp_path):
+        """Instrumentation is per instance"""
+        os.makedirs(tmp_path / "a")
+        os.makedirs(tmp_path / "b")
+        measured = Library("Test", str(tmp_path / "a"), metrics=True)
+        plain = Library("Test", str(tmp_path / "b"))
+        assert "add_book" in vars(measured)
+        assert "add_book" not in vars(plain)
@@ -0,0 +1,67 @@
+import pytest
+import os
+from exercises.src.project import Library
+from exercises.src.mmap_catalog import *
+
+
+@pytest.fixture
+def writer(tmp_path):
+    lib = Library("Test Library", str(tmp_path))
+    for n in range(12):
+        lib.add_book(f"Title {n}", ["Smith", "Jones", "Brown"][n % 3], ["Fiction", "Science"][n % 2])
+    alice = lib.add_borrower("Alice", "alice@test.com")
+    lib.add_borrower("Bob", "bob@test.com")
+    lib.checkout_book("BOOK_0011", alice.borrower_id)
+    lib.checkout_book("BOOK_0002", alice.borrower_id)
+    lib.publish_catalog()
+    return lib
+
+
+class TestReadOnlyLibrary:
+    """Test suite for ReadOnlyLibrary over a published catalog"""
+
+    def test_search_matches_library(self, writer, tmp_path):
+        """search_books returns what the writer's search_books returns"""
+        reader = ReadOnlyLibrary("Test Library", str(tmp_path))
+        for criteria in ({"author": "smith"}, {"genre": "Science"}, {"available": False},
+                         {"author": "Jones", "genre": "fiction"}, {"title": "Title 7"},
+                         {"book_id": "BOOK_0010"}, {"author": "Nobody"}, {"year": 2001}, {},
+                         {"title__contains": "1", "genre__in": ["Science"]}):
+            assert reader.search_books(**criteria) == writer.search_books(**criteria), criteria
+
+    def test_available_and_borrower_books(self, writer, tmp_path):
+        """Reads return lazily decoded books equal to the writer's"""
+        reader = ReadOnlyLibrary("Test Library", str(tmp_path))
+        assert [book.to_dict() for book in reader.get_available_books()] == \
+            [book.to_dict() for book in writer.get_available_books()]
+        assert [book.book_id for book in reader.get_borrower_books("USER_0001")] == ["BOOK_0011", "BOOK_0002"]
+        assert reader.get_borrower_books("USER_0002") == []
+        assert reader.get_borrower_books("USER_0099") == []
+
+    def test_books_mapping(self, writer, tmp_path):
+        """books maps book_id to records like Library.books"""
+        reader = ReadOnlyLibrary("Test Library", str(tmp_path))
+        assert len(reader.books) == 12
+        assert list(reader.books) == list(writer.books)
+        assert str(reader.books["BOOK_0003"]) == str(writer.books["BOOK_0003"])
+        assert "BOOK_0099" not in reader.books
+
+    def test_remaps_new_version(self, writer, tmp_path):
+        """A new publish is picked up; books read earlier keep their version"""
+        reader = ReadOnlyLibrary("Test Library", str(tmp_path))
+        before = reader.get_available_books()
+        writer.checkout_book("BOOK_0001", "USER_0002")
+        writer.add_book("Title 12", "Smith", "History")
+        writer.publish_catalog()
+
+        assert len(reader.books) == 13
+        assert not reader.books["BOOK_0001"].available
+        assert before[0].book_id == "BOOK_0001" and before[0].available
+        assert reader.reload_if_changed() is False
+
+    def test_rejects_other_files(self, tmp_path):
+        """A file that is not a catalog raises ValueError"""
+        with open(tmp_path / "library_catalog.bin", "wb") as f:
+            f.write(b"not a catalog" * 10)
+        with pytest.raises(ValueError):
+            ReadOnlyLibrary("Test Library", str(tmp_path))
@@ -1,3 +1,4 @@
+import heapq
 import pytest
 import os
 from exercises.src.project import *
@@ -15,12 +16,29 @@ class TestHelperFunctions:
         """Test generate_id function"""
         assert generate_id("BOOK", []) == "BOOK_0001"
         assert generate_id("BOOK", ["BOOK_0001", "BOOK_0002"]) == "BOOK_0003"
+        assert generate_id("BOOK", ["BOOK_9999", "BOOK_10000"]) == "BOOK_10001"
+
+    def test_id_number(self):
+        """Test id_number function"""
+        assert id_number("BOOK_0042") == 42
+        assert id_number("BOOK_12345") == 12345
+        assert id_number("RARE_BOOK_0007") == 7
 
     def test_search_items(self):
         """Test search_items function"""
         items = [{"name": "A", "type": "x"}, {"name": "B", "type": "x"}, {"name": "C", "type": "y"}]
         assert len(search_items(items, type="x")) == 2
         assert len(search_items(items, name="A")) == 1
+        assert len(search_items(items, name="a", type="X")) == 1
+
+    def test_trigrams(self):
+        """Test trigrams function"""
+        assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+
+    def test_tokenize(self):
+        """Test tokenize function"""
+        assert tokenize("Python 101: The Basics") == ["python", "101", "the", "basics"]
+        assert tokenize("") == []
 
 
 class TestBook:
@@ -49,6 +67,17 @@ class TestBook:
         assert book2.title == "Python 101"
         assert book2.author == "Smith"
 
+    def test_book_compact_storage(self):
+        """Test Book has no per-instance __dict__ and stores genre as a code"""
+        book = Book("B001", "Python 101", "Smith", "Technology")
+        assert not hasattr(book, "__dict__")
+        assert book.to_dict() == {"book_id": "B001", "title": "Python 101", "author": "Smith",
+                                  "available": True, "genre": "Technology"}
+        book.genre = "History"
+        assert book.genre == "History"
+        with pytest.raises(ValueError):
+            book.genre = "InvalidGenre"
+
     def test_book_invalid_genre(self):
         """Test Book raises ValueError for invalid genre"""
         with pytest.raises(ValueError):
@@ -83,6 +112,17 @@ class TestBorrower:
         assert borrower.return_book("B001") == True
         assert "B001" not in borrower.borrowed_books
 
+    def test_borrowed_books_is_read_only(self):
+        """Changing borrowed_books in place raises instead of being lost"""
+        borrower = Borrower("U001", "Alice", "alice@test.com", ["B001"])
+        with pytest.raises(TypeError):
+            borrower.borrowed_books.append("B002")
+        with pytest.raises(TypeError):
+            borrower.borrowed_books.remove("B001")
+        borrower.borrowed_books = ["B001", "B002"]
+        assert borrower.borrowed_books == ["B001", "B002"]
+        assert borrower.has_book("B002")
+
     def test_borrower_return_book_not_borrowed(self):
         """Test Borrower return_book returns False for book not borrowed"""
         borrower = Borrower("U001", "Alice", "alice@test.com")
@@ -96,6 +136,13 @@ class TestBorrower:
         assert borrower2.name == "Alice"
         assert borrower2.email == "alice@test.com"
 
+    def test_borrower_to_dict_is_a_copy(self):
+        """Test Borrower to_dict does not share the borrowed_books list"""
+        borrower = Borrower("U001", "Alice", "alice@test.com")
+        borrower_dict = borrower.to_dict()
+        borrower.borrow_book("B001")
+        assert borrower_dict["borrowed_books"] == []
+
 
 class TestLibrary:
     """Test suite for Library class"""
@@ -103,7 +150,8 @@ class TestLibrary:
     @pytest.fixture(autouse=True)
     def cleanup(self):
         """Cleanup test files before and after each test"""
-        test_files = ["library_books.json", "library_borrowers.json"]
+        test_files = ["library_books.json", "library_borrowers.json", "library_meta.json",
+                      "library_text_index.json"]
         for f in test_files:
             if os.path.exists(f):
                 os.remove(f)
@@ -202,3 +250,1050 @@ class TestLibrary:
         assert len(lib2.books) == 2
         assert len(lib2.borrowers) == 1
 
+
+class TestLibraryJournal:
+    """Test suite for Library journal mode"""
+
+    def test_journal_mode_skips_snapshot_rewrite(self, tmp_path):
+        """Mutations append to the journal instead of writing the JSON files"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_borrower("Alice", "alice@test.com")
+        assert not os.path.exists(lib.books_file)
+        with open(lib.journal_file) as f:
+            assert len(f.readlines()) == 2
+
+    def test_journal_replayed_on_load(self, tmp_path):
+        """A new Library replays the journal on top of the snapshot"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.books[b1.book_id].available == False
+        assert lib2.borrowers[alice.borrower_id].borrowed_books == [b1.book_id]
+
+    def test_checkpoint_compacts_journal(self, tmp_path):
+        """checkpoint folds the journal into the snapshot files"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        assert lib.checkpoint() == 2
+        assert not os.path.exists(lib.journal_file)
+
+        lib2 = Library("Test Library", str(tmp_path), journal=True)
+        assert len(lib2.books) == 2
+
+    def test_automatic_checkpoint(self, tmp_path):
+        """The journal is compacted every checkpoint_every records"""
+        lib = Library("Test Library", str(tmp_path), journal=True, checkpoint_every=2)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        assert os.path.exists(lib.books_file)
+        assert not os.path.exists(lib.journal_file)
+
+    def test_autosave_off_defers_until_flush(self, tmp_path):
+        """With autosave=False nothing is written until flush"""
+        lib = Library("Test Library", str(tmp_path), journal=True, autosave=False)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_borrower("Alice", "alice@test.com")
+        assert not os.path.exists(lib.journal_file)
+        lib.flush()
+        with open(lib.journal_file) as f:
+            assert len(f.readlines()) == 1
+        assert len(Library("Test Library", str(tmp_path)).borrowers) == 1
+
+    def test_torn_journal_tail_ignored(self, tmp_path):
+        """A partially written last record does not break load"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        with open(lib.journal_file, "a") as f:
+            f.write('{"op": "add_book", "books": [{"book_')
+
+        lib2 = Library("Test Library", str(tmp_path))
+        assert len(lib2.books) == 1
+
+    def test_torn_journal_tail_truncated(self, tmp_path):
+        """Mutations after a torn record survive the next restart"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("Python 102", "Smith", "Technology")
+        size = os.path.getsize(lib.journal_file)
+        with open(lib.journal_file, "r+b") as f:
+            f.truncate(size - 20)
+
+        lib2 = Library("Test Library", str(tmp_path), journal=True)
+        assert list(lib2.books) == ["BOOK_0001"]
+        lib2.add_book("Python 103", "Smith", "Technology")
+        lib2.add_book("Python 104", "Smith", "Technology")
+
+        lib3 = Library("Test Library", str(tmp_path), journal=True)
+        assert [book.title for book in lib3.books.values()] == ["Python 101", "Python 103", "Python 104"]
+
+    def test_snapshot_written_atomically(self, tmp_path):
+        """Snapshot files are renamed into place, leaving no temporary files"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.checkpoint()
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
+
+
+class TestLibraryBatch:
+    """Test suite for Library.batch"""
+
+    def test_batch_saves_once(self, tmp_path, monkeypatch):
+        """A batch of mixed mutations is written exactly once"""
+        lib = Library("Test Library", str(tmp_path))
+        saves = []
+        monkeypatch.setattr(lib, "_write_payload", lambda payload: saves.append(1))
+        with lib.batch():
+            b1 = lib.add_book("Python 101", "Smith", "Technology")
+            lib.add_book("History of Rome", "Jones", "History")
+            alice = lib.add_borrower("Alice", "alice@test.com")
+            lib.checkout_book(b1.book_id, alice.borrower_id)
+            lib.return_book(b1.book_id, alice.borrower_id)
+            assert saves == []
+        assert saves == [1]
+
+    def test_batch_persists_on_exit(self, tmp_path):
+        """Data written by a batch can be reloaded"""
+        lib = Library("Test Library", str(tmp_path))
+        with lib.batch():
+            b1 = lib.add_book("Python 101", "Smith", "Technology")
+            alice = lib.add_borrower("Alice", "alice@test.com")
+            lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.books[b1.book_id].available == False
+        assert lib2.borrowers[alice.borrower_id].borrowed_books == [b1.book_id]
+
+    def test_batch_rolls_back_on_error(self, tmp_path):
+        """An exception inside the batch restores the previous state"""
+        lib = Library("Test Library", str(tmp_path))
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+
+        with pytest.raises(ValueError):
+            with lib.batch():
+                lib.checkout_book(b1.book_id, alice.borrower_id)
+                lib.add_book("Bad Book", "Author", "InvalidGenre")
+
+        assert len(lib.books) == 1
+        assert lib.books[b1.book_id].available == True
+        assert lib.borrowers[alice.borrower_id].borrowed_books == []
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.books[b1.book_id].available == True
+
+    def test_rollback_frees_ids(self, tmp_path):
+        """IDs handed out inside a failed batch are reused afterwards"""
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        with pytest.raises(ValueError):
+            with lib.batch():
+                lib.add_book("Java Guide", "Smith", "Technology")
+                lib.add_borrower("Alice", "alice@test.com")
+                lib.add_book("Bad Book", "Author", "InvalidGenre")
+        assert lib.add_book("History of Rome", "Jones", "History").book_id == "BOOK_0002"
+        assert lib.add_borrower("Alice", "alice@test.com").borrower_id == "USER_0001"
+        assert Library("Test Library", str(tmp_path)).add_book("Dune", "Herbert", "Fiction").book_id == "BOOK_0003"
+
+    def test_batch_single_journal_record(self, tmp_path):
+        """In journal mode a batch appends one record"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        with lib.batch():
+            lib.add_book("Python 101", "Smith", "Technology")
+            lib.add_book("History of Rome", "Jones", "History")
+        with open(lib.journal_file) as f:
+            assert len(f.readlines()) == 1
+        assert len(Library("Test Library", str(tmp_path)).books) == 2
+
+
+    @pytest.mark.parametrize("options", [{"journal": True}, {"backend": "sqlite"}])
+    def test_rollback_with_pending_changes(self, tmp_path, options):
+        """A rolled-back change is not written by the next flush of earlier pending changes"""
+        lib = Library("Test Library", str(tmp_path), autosave=False, **options)
+        book = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        with pytest.raises(RuntimeError):
+            with lib.batch():
+                lib.checkout_book(book.book_id, alice.borrower_id)
+                raise RuntimeError("abort")
+        lib.flush()
+        lib.close()
+
+        lib2 = Library("Test Library", str(tmp_path), **options)
+        assert lib2.books[book.book_id].available is True
+        assert lib2.borrowers[alice.borrower_id].borrowed_books == []
+
+
+class TestLibrarySequences:
+    """Test suite for Library ID sequences"""
+
+    def test_ids_are_sequential(self, tmp_path):
+        """Books and borrowers get consecutive IDs per prefix"""
+        lib = Library("Test Library", str(tmp_path))
+        assert lib.add_book("Python 101", "Smith", "Technology").book_id == "BOOK_0001"
+        assert lib.add_book("History of Rome", "Jones", "History").book_id == "BOOK_0002"
+        assert lib.add_borrower("Alice", "alice@test.com").borrower_id == "USER_0001"
+
+    def test_sequence_survives_reload(self, tmp_path):
+        """A reloaded Library continues from the saved high-water mark"""
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.add_book("History of Rome", "Jones", "History").book_id == "BOOK_0002"
+
+    def test_sequence_rebuilt_from_journal(self, tmp_path):
+        """IDs replayed from the journal are accounted for at load"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        lib2 = Library("Test Library", str(tmp_path), journal=True)
+        assert lib2.add_book("Science Today", "Brown", "Science").book_id == "BOOK_0003"
+
+    def test_sequence_past_four_digits(self, tmp_path):
+        """IDs keep increasing numerically beyond 9999"""
+        lib = Library("Test Library", str(tmp_path))
+        lib._sequences["BOOK"] = 9999
+        assert lib.add_book("Python 101", "Smith", "Technology").book_id == "BOOK_10000"
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.add_book("History of Rome", "Jones", "History").book_id == "BOOK_10001"
+
+
+class TestLibraryIndexes:
+    """Test suite for Library secondary indexes"""
+
+    @pytest.fixture
+    def lib(self, tmp_path):
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("Java Guide", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        return lib
+
+    def test_indexed_search_matches_scan(self, lib, tmp_path):
+        """Indexed searches return the same books as a linear scan"""
+        scan = Library("Test Library", str(tmp_path), indexed_fields=())
+        for criteria in ({"author": "Smith"}, {"author": "Smith", "genre": "History"},
+                         {"genre": "Technology", "title": "Java Guide"}, {"author": "Nobody"}):
+            assert lib.search_books(**criteria) == scan.search_books(**criteria)
+
+    def test_index_follows_checkout_and_return(self, lib):
+        """The available index is updated by checkout_book and return_book"""
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book("BOOK_0001", alice.borrower_id)
+        assert [b["book_id"] for b in lib.search_books(available=False)] == ["BOOK_0001"]
+        assert len(lib.search_books(available=True, author="Smith")) == 1
+
+        lib.return_book("BOOK_0001", alice.borrower_id)
+        assert lib.search_books(available=False) == []
+
+    def test_indexed_search_is_case_insensitive(self, lib):
+        """Indexed string criteria match regardless of case"""
+        assert len(lib.search_books(author="smith", genre="TECHNOLOGY")) == 2
+
+    def test_register_index(self, lib):
+        """Extra fields can be indexed after construction"""
+        lib.register_index("title")
+        assert len(lib.search_books(title="History of Rome")) == 1
+        lib.add_book("History of Rome", "Brown", "History")
+        assert len(lib.search_books(title="History of Rome")) == 2
+
+    def test_indexes_rebuilt_after_rollback(self, lib):
+        """A rolled back batch leaves the indexes consistent"""
+        with pytest.raises(ValueError):
+            with lib.batch():
+                lib.add_book("Another", "Smith", "Science")
+                lib.add_book("Bad Book", "Author", "InvalidGenre")
+        assert len(lib.search_books(author="Smith")) == 2
+
+
+class TestLibraryTextSearch:
+    """Test suite for Library.text_search"""
+
+    @pytest.fixture
+    def lib(self, tmp_path):
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("Advanced Python", "Jones", "Technology")
+        lib.add_book("History of Rome", "Smith", "History")
+        return lib
+
+    def titles(self, books):
+        return [book.title for book in books]
+
+    def test_keyword_search(self, lib):
+        """A single keyword matches title or author, ignoring case"""
+        assert sorted(self.titles(lib.text_search("PYTHON"))) == ["Advanced Python", "Python 101"]
+        assert len(lib.text_search("smith")) == 2
+
+    def test_multi_term_and(self, lib):
+        """Every term must match"""
+        assert self.titles(lib.text_search("python smith")) == ["Python 101"]
+        assert lib.text_search("python rome") == []
+
+    def test_prefix_search(self, lib):
+        """The last term may be a prefix"""
+        assert len(lib.text_search("pyth")) == 2
+        assert lib.text_search("pyth", prefix=False) == []
+        assert self.titles(lib.text_search("smith hist")) == ["History of Rome"]
+
+    def test_ranking_and_limit(self, lib):
+        """Title matches outrank author matches and limit truncates"""
+        lib.add_book("Rome", "Python Smith", "History")
+        assert self.titles(lib.text_search("python", limit=2)) == ["Python 101", "Advanced Python"]
+
+    def test_index_persisted_and_caught_up(self, lib, tmp_path):
+        """The saved index is reused at load and only new books are tokenized"""
+        lib.close()
+        assert os.path.exists(lib.text_index_file)
+        journal = Library("Test Library", str(tmp_path), journal=True)
+        journal.add_book("Science Today", "Brown", "Science")
+
+        lib2 = Library("Test Library", str(tmp_path))
+        assert self.titles(lib2.text_search("science")) == ["Science Today"]
+        assert len(lib2.text_search("python")) == 2
+
+    def test_rollback_removes_from_index(self, lib):
+        """Books added by a rolled back batch are not searchable"""
+        with pytest.raises(ValueError):
+            with lib.batch():
+                lib.add_book("Python Cookbook", "Beazley", "Technology")
+                lib.add_book("Bad Book", "Author", "InvalidGenre")
+        assert lib.text_search("cookbook") == []
+
+
+class TestLibraryFuzzySearch:
+    """Test suite for Library.fuzzy_search"""
+
+    @pytest.fixture
+    def lib(self, tmp_path):
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        lib.add_book("Science Today", "Brown", "Science")
+        return lib
+
+    def test_misspelled_author(self, lib):
+        """A transposed author name still finds the book"""
+        assert [book.title for book in lib.fuzzy_search("Smtih")] == ["Python 101"]
+
+    def test_misspelled_title(self, lib):
+        """Several misspelled words are combined"""
+        results = lib.fuzzy_search("histroy rom")
+        assert results[0].title == "History of Rome"
+
+    def test_limit_and_no_match(self, lib):
+        """limit caps the results and unrelated queries find nothing"""
+        lib.add_book("Python Cookbook", "Beazley", "Technology")
+        assert len(lib.fuzzy_search("pyton", limit=1)) == 1
+        assert lib.fuzzy_search("zzzz") == []
+
+    def test_fuzzy_index_survives_reload(self, lib, tmp_path):
+        """The trigram index is rebuilt from the saved vocabulary"""
+        lib2 = Library("Test Library", str(tmp_path))
+        assert [book.title for book in lib2.fuzzy_search("Browm")] == ["Science Today"]
+
+
+class TestLibraryStatisticsCounters:
+    """Test suite for incrementally maintained statistics"""
+
+    def test_counters_follow_mutations(self, tmp_path):
+        """Counters match a full recount after every kind of mutation"""
+        lib = Library("Test Library", str(tmp_path), debug_stats=True)
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        lib.add_book("Java Guide", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        stats = lib.get_statistics()
+        assert stats["available_books"] == 2
+        assert stats["checked_out"] == 1
+        assert stats["books_by_genre"] == {"Technology": 2, "History": 1}
+
+        lib.return_book(b1.book_id, alice.borrower_id)
+        assert lib.get_statistics()["checked_out"] == 0
+
+    def test_counters_rebuilt_on_load(self, tmp_path):
+        """A reloaded Library starts with correct counters"""
+        lib = Library("Test Library", str(tmp_path))
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        lib2 = Library("Test Library", str(tmp_path), debug_stats=True)
+        assert lib2.get_statistics()["checked_out"] == 1
+
+    def test_debug_mode_detects_drift(self, tmp_path):
+        """Changing a book behind the Library's back is reported"""
+        lib = Library("Test Library", str(tmp_path), debug_stats=True)
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        b1.available = False
+        with pytest.raises(RuntimeError):
+            lib.get_statistics()
+
+
+class TestLibraryImport:
+    """Test suite for Library.import_books and import_borrowers"""
+
+    def test_import_books_csv(self, tmp_path, monkeypatch):
+        """CSV rows are imported, invalid ones rejected, and saved once"""
+        path = tmp_path / "books.csv"
+        path.write_text("title,author,genre\n"
+                        "Python 101,Smith,Technology\n"
+                        "Bad Book,Author,Poetry\n"
+                        ",Nobody,Fiction\n"
+                        "History of Rome,Jones,History\n")
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Existing", "Brown", "Science")
+        saves = []
+        monkeypatch.setattr(lib, "_write_payload", lambda payload: saves.append(1))
+
+        report = lib.import_books(str(path), chunk_size=2)
+        assert report["imported"] == 2 and report["rejected"] == 2
+        assert report["records_per_sec"] > 0
+        assert saves == [1]
+        assert sorted(lib.books) == ["BOOK_0001", "BOOK_0002", "BOOK_0003"]
+        assert len(lib.search_books(author="jones")) == 1
+        assert lib.get_statistics()["total_books"] == 3
+
+        with open(report["rejects_file"]) as f:
+            rejects = [json.loads(line) for line in f]
+        assert [reject["line"] for reject in rejects] == [3, 4]
+        assert "Invalid genre" in rejects[0]["error"]
+
+    def test_import_borrowers_jsonl(self, tmp_path):
+        """JSONL borrowers are imported and persisted"""
+        path = tmp_path / "borrowers.jsonl"
+        path.write_text('{"name": "Alice", "email": "alice@test.com"}\n'
+                        '\n'
+                        '{"name": "Bob"}\n'
+                        'not json\n'
+                        '{"name": "Carol", "email": "carol@test.com"}\n')
+        lib = Library("Test Library", str(tmp_path))
+        report = lib.import_borrowers(str(path))
+        assert report["imported"] == 2 and report["rejected"] == 2
+
+        lib2 = Library("Test Library", str(tmp_path))
+        assert [b.name for b in lib2.borrowers.values()] == ["Alice", "Carol"]
+        assert lib2.add_borrower("Dan", "dan@test.com").borrower_id == "USER_0003"
+
+    def test_clean_import_leaves_no_rejects_file(self, tmp_path):
+        """No side file is left behind when every row is valid"""
+        path = tmp_path / "books.jsonl"
+        path.write_text('{"title": "Python 101", "author": "Smith", "genre": "Technology"}\n')
+        lib = Library("Test Library", str(tmp_path))
+        assert lib.import_books(str(path))["rejects_file"] is None
+        assert not os.path.exists(f"{path}.rejects.jsonl")
+
+    def test_non_text_fields_rejected(self, tmp_path):
+        """JSONL rows with numbers or lists for fields go to the rejects file"""
+        path = tmp_path / "books.jsonl"
+        path.write_text('{"title": 1984, "author": "Orwell", "genre": "Fiction"}\n'
+                        '{"title": "Python 101", "author": "Smith", "genre": ["Technology"]}\n'
+                        '{"title": "Rome", "author": "Jones", "genre": "History"}\n')
+        lib = Library("Test Library", str(tmp_path))
+        report = lib.import_books(str(path))
+        assert report["imported"] == 1 and report["rejected"] == 2
+        with open(report["rejects_file"]) as f:
+            assert [json.loads(line)["error"] for line in f] == [
+                "Fields must be text: title", "Fields must be text: genre"]
+
+    def test_missing_file_leaves_no_rejects_file(self, tmp_path):
+        """A failed import creates no side file"""
+        path = tmp_path / "missing.csv"
+        with pytest.raises(FileNotFoundError):
+            Library("Test Library", str(tmp_path)).import_books(str(path))
+        assert not os.path.exists(f"{path}.rejects.jsonl")
+
+    def test_unsupported_file_type(self, tmp_path):
+        """Only CSV and JSONL files can be imported"""
+        path = tmp_path / "books.xml"
+        path.write_text("<books/>")
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path)).import_books(str(path))
+
+
+def _checkout_all(data_dir, borrower_id, book_ids, results):
+    """Worker for the multi-process stress test: try to take every book."""
+    lib = Library("Test Library", data_dir, concurrent=True)
+    results.put(sum(lib.checkout_book(book_id, borrower_id) for book_id in book_ids))
+
+
+class TestLibraryConcurrency:
+    """Test suite for Library concurrent mode"""
+
+    def assert_consistent(self, lib):
+        holders = {}
+        for borrower in lib.borrowers.values():
+            for book_id in borrower.borrowed_books:
+                assert book_id not in holders, f"{book_id} checked out twice"
+                holders[book_id] = borrower.borrower_id
+        for book_id, book in lib.books.items():
+            assert book.available == (book_id not in holders)
+        return holders
+
+    def test_no_double_checkout_across_threads(self, tmp_path):
+        """Many threads competing for few books never share a copy"""
+        import threading
+        lib = Library("Test Library", str(tmp_path), concurrent=True)
+        with lib.batch():
+            books = [lib.add_book(f"Book {n}", "Smith", "Fiction").book_id for n in range(10)]
+            borrowers = [lib.add_borrower(f"User {n}", f"u{n}@test.com").borrower_id for n in range(20)]
+        successes = []
+
+        def worker(borrower_id):
+            for book_id in books:
+                if lib.checkout_book(book_id, borrower_id):
+                    successes.append(book_id)
+
+        threads = [threading.Thread(target=worker, args=(borrower_id,)) for borrower_id in borrowers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(successes) == sorted(books)
+        self.assert_consistent(lib)
+        assert len(self.assert_consistent(Library("Test Library", str(tmp_path)))) == 10
+
+    def test_no_double_checkout_across_processes(self, tmp_path):
+        """Writers in different processes see each other's checkouts"""
+        import multiprocessing
+        lib = Library("Test Library", str(tmp_path))
+        with lib.batch():
+            books = [lib.add_book(f"Book {n}", "Smith", "Fiction").book_id for n in range(3)]
+            borrowers = [lib.add_borrower(f"User {n}", f"u{n}@test.com").borrower_id for n in range(4)]
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_checkout_all, args=(str(tmp_path), borrower_id, books, results))
+                     for borrower_id in borrowers]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        assert sum(results.get(timeout=30) for _ in processes) == 3
+        assert len(self.assert_consistent(Library("Test Library", str(tmp_path)))) == 3
+
+    def test_reload_if_changed(self, tmp_path):
+        """A Library notices writes made by another instance"""
+        lib = Library("Test Library", str(tmp_path), concurrent=True)
+        assert lib.reload_if_changed() == False
+        other = Library("Test Library", str(tmp_path))
+        other.add_book("Python 101", "Smith", "Technology")
+        assert lib.reload_if_changed() == True
+        assert len(lib.books) == 1
+        assert lib.add_book("Java Guide", "Smith", "Technology").book_id == "BOOK_0002"
+
+    @pytest.mark.parametrize("options", [{"autosave": False}, {"write_behind": True}])
+    def test_deferred_writes_rejected(self, tmp_path, options):
+        """Deferred persistence cannot be combined with concurrent mode"""
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), concurrent=True, **options)
+
+    def test_save_catches_up_first(self, tmp_path):
+        """save() does not overwrite what another writer saved since"""
+        lib = Library("Test Library", str(tmp_path), concurrent=True)
+        other = Library("Test Library", str(tmp_path), concurrent=True)
+        other.add_book("Python 101", "Smith", "Technology")
+        lib.save(force=True)
+        assert len(lib.books) == 1
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
+
+
+class TestLibraryWriteFailures:
+    """Test suite for changes surviving a failed write"""
+
+    @pytest.mark.parametrize("options", [{}, {"journal": True}, {"backend": "sqlite"}])
+    def test_changes_kept_after_failed_write(self, tmp_path, monkeypatch, options):
+        """Changes whose write failed are written by the next flush"""
+        lib = Library("Test Library", str(tmp_path), **options)
+        lib.add_book("Python 101", "Smith", "Technology")
+        write_payload = lib._write_payload
+
+        def fail(payload):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(lib, "_write_payload", fail)
+        with pytest.raises(OSError):
+            lib.add_book("Java Guide", "Smith", "Technology")
+        monkeypatch.setattr(lib, "_write_payload", write_payload)
+        lib.flush()
+        lib.close()
+        lib2 = Library("Test Library", str(tmp_path), **options)
+        assert [book.title for book in lib2.books.values()] == ["Python 101", "Java Guide"]
+        lib2.close()
+
+
+class TestLibraryWriteBehind:
+    """Test suite for Library write-behind mode"""
+
+    def test_background_flush(self, tmp_path):
+        """Mutations return before writing and are flushed by the thread"""
+        import time
+        lib = Library("Test Library", str(tmp_path), write_behind=True, flush_interval_ms=50)
+        lib.add_book("Python 101", "Smith", "Technology")
+        assert not os.path.exists(lib.books_file)
+        time.sleep(0.3)
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
+        lib.close()
+
+    def test_max_pending_wakes_flusher(self, tmp_path):
+        """Reaching max_pending changes flushes without waiting for the interval"""
+        import time
+        lib = Library("Test Library", str(tmp_path), write_behind=True, flush_interval_ms=60000,
+                      max_pending=3)
+        for n in range(3):
+            lib.add_book(f"Book {n}", "Smith", "Fiction")
+        time.sleep(0.3)
+        assert len(Library("Test Library", str(tmp_path)).books) == 3
+        lib.close()
+
+    def test_flush_and_close(self, tmp_path):
+        """flush() writes immediately and close() writes what is left"""
+        lib = Library("Test Library", str(tmp_path), write_behind=True, flush_interval_ms=60000)
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        lib.flush()
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
+
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+        lib.close()
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.borrowers[alice.borrower_id].borrowed_books == [b1.book_id]
+
+    def test_failed_flush_is_retried(self, tmp_path, monkeypatch):
+        """A write error neither stops the flusher nor loses the changes"""
+        import time
+        import exercises.src.project as project
+        replace_json = project._replace_json
+        failures = []
+
+        def fail_once(path, data):
+            if not failures:
+                failures.append(path)
+                raise OSError("disk full")
+            replace_json(path, data)
+
+        monkeypatch.setattr(project, "_replace_json", fail_once)
+        lib = Library("Test Library", str(tmp_path), write_behind=True, flush_interval_ms=20)
+        lib.add_book("Python 101", "Smith", "Technology")
+        time.sleep(0.3)
+        assert failures and lib._flusher.is_alive()
+        lib.add_book("Java Guide", "Smith", "Technology")
+        time.sleep(0.3)
+        assert len(Library("Test Library", str(tmp_path)).books) == 2
+        lib.close()
+
+    def test_close_unregisters_exit_hook(self, tmp_path, monkeypatch):
+        """close() removes the atexit hook it registered"""
+        import atexit
+        hooks = []
+        monkeypatch.setattr(atexit, "register", hooks.append)
+        monkeypatch.setattr(atexit, "unregister", hooks.remove)
+        lib = Library("Test Library", str(tmp_path), write_behind=True)
+        assert len(hooks) == 1
+        lib.close()
+        assert hooks == []
+
+    def test_threads_with_write_behind(self, tmp_path):
+        """Writers on several threads race the flusher safely"""
+        import threading
+        lib = Library("Test Library", str(tmp_path), write_behind=True, flush_interval_ms=1)
+        threads = [threading.Thread(target=lambda: [lib.add_book("Book", "Smith", "Fiction") for _ in range(50)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lib.close()
+        assert len(Library("Test Library", str(tmp_path), debug_stats=True).books) == 200
+
+
+class TestLibraryDirtyTracking:
+    """Test suite for Library dirty tracking and save_metrics"""
+
+    def test_only_changed_collection_rewritten(self, tmp_path):
+        """add_borrower leaves the books file untouched"""
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        books_mtime = os.stat(lib.books_file).st_mtime_ns
+        written = lib.save_metrics["files_written"]
+
+        lib.add_borrower("Alice", "alice@test.com")
+        assert os.stat(lib.books_file).st_mtime_ns == books_mtime
+        # borrowers file and meta (the USER sequence moved) only
+        assert lib.save_metrics["files_written"] == written + 2
+
+    def test_checkout_skips_meta(self, tmp_path):
+        """A checkout rewrites books and borrowers but not the sequences"""
+        lib = Library("Test Library", str(tmp_path))
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        skipped = lib.save_metrics["files_skipped"]
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+        assert lib.save_metrics["files_skipped"] == skipped + 1
+
+    def test_clean_save_writes_nothing(self, tmp_path):
+        """save() without changes is a no-op unless forced"""
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.save()
+        before = dict(lib.save_metrics)
+        lib.save()
+        assert lib.save_metrics == before
+
+        lib.save(force=True)
+        assert lib.save_metrics["files_written"] == before["files_written"] + 4
+        assert lib.save_metrics["bytes_written"] > before["bytes_written"]
+
+    def test_replayed_journal_is_checkpointed(self, tmp_path):
+        """Records replayed at load count as dirty for the next save"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib2 = Library("Test Library", str(tmp_path), journal=True)
+        assert lib2.checkpoint() == 1
+        assert not os.path.exists(lib2.journal_file)
+        assert len(Library("Test Library", str(tmp_path)).books) == 1
+
+
+class TestLibraryLoanIndex:
+    """Test suite for the book_id -> borrower_id loan index"""
+
+    def test_who_has(self, tmp_path):
+        """who_has follows checkouts and returns"""
+        lib = Library("Test Library", str(tmp_path))
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        assert lib.who_has(b1.book_id) is None
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+        assert lib.who_has(b1.book_id) == alice.borrower_id
+        lib.return_book(b1.book_id, alice.borrower_id)
+        assert lib.who_has(b1.book_id) is None
+        assert lib.who_has("BOOK_9999") is None
+
+    def test_rebuilt_at_load(self, tmp_path):
+        """The index is rebuilt from the borrowers at load"""
+        lib = Library("Test Library", str(tmp_path))
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        lib2 = Library("Test Library", str(tmp_path))
+        assert lib2.who_has(b1.book_id) == alice.borrower_id
+        assert lib2.check_loans() == []
+
+    def test_borrowed_books_keeps_order_and_json_format(self, tmp_path):
+        """borrowed_books stays a list in borrowing order, also in the JSON file"""
+        lib = Library("Test Library", str(tmp_path))
+        books = [lib.add_book(f"Book {n}", "Smith", "Fiction") for n in range(3)]
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        for book in reversed(books):
+            lib.checkout_book(book.book_id, alice.borrower_id)
+        lib.return_book(books[1].book_id, alice.borrower_id)
+        expected = [books[2].book_id, books[0].book_id]
+        assert alice.borrowed_books == expected
+        with open(lib.borrowers_file) as f:
+            assert json.load(f)[alice.borrower_id]["borrowed_books"] == expected
+
+    def test_check_loans_reports_drift(self, tmp_path):
+        """check_loans finds disagreements between the index, borrowers and books"""
+        lib = Library("Test Library", str(tmp_path))
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        b2 = lib.add_book("Python 102", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+        assert lib.check_loans() == []
+
+        alice.borrowed_books = [b2.book_id]
+        problems = lib.check_loans()
+        # Three loan index and availability problems, plus the dropped due date
+        assert len(problems) == 5
+        assert any("due date index" in problem for problem in problems)
+        assert any("BOOK_0002 is borrowed by USER_0001 but marked available" in problem
+                   for problem in problems)
+
+
+class TestCompileQuery:
+    """Test suite for compile_query and operator criteria"""
+
+    BOOKS = [
+        {"book_id": "BOOK_0001", "title": "Python 101", "genre": "Technology", "year": 2001, "available": True},
+        {"book_id": "BOOK_0002", "title": "Learning Python", "genre": "Technology", "year": 2015, "available": False},
+        {"book_id": "BOOK_0003", "title": "Dune", "genre": "Fiction", "year": 1965, "available": True},
+        {"book_id": "BOOK_0004", "title": "Cosmos", "genre": "Science", "available": True},
+    ]
+
+    def test_operators(self):
+        """Each operator matches case-insensitively where it applies"""
+        def titles(**criteria):
+            return [book["title"] for book in search_items(self.BOOKS, **criteria)]
+
+        assert titles(title__contains="PYTHON") == ["Python 101", "Learning Python"]
+        assert titles(title__startswith="py") == ["Python 101"]
+        assert titles(genre__in=["fiction", "Science"]) == ["Dune", "Cosmos"]
+        assert titles(genre__in="Fiction") == ["Dune"]
+        assert titles(year__gte=2001) == ["Python 101", "Learning Python"]
+        assert titles(year__lt=2001) == ["Dune"]
+        assert titles(genre__ne="technology") == ["Dune", "Cosmos"]
+        assert titles(available=False, genre__eq="Technology") == ["Learning Python"]
+
+    def test_missing_and_incomparable_fields_do_not_match(self):
+        """Range tests skip items without the field or with another type"""
+        query = compile_query(year__gt="2000")
+        assert query.filter(self.BOOKS) == []
+        assert compile_query(isbn__contains="978").filter(self.BOOKS) == []
+
+    def test_conditions_ordered_by_selectivity(self):
+        """Equality runs before ranges, substring and inequality tests"""
+        query = compile_query(genre__ne="History", title__contains="py", year__gte=2000, available=True)
+        assert [condition.op for condition in query.conditions] == ["eq", "gte", "contains", "ne"]
+
+    def test_unknown_suffix_is_a_field_name(self):
+        """A double underscore without a known operator is part of the field"""
+        assert compile_query(foo__bar=1).conditions == [Condition("foo__bar", "eq", 1)]
+
+    def test_reusable_query_in_search_books(self, tmp_path):
+        """A compiled query gives search_books the same results as keyword criteria"""
+        lib = Library("Test Library", str(tmp_path))
+        for title, genre in (("Python 101", "Technology"), ("Learning Python", "Technology"),
+                             ("Dune", "Fiction"), ("Python Poems", "Fiction")):
+            lib.add_book(title, "Smith", genre)
+        query = compile_query(title__contains="python", genre__in=["Technology", "Fiction"])
+        assert [book["title"] for book in lib.search_books(query)] == \
+            ["Python 101", "Learning Python", "Python Poems"]
+        assert lib.search_books(query, genre="Fiction") == \
+            lib.search_books(title__contains="python", genre="fiction")
+        assert [book["title"] for book in lib.search_books(author="smith", title__startswith="d")] == ["Dune"]
+
+
+class TestLibraryPagination:
+    """Test suite for search_books_page and iter_books"""
+
+    @pytest.fixture
+    def lib(self, tmp_path):
+        lib = Library("Test Library", str(tmp_path))
+        with lib.batch():
+            for n in range(60):
+                lib.add_book(f"Title {n}", ["Smith", "Jones"][n % 2], Book.GENRES[n % 5])
+        return lib
+
+    def pages(self, lib, criteria, limit):
+        pages, cursor = [], None
+        while True:
+            page = lib.search_books_page(criteria, limit=limit, cursor=cursor)
+            pages.append(page["books"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    @pytest.mark.parametrize("criteria", [
+        {},                                            # walks the ID space
+        {"genre": "Science"},                          # small posting
+        {"author": "smith", "title__contains": "1"},   # posting plus residual
+        {"title__startswith": "title 5"},              # no index at all
+    ])
+    def test_pages_cover_search_results(self, lib, criteria):
+        """Concatenated pages equal search_books, with no page over the limit"""
+        pages = self.pages(lib, criteria, limit=7)
+        assert all(len(page) <= 7 for page in pages)
+        assert [book for page in pages for book in page] == lib.search_books(**criteria)
+
+    def test_last_page_has_no_cursor(self, lib):
+        """next_cursor is None exactly when nothing follows"""
+        page = lib.search_books_page({"genre": "Science"}, limit=12)
+        assert len(page["books"]) == 12 and page["next_cursor"] is None
+        assert lib.search_books_page({"author": "Nobody"})["books"] == []
+
+    def test_cursor_stable_across_inserts(self, lib):
+        """Books added after a page was served show up on later pages"""
+        first = lib.search_books_page({"genre": "Fiction"}, limit=10)
+        lib.add_book("Late", "Smith", "Fiction")
+        rest = lib.search_books_page({"genre": "Fiction"}, limit=10, cursor=first["next_cursor"])
+        assert [book["title"] for book in rest["books"]] == ["Title 50", "Title 55", "Late"]
+
+    def test_iter_books_is_lazy(self, lib):
+        """iter_books yields in ID order and can stop early"""
+        books = lib.iter_books(compile_query(title__contains="title"), author="Jones")
+        assert next(books).book_id == "BOOK_0002"
+        assert [book.book_id for book in lib.iter_books(after="BOOK_0058")] == ["BOOK_0059", "BOOK_0060"]
+        lib.ITER_CHUNK = 8
+        assert [book.to_dict() for book in lib.iter_books(genre="History")] == lib.search_books(genre="History")
+        assert len(list(lib.iter_books())) == 60
+
+    def test_dense_posting_is_walked(self, lib, monkeypatch):
+        """A posting holding many matches is not scanned whole for a small page"""
+        monkeypatch.setattr(heapq, "nsmallest", None)
+        page = lib.search_books_page({"author": "Smith"}, limit=3)
+        assert [book["book_id"] for book in page["books"]] == ["BOOK_0001", "BOOK_0003", "BOOK_0005"]
+
+    def test_invalid_limit(self, lib):
+        """A page needs room for at least one book"""
+        with pytest.raises(ValueError):
+            lib.search_books_page({}, limit=0)
+
+
+class TestLibrarySearchCache:
+    """Test suite for the search_books result cache"""
+
+    def test_disabled_by_default(self, tmp_path):
+        """Without search_cache_size nothing is cached"""
+        lib = Library("Test Library", str(tmp_path))
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.search_books(genre="Technology")
+        assert lib.search_cache_info() == {}
+
+    def test_hits_on_normalized_criteria(self, tmp_path):
+        """Equivalent criteria share one entry"""
+        lib = Library("Test Library", str(tmp_path), search_cache_size=8)
+        lib.add_book("Python 101", "Smith", "Technology")
+        first = lib.search_books(genre="Technology", available=True)
+        assert lib.search_books(available=True, genre="technology") == first
+        info = lib.search_cache_info()
+        assert (info["hits"], info["misses"], info["size"]) == (1, 1, 1)
+
+    def test_checkout_invalidates_available_only(self, tmp_path):
+        """A checkout drops entries reading available and keeps the others current"""
+        lib = Library("Test Library", str(tmp_path), search_cache_size=8)
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        assert len(lib.search_books(genre="Technology", available=True)) == 1
+        assert lib.search_books(author="Smith")[0]["available"] is True
+
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+        assert lib.search_books(genre="Technology", available=True) == []
+        assert lib.search_books(author="Smith")[0]["available"] is False
+        info = lib.search_cache_info()
+        assert (info["hits"], info["invalidations"]) == (1, 1)
+
+        lib.return_book(b1.book_id, alice.borrower_id)
+        assert len(lib.search_books(genre="Technology", available=True)) == 1
+
+    def test_add_book_invalidates_everything(self, tmp_path):
+        """A new book can match any criteria"""
+        lib = Library("Test Library", str(tmp_path), search_cache_size=8)
+        lib.add_book("Python 101", "Smith", "Technology")
+        assert len(lib.search_books(author="Smith")) == 1
+        lib.add_book("Python 201", "Smith", "Technology")
+        assert len(lib.search_books(author="Smith")) == 2
+        assert lib.search_cache_info()["invalidations"] == 1
+
+    def test_lru_eviction(self, tmp_path):
+        """The least recently used entry is evicted beyond capacity"""
+        lib = Library("Test Library", str(tmp_path), search_cache_size=2)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.search_books(author="Smith")
+        lib.search_books(genre="Technology")
+        lib.search_books(author="Smith")
+        lib.search_books(genre="Fiction")
+        assert lib.search_cache_info()["evictions"] == 1
+        lib.search_books(author="Smith")
+        lib.search_books(genre="Technology")
+        info = lib.search_cache_info()
+        assert (info["hits"], info["misses"], info["size"]) == (2, 4, 2)
+
+    def test_batch_rollback_clears(self, tmp_path):
+        """Rolled-back books are not served from the cache"""
+        lib = Library("Test Library", str(tmp_path), search_cache_size=8)
+        with pytest.raises(RuntimeError):
+            with lib.batch():
+                lib.add_book("Python 101", "Smith", "Technology")
+                assert len(lib.search_books(author="Smith")) == 1
+                raise RuntimeError("abort")
+        assert lib.search_books(author="Smith") == []
+
+    def test_unhashable_criteria_not_cached(self):
+        """Criteria values that cannot be hashed bypass the cache"""
+        assert SearchCache.key(compile_query(author=["Smith"]).conditions) is None
+        assert SearchCache.key(compile_query(author__in=["Smith", "Jones"]).conditions) == \
+            SearchCache.key(compile_query(author__in=["jones", "smith"]).conditions)
+
+
+class TestLibraryDueDates:
+    """Test suite for loan due dates and the overdue index"""
+
+    def make_library(self, tmp_path, **options):
+        lib = Library("Test Library", str(tmp_path), **options)
+        books = [lib.add_book(f"Book {n}", "Smith", "Fiction") for n in range(4)]
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        bob = lib.add_borrower("Bob", "bob@test.com")
+        lib.checkout_book(books[0].book_id, alice.borrower_id, datetime(2024, 1, 1))
+        lib.checkout_book(books[1].book_id, bob.borrower_id, datetime(2024, 1, 10))
+        lib.checkout_book(books[2].book_id, alice.borrower_id, datetime(2024, 1, 5))
+        return lib
+
+    def test_checkout_records_dates(self, tmp_path):
+        """A checkout stores its date and a due date loan_days later"""
+        lib = self.make_library(tmp_path, loan_days=7)
+        assert lib.borrowers["USER_0001"].loan_dates["BOOK_0001"] == ("2024-01-01", "2024-01-08")
+
+    def test_checkout_date_string(self, tmp_path):
+        """checked_out may be a string; a malformed one changes nothing"""
+        lib = self.make_library(tmp_path, loan_days=7)
+        assert lib.checkout_book("BOOK_0004", "USER_0002", "2024-02-01")
+        assert lib.borrowers["USER_0002"].loan_dates["BOOK_0004"] == ("2024-02-01", "2024-02-08")
+        lib.return_book("BOOK_0004", "USER_0002")
+        with pytest.raises(ValueError):
+            lib.checkout_book("BOOK_0004", "USER_0002", "1 February")
+        assert lib.books["BOOK_0004"].available
+        assert not lib.borrowers["USER_0002"].has_book("BOOK_0004")
+        assert lib.check_loans() == []
+
+    def test_unpadded_dates(self, tmp_path):
+        """Dates without zero padding are stored and compared padded"""
+        lib = self.make_library(tmp_path, loan_days=7)
+        assert lib.checkout_book("BOOK_0004", "USER_0002", "2024-2-1")
+        assert lib.borrowers["USER_0002"].loan_dates["BOOK_0004"] == ("2024-02-01", "2024-02-08")
+        # Due 2024-01-08, 2024-01-12 and 2024-01-17: none before the 8th
+        assert lib.overdue("2024-1-8") == []
+        assert [loan["book_id"] for loan in lib.overdue("2024-1-9")] == ["BOOK_0001"]
+        assert [loan["due"] for loan in lib.due_between("2024-1-9", "2024-2-8")] == \
+            ["2024-01-12", "2024-01-17", "2024-02-08"]
+
+    def test_overdue(self, tmp_path):
+        """overdue lists loans due before as_of, earliest first"""
+        lib = self.make_library(tmp_path)
+        # Due on 2024-01-15 is not overdue that day
+        assert lib.overdue("2024-01-15") == []
+        assert [loan["book_id"] for loan in lib.overdue(datetime(2024, 1, 20))] == ["BOOK_0001", "BOOK_0003"]
+        assert lib.overdue(datetime(2024, 1, 20))[1] == {
+            "book_id": "BOOK_0003", "borrower_id": "USER_0001", "checked_out": "2024-01-05", "due": "2024-01-19"}
+        with pytest.raises(ValueError):
+            lib.overdue("20 January")
+
+    def test_due_between_inclusive(self, tmp_path):
+        """due_between includes both ends"""
+        lib = self.make_library(tmp_path)
+        assert [loan["due"] for loan in lib.due_between("2024-01-15", "2024-01-24")] == \
+            ["2024-01-15", "2024-01-19", "2024-01-24"]
+        assert [loan["book_id"] for loan in lib.due_between("2024-01-16", "2024-01-19")] == ["BOOK_0003"]
+
+    def test_return_removes_from_index(self, tmp_path):
+        """A returned book is no longer overdue"""
+        lib = self.make_library(tmp_path)
+        lib.return_book("BOOK_0001", "USER_0001")
+        assert [loan["book_id"] for loan in lib.overdue("2024-02-01")] == ["BOOK_0003", "BOOK_0002"]
+        assert lib.check_loans() == []
+
+    @pytest.mark.parametrize("options", [{}, {"journal": True}, {"backend": "sqlite"},
+                                         {"snapshot_format": "binary"}, {"shard_by": "hash"}])
+    def test_survives_reload(self, tmp_path, options):
+        """Due dates are saved and the index rebuilt at load"""
+        lib = self.make_library(tmp_path, **options)
+        expected = lib.overdue("2024-02-01")
+        lib.close()
+        lib2 = Library("Test Library", str(tmp_path), **options)
+        assert lib2.overdue("2024-02-01") == expected
+        assert lib2.check_loans() == []
+
+    def test_loans_without_dates(self, tmp_path):
+        """Loans saved before due dates existed load without dates"""
+        lib = Library("Test Library", str(tmp_path))
+        book = lib.add_book("Python 101", "Smith", "Technology")
+        borrower = Borrower.from_dict({"borrower_id": "USER_0001", "name": "Alice",
+                                       "email": "alice@test.com", "borrowed_books": [book.book_id]})
+        assert borrower.loan_dates == {}
+        assert borrower.to_dict()["loan_dates"] == {}
@@ -0,0 +1,111 @@
+import pytest
+import os
+from exercises.src.project import Library
+from exercises.src.shards import *
+
+
+def fill(lib, count=12):
+    for n in range(count):
+        lib.add_book(f"Title {n}", ["Smith", "Jones"][n % 2], ["Fiction", "Science", "History"][n % 3])
+    lib.add_borrower("Alice", "alice@test.com")
+
+
+class TestShardLayout:
+    """Test suite for ShardLayout key functions"""
+
+    def test_range_keys(self, tmp_path):
+        """Range shards hold consecutive blocks of ID numbers"""
+        layout = ShardLayout(str(tmp_path), "range", shard_size=100)
+        assert layout.key_for_id("books", "BOOK_0099") == "0"
+        assert layout.key_for_id("books", "BOOK_0100") == "1"
+        assert layout.key_for_id("borrowers", "USER_12345") == "123"
+
+    def test_hash_keys_are_stable(self, tmp_path):
+        """Hash shards do not depend on the process (no hash() salting)"""
+        layout = ShardLayout(str(tmp_path), "hash", shards=4)
+        assert layout.key_for_id("books", "BOOK_0001") == str(zlib.crc32(b"BOOK_0001") % 4)
+
+    def test_genre_books_need_the_record(self, tmp_path):
+        """Under the genre strategy a book ID alone does not name a shard"""
+        layout = ShardLayout(str(tmp_path), "genre")
+        assert layout.key_for_id("books", "BOOK_0001") is None
+        assert layout.key_for_id("borrowers", "USER_0001") is not None
+
+    def test_invalid_layout(self, tmp_path):
+        """Unknown strategies and non-positive sizes are rejected"""
+        with pytest.raises(ValueError):
+            ShardLayout(str(tmp_path), "author")
+        with pytest.raises(ValueError):
+            ShardLayout(str(tmp_path), "hash", shards=0)
+
+
+class TestShardedLibrary:
+    """Test suite for Library with shard_by set"""
+
+    def test_mutation_rewrites_one_shard(self, tmp_path):
+        """A checkout writes the book's shard, the borrower's shard and the manifest"""
+        lib = Library("Test Library", str(tmp_path), shard_by="hash", shards=4)
+        fill(lib)
+        written, skipped = lib.save_metrics["files_written"], lib.save_metrics["files_skipped"]
+        lib.checkout_book("BOOK_0005", "USER_0001")
+        assert lib.save_metrics["files_written"] == written + 3
+        assert lib.save_metrics["files_skipped"] > skipped
+        assert not os.path.exists(lib.books_file)
+
+    def test_shards_load_lazily(self, tmp_path):
+        """Reopening reads only the manifest until a record is needed"""
+        fill(Library("Test Library", str(tmp_path), shard_by="range", shard_size=5))
+        lib = Library("Test Library", str(tmp_path), shard_by="range", shard_size=5)
+        assert len(lib.books) == 12
+        assert lib.books.members == {}
+
+        assert lib.books["BOOK_0007"].title == "Title 6"
+        assert list(lib.books.members) == ["1"]
+        assert lib.checkout_book("BOOK_0002", "USER_0001")
+        assert sorted(lib.books.members) == ["0", "1"]
+
+    @pytest.mark.parametrize("shard_by", SHARD_STRATEGIES)
+    def test_persistence(self, tmp_path, shard_by):
+        """Every strategy reloads to the same catalog and search results"""
+        lib = Library("Test Library", str(tmp_path), shard_by=shard_by, shards=3, shard_size=4)
+        fill(lib)
+        lib.checkout_book("BOOK_0003", "USER_0001")
+
+        lib2 = Library("Test Library", str(tmp_path), shard_by=shard_by, shards=3, shard_size=4)
+        assert lib2.search_books(author="Smith", available=True) == lib.search_books(author="Smith", available=True)
+        assert lib2.get_statistics() == lib.get_statistics()
+        assert lib2.get_borrower_books("USER_0001")[0].book_id == "BOOK_0003"
+        assert lib2.add_book("New", "Smith", "Fiction").book_id == "BOOK_0013"
+
+    def test_converts_unsharded_data(self, tmp_path):
+        """Existing JSON files are split into shards on the next save"""
+        fill(Library("Test Library", str(tmp_path)))
+        lib = Library("Test Library", str(tmp_path), shard_by="genre")
+        lib.save()
+        assert os.path.exists(lib.manifest_file)
+        assert sorted(os.listdir(tmp_path / "library_shards"))[:3] == \
+            ["books_fiction.json", "books_history.json", "books_science.json"]
+        assert len(Library("Test Library", str(tmp_path), shard_by="genre").books) == 12
+
+    def test_batch_rollback(self, tmp_path):
+        """A rolled back batch leaves a sharded catalog that still saves by shard"""
+        lib = Library("Test Library", str(tmp_path), shard_by="hash", shards=4)
+        fill(lib)
+        with pytest.raises(RuntimeError):
+            with lib.batch():
+                lib.add_book("Lost", "Nobody", "Fiction")
+                raise RuntimeError("abort")
+        lib.add_book("Kept", "Smith", "Fiction")
+        reopened = Library("Test Library", str(tmp_path), shard_by="hash", shards=4)
+        assert reopened.search_books(title="Lost") == []
+        assert len(reopened.books) == 13
+
+    def test_settings_must_match(self, tmp_path):
+        """Opening shards with another layout, or unsupported combinations, fails"""
+        fill(Library("Test Library", str(tmp_path), shard_by="hash", shards=4))
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), shard_by="hash", shards=8)
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), shard_by="hash", journal=True)
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), shard_by="hash", backend="sqlite")
@@ -0,0 +1,153 @@
+import pytest
+import os
+import sqlite3
+from exercises.src.project import Library
+from exercises.src.sqlite_backend import *
+
+
+class TestSqliteBackend:
+    """Test suite for the SqliteBackend row store"""
+
+    def test_wal_mode(self, tmp_path):
+        """The database is opened in WAL mode"""
+        backend = SqliteBackend(str(tmp_path / "library.db"))
+        mode = backend.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        backend.close()
+        assert mode == "wal"
+
+    def test_upsert_and_load(self, tmp_path):
+        """Upserted rows round-trip as Book/Borrower dicts"""
+        backend = SqliteBackend(str(tmp_path / "library.db"))
+        book = {"book_id": "BOOK_0001", "title": "Python 101", "author": "Smith",
+                "available": True, "genre": "Technology"}
+        borrower = {"borrower_id": "USER_0001", "name": "Alice", "email": "alice@test.com",
+                    "borrowed_books": []}
+        backend.upsert([book], [borrower], {"BOOK": 1, "USER": 1})
+        backend.upsert([{**book, "available": False}], [{**borrower, "borrowed_books": ["BOOK_0001"]}])
+
+        assert backend.load_books() == [{**book, "available": False}]
+        assert backend.load_borrowers()[0]["borrowed_books"] == ["BOOK_0001"]
+        assert backend.load_sequences() == {"BOOK": 1, "USER": 1}
+        backend.close()
+
+    def test_adds_loan_dates_column(self, tmp_path):
+        """A database from before loan dates gains the column on open"""
+        path = str(tmp_path / "library.db")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE borrowers (borrower_id TEXT PRIMARY KEY, name TEXT NOT NULL, "
+                           "email TEXT NOT NULL, borrowed_books TEXT NOT NULL)")
+        connection.execute("INSERT INTO borrowers VALUES ('USER_0001', 'Alice', 'a@test.com', '[\"BOOK_0001\"]')")
+        connection.commit()
+        connection.close()
+
+        backend = SqliteBackend(path)
+        assert backend.load_borrowers()[0]["loan_dates"] == {}
+        backend.close()
+
+    def test_write_all_is_atomic(self, tmp_path):
+        """A write_all that fails partway keeps the previous contents"""
+        backend = SqliteBackend(str(tmp_path / "library.db"))
+        book = {"book_id": "BOOK_0001", "title": "Python 101", "author": "Smith",
+                "available": True, "genre": "Technology"}
+        backend.upsert([book])
+        with pytest.raises(sqlite3.IntegrityError):
+            backend.write_all([{**book, "book_id": "BOOK_0002"}, {**book, "title": None}], [], {"BOOK": 2})
+        assert backend.load_books() == [book]
+        backend.close()
+
+
+class TestSqliteLibrary:
+    """Test suite for Library with backend="sqlite" """
+
+    @pytest.fixture
+    def lib(self, tmp_path):
+        lib = Library("Test Library", str(tmp_path), backend="sqlite")
+        yield lib
+        lib.close()
+
+    def test_persistence(self, lib, tmp_path):
+        """Mutations are written to the database, not the JSON files"""
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+        assert not os.path.exists(lib.books_file)
+
+        lib2 = Library("Test Library", str(tmp_path), backend="sqlite")
+        assert lib2.books[b1.book_id].available == False
+        assert lib2.borrowers[alice.borrower_id].borrowed_books == [b1.book_id]
+        assert lib2.add_book("Java Guide", "Smith", "Technology").book_id == "BOOK_0002"
+        lib2.close()
+
+    def test_search_and_available(self, lib):
+        """search_books and get_available_books match the JSON backend"""
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        lib.add_book("History of Rome", "Jones", "History")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        assert [b["title"] for b in lib.search_books(author="smith")] == ["Python 101"]
+        assert lib.search_books(genre="History", available=False) == []
+        assert [book.title for book in lib.get_available_books()] == ["History of Rome"]
+        assert [b["title"] for b in lib.search_books(book_id=b1.book_id.lower())] == ["Python 101"]
+
+    def test_queries_see_pending_changes(self, lib):
+        """Changes not yet written to the database are searchable"""
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        with lib.batch():
+            b1 = lib.add_book("Python 101", "Smith", "Technology")
+            lib.checkout_book(b1.book_id, alice.borrower_id)
+            lib.add_book("Java Guide", "Smith", "Technology")
+            assert [b["title"] for b in lib.search_books(author="Smith")] == ["Python 101", "Java Guide"]
+            assert [book.title for book in lib.get_available_books()] == ["Java Guide"]
+            assert [b["title"] for b in lib.search_books(available=False)] == ["Python 101"]
+
+    def test_save_upserts_changed_rows(self, tmp_path):
+        """save() writes only the pending rows; save(force=True) rewrites the table"""
+        lib = Library("Test Library", str(tmp_path), backend="sqlite", autosave=False)
+        lib.add_book("Python 101", "Smith", "Technology")
+        lib.save()
+        lib.add_book("Java Guide", "Smith", "Technology")
+        writes = []
+        upsert, write_all = lib._store.upsert, lib._store.write_all
+        lib._store.upsert = lambda books, *rest: writes.append(("upsert", len(books))) or upsert(books, *rest)
+        lib._store.write_all = lambda books, *rest: writes.append(("write_all", len(books))) or write_all(books, *rest)
+        lib.save()
+        lib.save(force=True)
+        assert writes == [("upsert", 1), ("write_all", 2)]
+        lib.close()
+
+    def test_batch_rolls_back(self, lib, tmp_path):
+        """A failed batch writes nothing to the database"""
+        with pytest.raises(ValueError):
+            with lib.batch():
+                lib.add_book("Python 101", "Smith", "Technology")
+                lib.add_book("Bad Book", "Author", "InvalidGenre")
+        lib2 = Library("Test Library", str(tmp_path), backend="sqlite")
+        assert lib2.books == {}
+        lib2.close()
+
+    def test_invalid_backend(self, tmp_path):
+        """Unknown backends and journal mode with sqlite are rejected"""
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), backend="xml")
+        with pytest.raises(ValueError):
+            Library("Test Library", str(tmp_path), backend="sqlite", journal=True)
+
+
+class TestMigration:
+    """Test suite for migrate_json_to_sqlite"""
+
+    def test_migrate_json_library(self, tmp_path):
+        """Books, borrowers, journal entries and sequences are migrated"""
+        lib = Library("Test Library", str(tmp_path), journal=True)
+        b1 = lib.add_book("Python 101", "Smith", "Technology")
+        alice = lib.add_borrower("Alice", "alice@test.com")
+        lib.checkout_book(b1.book_id, alice.borrower_id)
+
+        result = migrate_json_to_sqlite(str(tmp_path))
+        assert result["books"] == 1 and result["borrowers"] == 1
+
+        migrated = Library("Test Library", str(tmp_path), backend="sqlite")
+        assert migrated.books[b1.book_id].available == False
+        assert migrated.add_borrower("Bob", "bob@test.com").borrower_id == "USER_0002"
+        migrated.close()